@@ -0,0 +1,109 @@
+"""
+Alterações dos boletos, enviadas para a tela como um delta pequeno (ou
+'recarregar': True), com uma sequência por perfil (ALTERACOES_GUARDADAS).
+"""
+import threading
+from collections import deque
+
+from backend import dinheiro, lotes, nomes
+
+# Deltas guardados por perfil (para quem busca os perdidos)
+ALTERACOES_GUARDADAS = 200
+
+# Escritas com mais boletos que isso mandam só 'recarregar' (o delta ficaria maior que a recarga)
+MAXIMO_BOLETOS = 500
+
+# Colunas de um boleto que o delta do dashboard precisa
+COLUNAS_ESTADO = 'id, status, vencimento_util, valor_original, categoria, empresa'
+
+class RegistroAlteracoes:
+    def __init__(self, guardadas=ALTERACOES_GUARDADAS):
+        self.guardadas = guardadas
+        self._lock = threading.Lock()
+        self._seqs = {}
+        self._deltas = {} # usuario_id -> deque dos últimos deltas
+
+    def seq(self, usuario_id):
+        """ Número da última alteração do perfil (0 = nenhuma desde que o programa abriu) """
+        return self._seqs.get(usuario_id, 0)
+
+    def publicar(self, usuario_id, delta):
+        """ Numera e guarda o delta (chamar DEPOIS do commit); retorna o delta com 'seq' """
+        with self._lock:
+            seq = self._seqs.get(usuario_id, 0) + 1
+            self._seqs[usuario_id] = seq
+            delta = dict(delta, seq=seq, usuario_id=usuario_id)
+            self._deltas.setdefault(usuario_id, deque(maxlen=self.guardadas)).append(delta)
+        return delta
+
+    def desde(self, usuario_id, seq):
+        """ Deltas depois de 'seq', em ordem, ou None se alguns já foram descartados """
+        with self._lock:
+            atual = self._seqs.get(usuario_id, 0)
+            if seq >= atual:
+                return []
+            deltas = self._deltas.get(usuario_id, ())
+            if not deltas or deltas[0]['seq'] > seq + 1:
+                return None
+            return [d for d in deltas if d['seq'] > seq]
+
+# Instância única usada pela BoletoAPI
+registro = RegistroAlteracoes()
+
+def estado(conn, usuario_id, ids):
+    """ {id: linha} dos boletos antes da mudança (chamar antes de gravar) """
+    return lotes.carregar(conn, usuario_id, list(ids), COLUNAS_ESTADO)
+
+def _faixas(resumo):
+    """ {grupo: (início ou None, fim)} a partir do esqueleto do resumo do dashboard """
+    return {
+        grupo: (None if faixa['inicio'] == '...' else faixa['inicio'], faixa['fim'])
+        for grupo, faixa in resumo.items()
+    }
+
+def _somar(dashboard, faixas, linha, sinal):
+    """ Soma (sinal=1) ou tira (sinal=-1) a parte de um boleto em cada grupo do dashboard """
+    if linha is None or linha['status'] != 'Pendente':
+        return
+    dia = linha['vencimento_util']
+    for grupo, (inicio, fim) in faixas.items():
+        if (inicio is None or inicio <= dia) and dia <= fim:
+            dashboard[grupo]['qtd'] += sinal
+            dashboard[grupo]['valor'] += sinal * linha['valor_original']
+
+def calcular(antes, depois, resumo):
+    """
+    Delta entre 'antes' e 'depois' ({id: linha}, de estado() e da releitura
+    com as colunas da listagem). resumo: o esqueleto do dashboard (faixas de
+    data de cada grupo). As linhas de 'inseridos'/'atualizados' saem cruas;
+    quem chama as formata como a listagem.
+    """
+    faixas = _faixas(resumo)
+    dashboard = {grupo: {'qtd': 0, 'valor': 0} for grupo in faixas}
+    for id_boleto in set(antes) | set(depois):
+        _somar(dashboard, faixas, antes.get(id_boleto), -1)
+        _somar(dashboard, faixas, depois.get(id_boleto), 1)
+
+    return {
+        'inseridos': [linha for id_boleto, linha in depois.items() if id_boleto not in antes],
+        'atualizados': [linha for id_boleto, linha in depois.items() if id_boleto in antes],
+        'excluidos': [id_boleto for id_boleto in antes if id_boleto not in depois],
+        'dashboard': {
+            grupo: {'qtd': soma['qtd'], 'valor': dinheiro.para_reais(soma['valor'])}
+            for grupo, soma in dashboard.items() if soma['qtd'] or soma['valor']
+        },
+    }
+
+def nomes_alterados(conn, usuario_id, antes, depois, esquemas=('main',)):
+    """
+    {'categorias', 'categorias_removidas', 'empresas', 'empresas_removidas'}
+    dos nomes que aparecem em 'antes' ou 'depois', já com a escrita gravada
+    (mesma transação): em uso ainda, ou não mais, nos 'esquemas'.
+    """
+    resultado = {}
+    for coluna, chave in (('categoria', 'categorias'), ('empresa', 'empresas')):
+        tocados = {linha[coluna] for linha in (*antes.values(), *depois.values()) if linha[coluna]}
+        em_uso = nomes.usados(conn, usuario_id, coluna, esquemas, entre=tocados) if tocados else []
+        resultado[chave] = em_uso
+        resultado[f'{chave}_removidas'] = sorted(tocados - set(em_uso))
+    return resultado
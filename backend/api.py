@@ -1,117 +1,465 @@
+import base64
+import binascii
+import json
 import math
 import os
-import shutil
 from datetime import datetime, date, timedelta
-from backend.database import get_db_connection, init_db
+from decimal import InvalidOperation
+from backend import alteracoes, arquivamento, backup, bancos_perfil, cache, database, dinheiro, execucao, exportacao, imagens, importacao, instrumentacao, lotes, manutencao, nomes, relatorios
+from backend.cache import em_cache
+from backend.calendario import calendario, calcular_pascoa, feriados_do_ano
+from backend.database import conexao, init_db
+from backend.juros import calcular_lote
+from backend.sessoes import sessao_atual, sessoes
+from backend.lancamentos import gerar_vencimentos, inserir, linhas_parcelas
 from sqlite3 import IntegrityError
 
+# FROM da listagem sem o arquivo: a visão com os nomes (ver backend/nomes.py)
+_FROM_PRINCIPAL = f" FROM {nomes.VISAO} AS boletos WHERE"
+
+def _gerar_cursor(*chave):
+    """ Transforma a chave de ordenação do último boleto em um texto opaco para o JS """
+    return base64.urlsafe_b64encode(json.dumps(chave).encode()).decode()
+
+def _ler_cursor(cursor):
+    """ Desfaz _gerar_cursor. Cursor vazio = primeira página (retorna None); ValueError se não veio dele """
+    if not cursor:
+        return None
+    try:
+        chave = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        trecho, venc, valor, id_boleto = chave
+    except (ValueError, binascii.Error, AttributeError, TypeError):
+        raise ValueError('Cursor inválido') from None
+    numeros = (int, float, type(None))
+    if (trecho not in (0, 1) or isinstance(trecho, bool) or not isinstance(venc, (str, type(None)))
+            or not isinstance(valor, numeros) or not isinstance(id_boleto, int) or isinstance(id_boleto, bool)):
+        raise ValueError('Cursor inválido')
+    return chave
+
+def _expressao_fts(termos, colunas):
+    """ Monta a consulta FTS5: cada termo vira uma frase entre aspas, todas obrigatórias """
+    alvo = colunas[0] if len(colunas) == 1 else '{' + ' '.join(colunas) + '}'
+    frases = ['"' + termo.replace('"', '""') + '"' for termo in termos]
+    return f"{alvo} : (" + ' AND '.join(frases) + ")"
+
+def _filtro_texto(colunas, termos, usar_fts=True):
+    """
+    Condição SQL que exige cada termo (pedaço de palavra) em alguma das colunas.
+    Usa o índice de texto (trigramas) para termos com 3+ caracteres;
+    termos menores, bancos sem FTS5 ou usar_fts=False (arquivo) caem no LIKE.
+    """
+    indexados = [t for t in termos if usar_fts and database.FTS_DISPONIVEL and len(t) >= 3]
+    curtos = [t for t in termos if t not in indexados]
+
+    condicoes, params = [], []
+    if indexados:
+        condicoes.append("id IN (SELECT rowid FROM boletos_fts WHERE boletos_fts MATCH ?)")
+        params.append(_expressao_fts(indexados, colunas))
+    for termo in curtos:
+        condicoes.append('(' + ' OR '.join(f"{c} LIKE ?" for c in colunas) + ')')
+        params.extend([f"%{termo}%"] * len(colunas))
+
+    return ' AND '.join(condicoes), params
+
+def _filtro_ids(coluna, ids):
+    """ Condição que compara categoria_id/empresa_id com os ids (nenhum id: nenhum boleto) """
+    return f"{coluna}_id IN ({','.join('?' * len(ids))})", ids
+
+def _formatar_boletos(linhas):
+    """ Linhas do banco no formato da listagem: juros/multa de todas de uma vez, valores em reais """
+    lista_processada = [dict(b) for b in linhas]
+    valores, atrasos = calcular_lote(
+        [b['vencimento'] for b in lista_processada],
+        [b['valor_original'] for b in lista_processada],
+        [b['tipo_juros'] for b in lista_processada],
+        [b['juros'] for b in lista_processada],
+        [b['multa'] for b in lista_processada],
+        pendentes=[b['status'] == 'Pendente' for b in lista_processada],
+    )
+
+    # Injeta dados extras para o HTML (em reais, como a tela espera)
+    for boleto, valor_final, dias_atraso in zip(lista_processada, valores, atrasos):
+        boleto['valor_original'] = dinheiro.para_reais(boleto['valor_original'])
+        boleto['valor_total'] = dinheiro.para_reais(boleto['valor_total'])
+        boleto['multa'] = dinheiro.para_reais(boleto['multa'])
+        boleto['juros'] = dinheiro.juros_para_tela(boleto['tipo_juros'], boleto['juros'])
+        boleto['valor_atualizado'] = dinheiro.para_reais(valor_final)
+        boleto['dias_atraso'] = dias_atraso
+        boleto['esta_vencido'] = dias_atraso > 0
+    return lista_processada
+
+# Campos que a listagem calcula para cada boleto (não existem no banco)
+CAMPOS_CALCULADOS = ('valor_atualizado', 'dias_atraso', 'esta_vencido')
+
+# O que o cálculo de juros/atraso lê de cada boleto
+_CAMPOS_JUROS = ('vencimento', 'valor_original', 'tipo_juros', 'juros', 'multa', 'status')
+
+# Chaves da ordenação e do cursor da listagem (sempre lidas do banco)
+_CAMPOS_ORDEM = ('id', 'status', 'vencimento', 'valor_original')
+
+# Guardados em centavos, saem em reais
+_CAMPOS_CENTAVOS = ('valor_original', 'valor_total', 'multa')
+
+def _tabela_boletos(linhas, colunas):
+    """
+    Formato compacto da listagem: {'colunas': [...], 'linhas': [(...), ...]},
+    só com os campos pedidos e os nomes uma vez só. Montado coluna a coluna
+    direto das linhas do banco, sem um dict por boleto; os valores saem
+    como em _formatar_boletos.
+    """
+    valores = atrasos = ()
+    if any(coluna in CAMPOS_CALCULADOS for coluna in colunas):
+        valores, atrasos = calcular_lote(
+            [b['vencimento'] for b in linhas],
+            [b['valor_original'] for b in linhas],
+            [b['tipo_juros'] for b in linhas],
+            [b['juros'] for b in linhas],
+            [b['multa'] for b in linhas],
+            pendentes=[b['status'] == 'Pendente' for b in linhas],
+        )
+
+    valores_colunas = []
+    for coluna in colunas:
+        if coluna == 'valor_atualizado':
+            valores_colunas.append([dinheiro.para_reais(v) for v in valores])
+        elif coluna == 'dias_atraso':
+            valores_colunas.append(atrasos)
+        elif coluna == 'esta_vencido':
+            valores_colunas.append([dias > 0 for dias in atrasos])
+        elif coluna in _CAMPOS_CENTAVOS:
+            valores_colunas.append([dinheiro.para_reais(b[coluna]) for b in linhas])
+        elif coluna == 'juros':
+            valores_colunas.append([dinheiro.juros_para_tela(b['tipo_juros'], b['juros']) for b in linhas])
+        else:
+            valores_colunas.append([b[coluna] for b in linhas])
+    return {'colunas': list(colunas), 'linhas': list(zip(*valores_colunas))}
+
+def _esqueleto_resumo(hoje):
+    """ Grupos do dashboard zerados, com as datas de cada um (pendentes por vencimento_util) """
+    # Semana (Domingo a Sábado)
+    # Se hoje é Domingo (6), volta 0 dias. Se é Segunda (0), volta 1 dia...
+    inicio_semana = hoje - timedelta(days=hoje.weekday() + 1) if hoje.weekday() != 6 else hoje
+    fim_semana = inicio_semana + timedelta(days=6)
+
+    # Mês (Primeiro e Último dia)
+    inicio_mes = date(hoje.year, hoje.month, 1)
+    proximo_mes = hoje.replace(day=28) + timedelta(days=4)
+    fim_mes = proximo_mes - timedelta(days=proximo_mes.day)
+
+    return {
+        'hoje': {'qtd': 0, 'valor': 0, 'inicio': hoje.strftime('%Y-%m-%d'), 'fim': hoje.strftime('%Y-%m-%d')},
+        'vencidos': {'qtd': 0, 'valor': 0, 'inicio': '...', 'fim': (hoje - timedelta(days=1)).strftime('%Y-%m-%d')},
+        'semana': {'qtd': 0, 'valor': 0, 'inicio': inicio_semana.strftime('%Y-%m-%d'), 'fim': fim_semana.strftime('%Y-%m-%d')},
+        'mes': {'qtd': 0, 'valor': 0, 'inicio': inicio_mes.strftime('%Y-%m-%d'), 'fim': fim_mes.strftime('%Y-%m-%d')}
+    }
+
+def _esquemas_nomes(conn):
+    """ Esquemas com boletos do perfil: o banco e, se tiver boletos, o arquivo """
+    if arquivamento.limite(conn) is not None:
+        return ('main', arquivamento.ESQUEMA)
+    return ('main',)
+
+# Perfis sem a imagem inteira: só a miniatura vai para a tela
+SQL_PERFIS = """
+    SELECT u.id, u.nome, u.foto, u.foto_hash, i.mime_miniatura, i.miniatura
+    FROM usuarios u
+    LEFT JOIN imagens i ON i.hash = u.foto_hash
+"""
+
+def _perfil(linha):
+    """ {id, nome, foto: miniatura (data URL) ou link antigo, foto_hash} """
+    return {
+        'id': linha['id'],
+        'nome': linha['nome'],
+        'foto': imagens.data_url(linha['mime_miniatura'], linha['miniatura']) or linha['foto'] or '',
+        'foto_hash': linha['foto_hash'],
+    }
+
+def _dados_foto(conn, dados):
+    """ (foto, foto_hash) para gravar no perfil: data URL vai para a tabela imagens, link fica como texto """
+    foto = dados.get('foto') or ''
+    foto_hash = imagens.guardar(conn, foto, dados.get('miniatura'))
+    if foto_hash:
+        return None, foto_hash
+    return foto, None
+
 class BoletoAPI:
-    def __init__(self):
+    def __init__(self, pasta_backup=backup.PASTA_BACKUP, backups_mantidos=backup.QTD_BACKUPS, instrumentar=None,
+                 arquivar_apos_dias=arquivamento.ARQUIVAR_APOS_DIAS, manutencao_ociosa=manutencao.OCIOSO_APOS):
         init_db() # Garantir que a tabela exista quando o programa for aberto
-        self.usuario_atual = None
+        self._usuario_atual = None # Perfil logado na janela (ver usuario_atual)
+        self._janela = None # Janela do Pywebview (para avisos de progresso)
+        self._pasta_backup = pasta_backup
+        self._backups_mantidos = backups_mantidos
+        self._arquivar_apos_dias = arquivar_apos_dias # None = não arquivar ao abrir
+
+        # Backup automático em segundo plano: a janela abre sem esperar a cópia
+        # (no modo um banco por perfil, cada banco tem o seu). Depois dele, os
+        # pagos antigos vão para o arquivo (ver _ao_terminar_backup)
+        self._backup_automatico = backup.fazer_backup_em_segundo_plano(
+            bancos_perfil.alvos_backup(self._pasta_backup), self._backups_mantidos,
+            ao_terminar=self._ao_terminar_backup
+        )
+
+        # Diagnóstico de lentidão (opcional): mede cada método chamado pelo JS e cada SQL
+        if instrumentar is None:
+            instrumentar = os.environ.get('BOLETOS_DIAGNOSTICO') == '1'
+        if instrumentar:
+            instrumentacao.coletor.ligar()
+        self._diagnostico = bool(instrumentar) # Mostra o painel de diagnóstico na janela
+        instrumentacao.instrumentar(self, excluir=('obter_metricas', 'configurar_instrumentacao', 'limpar_metricas'))
+
+        # Leituras num pool de threads, escritas em fila única; um buscar_boletos
+        # novo cancela o anterior (ex: filtro sendo digitado)
+        execucao.distribuir(self)
+
+        # Checkpoint, estatísticas e páginas livres quando a tela fica parada
+        # 'manutencao_ociosa' segundos (None desliga; ver backend/manutencao.py)
+        if manutencao_ociosa is not None:
+            manutencao.agendador.iniciar(manutencao_ociosa)
+
+    @property
+    def usuario_atual(self):
+        """ Perfil logado: o da sessão no modo servidor, o da janela no Pywebview """
+        sessao = sessao_atual.get()
+        return self._usuario_atual if sessao is None else sessao.usuario
+
+    @usuario_atual.setter
+    def usuario_atual(self, usuario):
+        sessao = sessao_atual.get()
+        if sessao is None:
+            self._usuario_atual = usuario
+        else:
+            sessao.usuario = usuario
+
+    def _ao_terminar_backup(self, caminhos, erro):
+        if erro:
+            print(f"Alerta: Não foi possível fazer backup automático: {erro}")
+        for caminho in caminhos:
+            print(f"Backup automático criado: {os.path.basename(caminho)}")
+
+        # Arquivar só depois da cópia do dia. Os lotes vão pela fila do
+        # escritor, como qualquer gravação (ver arquivar_pagos)
+        if self._arquivar_apos_dias is not None:
+            try:
+                resposta = BoletoAPI.arquivar_pagos(self, self._arquivar_apos_dias)
+            except RuntimeError:
+                return # Programa fechando: a fila já não aceita chamadas
+            if resposta['status'] == 'erro':
+                print(f"Alerta: {resposta['msg']}")
+            elif resposta['dados']['boletos']:
+                print(resposta['msg'])
+
+    def conectar_janela(self, janela):
+        """ Guarda a janela do Pywebview para o Python poder avisar o JS (ex: progresso) """
+        self._janela = janela
+
+    def _notificar_js(self, evento, dados):
+        """ Dispara um CustomEvent no JS: window.addEventListener(evento, e => e.detail) """
+        if not self._janela:
+            return
         try:
-            self.fazer_backup()
+            self._janela.evaluate_js(
+                f"window.dispatchEvent(new CustomEvent({json.dumps(evento)}, {{ detail: {json.dumps(dados)} }}))"
+            )
         except Exception as e:
-            print(f"Alerta: Não foi possível fazer backup automático: {e}")
+            print(f"Alerta: não foi possível avisar a tela ({evento}): {e}")
+
+    def _ler_alteracao(self, conn, usuario_id, antes, ids=None):
+        """
+        Delta de uma escrita, ainda na transação dela: 'antes' veio de
+        alteracoes.estado() antes de gravar; 'ids' (padrão: os de 'antes')
+        são relidos agora. Lote grande demais vira {'recarregar': True}.
+        """
+        ids = list(antes) if ids is None else ids
+        if len(ids) > alteracoes.MAXIMO_BOLETOS:
+            return {'recarregar': True}
+        depois = lotes.carregar(conn, usuario_id, ids, '*')
+        delta = alteracoes.calcular(antes, depois, _esqueleto_resumo(date.today()))
+        delta.update(alteracoes.nomes_alterados(conn, usuario_id, antes, depois, _esquemas_nomes(conn)))
+        delta['inseridos'] = _formatar_boletos(delta['inseridos'])
+        delta['atualizados'] = _formatar_boletos(delta['atualizados'])
+        return delta
+
+    def _publicar_alteracao(self, usuario_id, delta):
+        """ Depois do commit: invalida o cache, numera o delta e avisa a tela (evento 'boletos-alterados') """
+        cache.resultados.invalidar(usuario_id)
+        delta = alteracoes.registro.publicar(usuario_id, delta)
+        self._notificar_js('boletos-alterados', delta)
+        return delta
+
+    def obter_alteracoes(self, desde=None):
+        """
+        Alterações do perfil logado depois de 'desde' (o 'seq' da última
+        recebida); sem 'desde', só o seq atual. Para o modo servidor, que
+        não tem como empurrar o evento 'boletos-alterados' para o navegador.
+        'dados' None = algumas já foram descartadas: recarregar tudo.
+        """
+        if not self.estaLogado():
+            return {'status': 'erro', 'msg': 'Login necessário'}
+
+        usuario_id = self.usuario_atual['id']
+        seq = alteracoes.registro.seq(usuario_id)
+        dados = [] if desde is None else alteracoes.registro.desde(usuario_id, int(desde))
+        if dados:
+            seq = max(seq, dados[-1]['seq'])
+        return {'status': 'sucesso', 'usuario_id': usuario_id, 'seq': seq, 'dados': dados}
+
+    def _escolher_arquivo(self, tipos, salvar=False, nome_sugerido=''):
+        """ Abre o diálogo de arquivo do sistema e retorna o caminho escolhido (ou None) """
+        if not self._janela:
+            return None
+        import webview
+        if salvar:
+            escolhido = self._janela.create_file_dialog(
+                webview.SAVE_DIALOG, save_filename=nome_sugerido, file_types=tipos
+            )
+        else:
+            escolhido = self._janela.create_file_dialog(webview.OPEN_DIALOG, file_types=tipos)
+        if isinstance(escolhido, str):
+            return escolhido
+        return escolhido[0] if escolhido else None
 
     def fazer_backup(self):
-        # 1. Configurações
-        NOME_BANCO = 'sistema_boletos.db'
-        PASTA_BACKUP = 'backups'
-        
-        if not os.path.exists(PASTA_BACKUP):
-            os.makedirs(PASTA_BACKUP)
-        
-        # 2. Gera nome SÓ com a DATA (Sem hora) -> backup_2025-01-06.db
-        # Isso garante apenas 1 arquivo por dia
-        hoje = datetime.now().strftime('%Y-%m-%d')
-        nome_arquivo = f"backup_{hoje}.db"
-        caminho_destino = os.path.join(PASTA_BACKUP, nome_arquivo)
-        
-        msg = ""
+        """ Backup do dia (cópia online, verificada e compactada) + rotação, de cada banco """
+        try:
+            caminhos = backup.fazer_backups(
+                bancos_perfil.alvos_backup(self._pasta_backup), self._backups_mantidos,
+                ao_progredir=lambda p: self._notificar_js('progresso-backup', {'percentual': p})
+            )
+        except Exception as e:
+            return {'status': 'erro', 'msg': f'Falha no backup: {e}'}
 
-        # 3. Só faz o backup se ele AINDA NÃO EXISTIR hoje
-        if not os.path.exists(caminho_destino):
-            shutil.copy(NOME_BANCO, caminho_destino)
-            msg = f"Backup automático criado: {nome_arquivo}"
-            
-            # 4. ROTAÇÃO: Apaga os antigos para sobrar só 5
-            arquivos = sorted([
-                os.path.join(PASTA_BACKUP, f) 
-                for f in os.listdir(PASTA_BACKUP) 
-                if f.endswith('.db')
-            ], key=os.path.getmtime)
-
-            while len(arquivos) > 5:
-                arquivo_velho = arquivos.pop(0)
-                os.remove(arquivo_velho)
+        if len(caminhos) == 1:
+            msg = f"Backup automático criado: {os.path.basename(caminhos[0])}"
+        elif caminhos:
+            msg = f"{len(caminhos)} backups criados."
         else:
             msg = "Backup de hoje já existe."
 
         return {'status': 'sucesso', 'msg': msg}
 
+    def arquivar_pagos(self, apos_dias=None):
+        """
+        Move os pagos com vencimento mais antigo que 'apos_dias' (padrão: o da
+        BoletoAPI) para o arquivo de cada banco (ver backend/arquivamento.py).
+        Roda fora da fila do escritor e manda para ela um lote por vez: as
+        gravações da tela esperam no máximo um lote, não o arquivamento inteiro.
+        Não muda o resultado de nenhuma consulta, então o cache continua valendo.
+        """
+        if apos_dias is None:
+            apos_dias = self._arquivar_apos_dias or arquivamento.ARQUIVAR_APOS_DIAS
+        try:
+            resumo = arquivamento.arquivar_todos(
+                int(apos_dias), em_lote=lambda lote: execucao.executor.executar('arquivar_pagos', lote)
+            )
+        except RuntimeError:
+            raise # Programa fechando: a fila do escritor já não aceita lotes
+        except Exception as e:
+            return {'status': 'erro', 'msg': f'Não foi possível arquivar os boletos antigos: {e}'}
+        return {
+            'status': 'sucesso',
+            'msg': f"{resumo['boletos']} boletos pagos com vencimento antes de {resumo['ate']} foram para o arquivo.",
+            'dados': resumo,
+        }
+
+    def obter_metricas(self):
+        """ Histogramas recentes de cada método, comandos SQL mais custosos, consultas lentas e manutenção recente """
+        if not self.estaLogado():
+            return {'status': 'erro', 'msg': 'Login necessário'}
+        metricas = instrumentacao.coletor.metricas()
+        metricas['cache'] = cache.resultados.estatisticas()
+        metricas['manutencao'] = manutencao.agendador.historico()
+        return {'status': 'sucesso', 'dados': metricas}
+
+    def configurar_instrumentacao(self, ativo, limite_lenta_ms=None):
+        """ Liga/desliga o diagnóstico com o programa aberto """
+        if ativo:
+            instrumentacao.coletor.ligar(limite_lenta_ms)
+            return {'status': 'sucesso', 'msg': 'Diagnóstico ligado.'}
+        instrumentacao.coletor.desligar()
+        return {'status': 'sucesso', 'msg': 'Diagnóstico desligado.'}
+
+    def limpar_metricas(self):
+        instrumentacao.coletor.limpar()
+        return {'status': 'sucesso', 'msg': 'Métricas zeradas.'}
+
     def listar_perfis(self):
-        """ Retorna todos os usuários cadastrados para a tela de seleção """
-        conn = get_db_connection()
-        perfis = conn.execute("SELECT * FROM usuarios").fetchall()
-        conn.close()
-        return [dict(p) for p in perfis]
+        """ Retorna todos os usuários cadastrados para a tela de seleção (com a miniatura da foto) """
+        with conexao() as conn:
+            perfis = conn.execute(SQL_PERFIS).fetchall()
+        return [_perfil(p) for p in perfis]
+
+    def obter_foto(self, foto_hash):
+        """ A foto inteira de um perfil (data URL), pelo hash que veio em listar_perfis """
+        with conexao() as conn:
+            foto = imagens.obter(conn, foto_hash)
+        if foto is None:
+            return {'status': 'erro', 'msg': 'Foto não encontrada'}
+        return {'status': 'sucesso', 'dados': foto}
 
     def criar_perfil(self, dados):
-        """ Recebe {nome: 'Joao', foto: 'data:image/png...'} """
+        """ Recebe {nome: 'Joao', foto: 'data:image/png...', miniatura: 'data:image/jpeg...' (opcional)} """
         nome = dados['nome']
-        foto = dados.get('foto', '')
 
-        conn = get_db_connection()
         try:
-            conn.execute("INSERT INTO usuarios (nome, foto) VALUES (?, ?)", (nome, foto,))
-            conn.commit()
-            
-            user_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
-            conn.close()
+            with conexao() as conn:
+                foto, foto_hash = _dados_foto(conn, dados)
+                conn.execute("INSERT INTO usuarios (nome, foto, foto_hash) VALUES (?, ?, ?)", (nome, foto, foto_hash))
             return {'status': 'sucesso', 'msg': 'Perfil criado!'}
         except IntegrityError:
-            conn.close()
             return {'status': 'erro', 'msg': 'Já existe um perfil com este nome.'}
 
     def atualizar_perfil(self, dados):
+        """ Sem a chave 'foto' (ou com None), a foto atual é mantida """
         if not dados.get('id'):
             return {'status': 'erro', 'msg': 'ID do perfil não informado'}
             
-        conn = get_db_connection()
         try:
-            conn.execute("UPDATE usuarios SET nome = ?, foto = ? WHERE id = ?", 
-                         (dados['nome'], dados['foto'], dados['id']))
-            conn.commit()
-            conn.close()
+            with conexao() as conn:
+                if dados.get('foto') is None:
+                    conn.execute("UPDATE usuarios SET nome = ? WHERE id = ?", (dados['nome'], dados['id']))
+                else:
+                    foto, foto_hash = _dados_foto(conn, dados)
+                    conn.execute("UPDATE usuarios SET nome = ?, foto = ?, foto_hash = ? WHERE id = ?",
+                                 (dados['nome'], foto, foto_hash, dados['id']))
+                    imagens.remover_orfas(conn)
             return {'status': 'sucesso', 'msg': 'Perfil atualizado!'}
         except Exception as e:
-            conn.close()
             return {'status': 'erro', 'msg': str(e)}
 
     def excluir_perfil(self, id_usuario):
-        conn = get_db_connection()
         # Primeiro, verificamos se é o usuário atual para evitar crash
         if self.usuario_atual and self.usuario_atual['id'] == id_usuario:
             return {'status': 'erro', 'msg': 'Você não pode excluir o perfil que está logado!'}
+        if sessoes.perfil_em_uso(id_usuario):
+            return {'status': 'erro', 'msg': 'Este perfil está aberto em outro computador.'}
 
         # Opcional: Apagar boletos desse usuário também?
         # Por segurança, vamos apagar o usuário e seus boletos (CASCADE manual)
         # conn.execute("DELETE FROM boletos WHERE usuario_id = ?", (id_usuario,))
-        conn.execute("DELETE FROM usuarios WHERE id = ?", (id_usuario,))
-        
-        conn.commit()
-        conn.close()
+        with conexao() as conn:
+            conn.execute("DELETE FROM usuarios WHERE id = ?", (id_usuario,))
+            imagens.remover_orfas(conn)
+        if database.BANCOS_POR_PERFIL:
+            bancos_perfil.remover_banco(id_usuario)
+        cache.resultados.invalidar(id_usuario)
         return {'status': 'sucesso', 'msg': 'Perfil e dados excluídos.'}
 
     def entrar_por_id(self, id_usuario):
-        conn = get_db_connection()
-        user = conn.execute("SELECT * FROM usuarios WHERE id = ?", (id_usuario,)).fetchone()
-        conn.close()
+        with conexao() as conn:
+            user = conn.execute(SQL_PERFIS + " WHERE u.id = ?", (id_usuario,)).fetchone()
 
         if user:
-            self.usuario_atual = dict(user)
-            return {'status': 'sucesso', 'usuario': self.usuario_atual}
+            # No modo um banco por perfil, já abre (e migra, se preciso) o banco dele
+            database.obter_pool(user['id'])
+            self.usuario_atual = _perfil(user)
+            # seq: a tela só aplica as alterações depois desta (ver obter_alteracoes).
+            # diagnostico: o painel só aparece com a instrumentação ligada ao abrir, e só na janela
+            return {
+                'status': 'sucesso', 'usuario': self.usuario_atual, 'alteracoes': alteracoes.registro.seq(user['id']),
+                'diagnostico': self._diagnostico and sessao_atual.get() is None,
+            }
         return {'status': 'erro', 'msg': 'Usuário não encontrado'}
 
     def logout(self):
@@ -125,111 +473,123 @@ class BoletoAPI:
         if not self.usuario_atual:
             return {'status': 'erro', 'msg': 'Não logado'}
         try:
-            conn = get_db_connection()
-
             # Preparar dados
-            valor_por_parcela = float(dados['boleto']['valor'])
             data_inicial = datetime.strptime(dados['boleto']['vencimento'], '%Y-%m-%d').date()
             qtd_parcelas = int(dados['boleto']['parcelas'])
 
             # Lógica geração de datas
-            datas_vencimento = []
-
-            if dados['modo'] == 'custom' and dados['regra']:
-                # Modo personalizado: "15/30/45"
-                dias_extras = dados['regra'].split('/')
-                for dia in dias_extras:
-                    if dia == dias_extras[0]:
-                        datas_vencimento.append(data_inicial)
-                        continue
-                    if dia.strip():
-                        # Soma os dias à data inicial
-                        nova_data = data_inicial + timedelta(days=int(dia))
-                        datas_vencimento.append(nova_data)
-
-                qtd_parcelas = len(datas_vencimento)
-
-            else:
-                # Modo mensal padrão
-                datas_vencimento.append(data_inicial) # Adiciona a data escolhida como primeira
-                for i in range(1, qtd_parcelas):
-                    nova_data = data_inicial + timedelta(days=i * 30)
-                    datas_vencimento.append(nova_data)
-
-            for indice, data_venc in enumerate(datas_vencimento):
-                conn.execute('''
-                    INSERT INTO boletos (
-                        usuario_id, empresa, categoria, placa, descricao,
-                        valor_original, juros, tipo_juros, multa, valor_total,
-                        vencimento, numero_parcela, total_parcelas
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    self.usuario_atual['id'],
-                    dados['boleto']['empresa'],
-                    dados['boleto']['categoria'],
-                    dados['boleto']['placa'],
-                    dados['boleto']['descricao'],
-                    valor_por_parcela,
-                    dados['boleto']['juros'],
-                    dados['boleto']['tipoJuros'],
-                    dados['boleto']['multa'],
-                    valor_por_parcela, # Aqui você pode somar juros/multa se quiser
-                    data_venc.strftime('%Y-%m-%d'), # Converte data volta pra string
-                    indice + 1,    # Parcela atual (1, 2, 3...)
-                    qtd_parcelas   # Total (de 3)
-                    ))
-
-            conn.commit()
-            conn.close()
-            return { 'status': 'sucesso', 'msg': f'{qtd_parcelas} boletos gerados!' }
+            datas_vencimento = gerar_vencimentos(data_inicial, qtd_parcelas, dados['modo'], dados['regra'])
+            qtd_parcelas = len(datas_vencimento)
+
+            # Todas as parcelas em um único executemany
+            usuario_id = self.usuario_atual['id']
+            with conexao(usuario_id) as conn:
+                # AUTOINCREMENT: as parcelas novas são as de id acima do maior de agora
+                ultimo_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM boletos").fetchone()[0]
+                inserir(conn, linhas_parcelas(usuario_id, dados['boleto'], datas_vencimento))
+                novos = [linha[0] for linha in conn.execute(
+                    "SELECT id FROM boletos WHERE id > ? AND usuario_id = ?", (ultimo_id, usuario_id)
+                )]
+                delta = self._ler_alteracao(conn, usuario_id, {}, novos)
+            alteracao = self._publicar_alteracao(usuario_id, delta)
+
+            return { 'status': 'sucesso', 'msg': f'{qtd_parcelas} boletos gerados!', 'alteracao': alteracao }
         
         except Exception as e:
             return { 'status': 'erro', 'msg': str(e) }
 
-    def calculaValorComJuros(self, boleto):
-        tipo_juros = boleto.get('tipo_juros', 'R$')
-
-        # Tratamento das datas (ignora o horário)
-        data_hoje = date.today()
-        if isinstance(boleto['vencimento'], str):
-            data_vencimento = date.fromisoformat(boleto['vencimento'])
-        else:
-            data_vencimento = boleto['vencimento']
-
-        data_vencimento_util = self.proximo_dia_util(data_vencimento)
-
-        valor_original = float(boleto['valor_original'])
-        valor_juros_input = float(boleto['juros']) if boleto['juros'] else 0.0
-        valor_multa_input = float(boleto['multa']) if boleto['multa'] else 0.0
-
-        # Retorna o valor original se a data de vencimento é anterior a atual
-        if data_hoje <= data_vencimento_util:
-            return valor_original
+    def importar_arquivo(self, caminho=None):
+        """
+        Importa uma planilha CSV ou um extrato OFX para o perfil logado.
+        Sem caminho, abre a janela de escolha de arquivo.
+        O progresso chega no JS pelo evento 'progresso-importacao'.
+        A janela abre na thread de quem chamou: só a importação entra na
+        fila do escritor (as outras gravações não esperam a escolha).
+        """
+        if not self.estaLogado():
+            return {'status': 'erro', 'msg': 'Login necessário'}
 
-        dias_atraso = (data_hoje - data_vencimento_util).days
+        if not caminho:
+            caminho = self._escolher_arquivo(('Planilhas e extratos (*.csv;*.txt;*.ofx)', 'Todos os arquivos (*.*)'))
+            if not caminho:
+                return {'status': 'erro', 'msg': 'Nenhum arquivo selecionado.'}
 
-        valor_juros_total = 0.0
+        return execucao.executor.executar('importar_arquivo', self._importar_arquivo, caminho)
 
-        # Cálculo valor juros
-        if tipo_juros == 'R$':
-            # Valor fixo diário
-            valor_juros_total = dias_atraso * valor_juros_input
-        elif tipo_juros == '%':
-            # Juros simples diários
-            valor_juros_total = valor_original * (valor_juros_input / 100) * dias_atraso
+    def _importar_arquivo(self, caminho):
+        gravados = 0
 
-        valor_atualizado = valor_original + valor_juros_total + valor_multa_input
-        return round(valor_atualizado, 2)
+        def ao_progredir(resumo):
+            nonlocal gravados
+            gravados = resumo['boletos'] # Boletos dos lotes já confirmados
+            self._notificar_js('progresso-importacao', resumo)
 
-    def buscar_boletos(self, filtros, pagina=1, itens_por_pagina=30):
-        if not self.estaLogado():
-            return {'status': 'erro', 'msg': 'Login necessário'}
+        try:
+            with conexao(self.usuario_atual['id']) as conn:
+                resumo = importacao.importar(caminho, self.usuario_atual['id'], conn, ao_progredir=ao_progredir)
+        except Exception as e:
+            return {'status': 'erro', 'msg': f'Falha na importação: {e}'}
+        finally:
+            # Mesmo com falha, os lotes anteriores já foram gravados
+            # (muitos boletos: a tela recarrega em vez de receber as linhas)
+            alteracao = None
+            if gravados:
+                alteracao = self._publicar_alteracao(self.usuario_atual['id'], {'recarregar': True})
+
+        msg = f"{resumo['boletos']} boletos importados."
+        if resumo['qtd_erros']:
+            msg += f" {resumo['qtd_erros']} linhas ignoradas por erro."
+        return {'status': 'sucesso', 'msg': msg, 'dados': resumo, 'alteracao': alteracao}
 
-        conn = get_db_connection()
-        params = [self.usuario_atual['id']]
+    def calculaValorComJuros(self, boleto):
+        """ Valor atualizado de UM boleto em reais (para listas, use juros.calcular_lote) """
+        tipo_juros = boleto.get('tipo_juros', 'R$')
+        valores, _ = calcular_lote(
+            [boleto['vencimento']], [dinheiro.para_centavos(boleto['valor_original'])],
+            [tipo_juros], [dinheiro.juros_para_banco(tipo_juros, boleto['juros'])],
+            [dinheiro.para_centavos(boleto['multa'])]
+        )
+        return dinheiro.para_reais(valores[0])
+
+    def _montar_filtros(self, filtros, conn=None, campos=None):
+        """
+        Monta o trecho 'FROM ... WHERE ...' e os parâmetros a partir do dicionário de filtros da tela.
+        Com 'conn', inclui os boletos arquivados quando os filtros chegam até
+        eles (ver backend/arquivamento.py): o FROM vira um UNION ALL dos dois
+        bancos, só com os 'campos' pedidos (padrão: todos).
+        """
+        condicoes, params = self._condicoes_filtros(filtros, conn)
+        if conn is None or not arquivamento.alcanca(conn, filtros.get('data_inicio'), filtros.get('status')):
+            return f"{_FROM_PRINCIPAL} {condicoes}", params
+
+        # O índice de texto só cobre o banco principal: no arquivo a busca é por LIKE.
+        # Categoria e empresa usam os ids do próprio arquivo (ou o texto, num arquivo de antes deles).
+        esquema = arquivamento.ESQUEMA if nomes.tem_ids(conn, arquivamento.ESQUEMA) else None
+        condicoes_arquivo, params_arquivo = self._condicoes_filtros(filtros, conn, usar_fts=False, esquema_nomes=esquema)
+        lista, do_arquivo = arquivamento.selecao(conn, campos)
+        sql_base = f"""
+            FROM (
+                SELECT {lista} FROM main.{nomes.VISAO} WHERE {condicoes}
+                UNION ALL
+                SELECT {do_arquivo} FROM {arquivamento.ESQUEMA}.{nomes.fonte(conn, arquivamento.ESQUEMA)}
+                WHERE {condicoes_arquivo}
+            ) AS boletos WHERE 1 = 1"""
+        return sql_base, params + params_arquivo
+
+    def _condicoes_filtros(self, filtros, conn=None, usar_fts=True, esquema_nomes='main'):
+        """
+        Condições do WHERE (já com o usuário) e os parâmetros, para _montar_filtros.
+        Com 'conn', categoria e empresa são procuradas nas tabelas de nomes de
+        'esquema_nomes' e comparadas por id (ver backend/nomes.py); sem ela,
+        ou com esquema_nomes=None, compara o texto.
+        """
+        if conn is None:
+            esquema_nomes = None
+        usuario_id = self.usuario_atual['id']
+        params = [usuario_id]
         
-        # 1. Construção Dinâmica do SQL
-        sql_base = " FROM boletos WHERE usuario_id = ?"
+        # Construção Dinâmica do SQL
+        condicoes = "usuario_id = ?"
 
         dt_ini = filtros.get('data_inicio')
         dt_fim = filtros.get('data_fim')
@@ -251,7 +611,7 @@ class BoletoAPI:
                 hoje_str = date.today().strftime('%Y-%m-%d')
                 
                 # Lógica: (Critério escolhido) OU (Pendente e Atrasado)
-                sql_base += f""" 
+                condicoes += f""" 
                     AND (
                         ({criterio_data}) 
                         OR 
@@ -262,20 +622,38 @@ class BoletoAPI:
                 params.append(hoje_str)
             else:
                 # Lógica Estrita (Só o critério)
-                sql_base += f" AND ({criterio_data})"
+                condicoes += f" AND ({criterio_data})"
                 params.extend(params_data)
 
         if filtros.get('status'):
-            sql_base += " AND status = ?"
+            condicoes += " AND status = ?"
             params.append(filtros['status'])
 
-        if filtros.get('empresa'):
-            sql_base += " AND empresa LIKE ?"
-            params.append(f"%{filtros['empresa']}%")
-
-        if filtros.get('placa'):
-            sql_base += " AND placa LIKE ?" # LIKE permite buscar parcial
-            params.append(f"%{filtros['placa']}%")
+        # Busca parcial (ex: "ofic" acha "Oficina"): a empresa na tabela de nomes, a placa pelo índice de texto
+        texto = (filtros.get('empresa') or '').strip()
+        if texto and esquema_nomes:
+            condicao, params_ids = _filtro_ids(
+                'empresa', nomes.ids(conn, usuario_id, 'empresa', "nome LIKE ?", [f"%{texto}%"], esquema_nomes)
+            )
+            condicoes += f" AND {condicao}"
+            params.extend(params_ids)
+        elif texto:
+            condicao, params_texto = _filtro_texto(['empresa'], [texto], usar_fts)
+            condicoes += f" AND {condicao}"
+            params.extend(params_texto)
+
+        texto = (filtros.get('placa') or '').strip()
+        if texto:
+            condicao, params_texto = _filtro_texto(['placa'], [texto], usar_fts)
+            condicoes += f" AND {condicao}"
+            params.extend(params_texto)
+
+        # Busca livre: cada palavra precisa aparecer na empresa, placa ou descrição
+        termos = (filtros.get('busca') or '').split()
+        if termos:
+            condicao, params_texto = _filtro_texto(['empresa', 'placa', 'descricao'], termos, usar_fts)
+            condicoes += f" AND {condicao}"
+            params.extend(params_texto)
 
         cats = filtros.get('categoria')
         
@@ -284,69 +662,94 @@ class BoletoAPI:
             if isinstance(cats, list) and len(cats) > 0:
                 # Cria placeholders dinâmicos (?, ?, ?)
                 placeholders = ','.join(['?'] * len(cats))
-                sql_base += f" AND categoria IN ({placeholders})"
-                params.extend(cats)
+                if esquema_nomes:
+                    condicao, params_ids = _filtro_ids(
+                        'categoria', nomes.ids(conn, usuario_id, 'categoria', f"nome IN ({placeholders})", cats, esquema_nomes)
+                    )
+                    condicoes += f" AND {condicao}"
+                    params.extend(params_ids)
+                else:
+                    condicoes += f" AND categoria IN ({placeholders})"
+                    params.extend(cats)
             
-            # Se for string (caso legado ou busca simples), mantém o LIKE
+            # Se for string (caso legado ou busca simples), mantém o LIKE (sobre os nomes)
             elif isinstance(cats, str) and cats.strip():
-                sql_base += " AND categoria LIKE ?"
-                params.append(f"%{cats}%")
+                if esquema_nomes:
+                    condicao, params_ids = _filtro_ids(
+                        'categoria', nomes.ids(conn, usuario_id, 'categoria', "nome LIKE ?", [f"%{cats}%"], esquema_nomes)
+                    )
+                    condicoes += f" AND {condicao}"
+                    params.extend(params_ids)
+                else:
+                    condicoes += " AND categoria LIKE ?"
+                    params.append(f"%{cats}%")
 
         if filtros.get('data_pagamento'):
-            sql_base += " AND data_pagamento = ?"
+            condicoes += " AND data_pagamento = ?"
             params.append(filtros['data_pagamento'])
 
-        # 2. Paginação
-        total_itens = conn.execute(f"SELECT COUNT(*) {sql_base}", params).fetchone()[0]
-        total_paginas = math.ceil(total_itens / itens_por_pagina)
-        
-        offset = (pagina - 1) * itens_por_pagina
-        sql_final = f"""
-            SELECT * {sql_base} 
-            ORDER BY 
-                CASE 
-                    WHEN status = 'Pendente' AND vencimento < DATE('now', 'localtime') THEN 1 
-                    WHEN status = 'Pendente' THEN 2 
-                    ELSE 3 
-                END ASC,
-                vencimento ASC,
-                valor_original DESC
-            LIMIT ? OFFSET ?
-        """
-        params.extend([itens_por_pagina, offset])
-        
-        boletos_db = conn.execute(sql_final, params).fetchall()
-        conn.close()
-
-        # 3. Processamento (REUTILIZANDO SUA LÓGICA)
-        lista_processada = []
-        hoje = date.today()
-
-        for b in boletos_db:
-            boleto = dict(b)
-            
-            # Garante que data é objeto Date
-            dt_vencimento = datetime.strptime(boleto['vencimento'], '%Y-%m-%d').date()
-
-            dt_limite = self.proximo_dia_util(dt_vencimento) # Data limite para não ser considerado atraso
+        return condicoes, params
 
-            valor_final = boleto['valor_original']
-            dias_atraso = 0
-            esta_vencido = False
+    @em_cache(depende_da_data=True)
+    def buscar_boletos(self, filtros, pagina=1, itens_por_pagina=30, cursor=None, contar_total=None, colunas=None):
+        """
+        Lista os boletos filtrados, uma página por vez.
+
+        Sem cursor, pagina por número (LIMIT/OFFSET), como sempre foi.
+        Filtros aceitos: data_inicio, data_fim, incluir_vencidos, status,
+        empresa, placa, categoria, data_pagamento e busca (texto livre em
+        empresa/placa/descrição; com ordenar_relevancia, os melhores primeiro).
+
+        Com cursor (use '' para a primeira página), cada resposta traz o
+        'proximo_cursor' e a próxima página começa direto do último boleto
+        visto, pelo índice, sem reler as páginas anteriores.
+        O total de itens só é contado quando contar_total for verdadeiro
+        (padrão: sim no modo por número, não no modo cursor).
+
+        Com colunas (ex: ['id', 'empresa', 'valor_atualizado']), 'dados' vem
+        compacto, {'colunas': [...], 'linhas': [[...], ...]}: só esses campos
+        (do banco ou de CAMPOS_CALCULADOS), na ordem pedida, sem repetir os
+        nomes em cada boleto. Sem colunas, uma lista de dicts
+        com todos os campos, como sempre foi.
+        """
+        if not self.estaLogado():
+            return {'status': 'erro', 'msg': 'Login necessário'}
 
-            if boleto['status'] == 'Pendente' and hoje > dt_limite:
-                dias_atraso = (hoje - dt_limite).days
-                esta_vencido = True
-                
-                # AQUI ESTÁ A MÁGICA: Reutilizamos sua função!
-                valor_final = self.calculaValorComJuros(boleto)
+        if contar_total is None:
+            contar_total = cursor is None
+        try:
+            _ler_cursor(cursor)
+        except ValueError as e:
+            return {'status': 'erro', 'msg': str(e)}
 
-            # Injeta dados extras para o HTML
-            boleto['valor_atualizado'] = valor_final
-            boleto['dias_atraso'] = dias_atraso
-            boleto['esta_vencido'] = esta_vencido
-            
-            lista_processada.append(boleto)
+        with conexao(self.usuario_atual['id']) as conn:
+            campos = None
+            if colunas is not None:
+                do_banco = arquivamento.colunas(conn, tabela=nomes.VISAO)
+                existentes = do_banco + list(CAMPOS_CALCULADOS)
+                desconhecidas = sorted(set(colunas) - set(existentes))
+                if desconhecidas or not colunas:
+                    return {'status': 'erro', 'msg': f"Colunas inválidas: {', '.join(desconhecidas) or 'nenhuma'}"}
+                colunas = list(dict.fromkeys(colunas)) # Na ordem pedida, sem repetir
+
+                # Só o que a resposta usa, mais as chaves da ordenação e o que os juros leem
+                necessarias = set(colunas) | set(_CAMPOS_ORDEM)
+                if 'juros' in necessarias:
+                    necessarias.add('tipo_juros')
+                if necessarias & set(CAMPOS_CALCULADOS):
+                    necessarias |= set(_CAMPOS_JUROS)
+                campos = [c for c in do_banco if c in necessarias]
+
+            boletos_db, total_itens, proximo_cursor = self._buscar_pagina(
+                conn, filtros, pagina, itens_por_pagina, cursor, contar_total, campos
+            )
+        total_paginas = math.ceil(total_itens / itens_por_pagina) if total_itens is not None else None
+
+        # 3. Processamento: juros/multa da página inteira de uma vez
+        if colunas is not None:
+            lista_processada = _tabela_boletos(boletos_db, colunas)
+        else:
+            lista_processada = _formatar_boletos(boletos_db)
 
         return {
             'status': 'sucesso',
@@ -354,48 +757,221 @@ class BoletoAPI:
             'paginacao': {
                 'atual': pagina,
                 'total_paginas': total_paginas,
-                'total_itens': total_itens
+                'total_itens': total_itens,
+                'proximo_cursor': proximo_cursor
             }
         }
 
+    def _buscar_pagina(self, conn, filtros, pagina, itens_por_pagina, cursor, contar_total, campos=None):
+        """
+        (linhas da página, total de itens ou None, próximo cursor) de
+        buscar_boletos, numa conexão só. campos: colunas lidas (padrão: todas).
+        """
+        # 1. Filtros
+        sql_base, params = self._montar_filtros(filtros, conn, campos=campos)
+        selecao = ', '.join(f'boletos.{c}' for c in campos) if campos else 'boletos.*'
+
+        # 2. Paginação (a contagem não precisa ler as linhas dos dois bancos, só os ids)
+        total_itens = None
+        if contar_total:
+            sql_contagem, params_contagem = self._montar_filtros(filtros, conn, campos=['id'])
+            total_itens = conn.execute(f"SELECT COUNT(*) {sql_contagem}", params_contagem).fetchone()[0]
+
+        proximo_cursor = None
+        if cursor is not None:
+            boletos_db, proximo_cursor = self._buscar_pagina_cursor(
+                conn, sql_base, params, cursor, itens_por_pagina, selecao
+            )
+        else:
+            offset = (pagina - 1) * itens_por_pagina
+            sql_pagina = sql_base
+            params_pagina = params
+            ordem_relevancia = ""
+            com_arquivo = not sql_base.startswith(_FROM_PRINCIPAL)
+            if com_arquivo:
+                # O UNION ALL com o arquivo só leva as chaves da ordenação para o
+                # sort; as linhas da página são lidas depois, pelo id
+                sql_pagina, params_pagina = self._montar_filtros(
+                    filtros, conn, campos=['id', 'status', 'vencimento', 'valor_original']
+                )
+            termos = [t for t in (filtros.get('busca') or '').split() if len(t) >= 3]
+            # (só sem o arquivo: o índice de texto é do banco principal)
+            if filtros.get('ordenar_relevancia') and termos and database.FTS_DISPONIVEL and not com_arquivo:
+                # Melhor resultado da busca livre primeiro (bm25: menor = mais relevante).
+                # A nota vem de um JOIN com o resultado da busca (calculada uma vez por boleto).
+                sql_pagina = sql_base.replace(_FROM_PRINCIPAL, f"""
+                    FROM {nomes.VISAO} AS boletos
+                    JOIN (SELECT rowid AS fts_id, bm25(boletos_fts) AS relevancia
+                          FROM boletos_fts WHERE boletos_fts MATCH ?) AS busca
+                      ON busca.fts_id = boletos.id
+                    WHERE""", 1)
+                params_pagina = [_expressao_fts(termos, ['empresa', 'placa', 'descricao'])] + params
+                ordem_relevancia = "busca.relevancia ASC,"
+
+            sql_final = f"""
+                SELECT {'boletos.id' if com_arquivo else selecao} {sql_pagina} 
+                ORDER BY {ordem_relevancia}
+                    CASE 
+                        WHEN status = 'Pendente' AND vencimento < DATE('now', 'localtime') THEN 1 
+                        WHEN status = 'Pendente' THEN 2 
+                        ELSE 3 
+                    END ASC,
+                    vencimento ASC,
+                    valor_original DESC,
+                    id ASC
+                LIMIT ? OFFSET ?
+            """
+
+            boletos_db = conn.execute(sql_final, params_pagina + [itens_por_pagina, offset]).fetchall()
+            if com_arquivo:
+                boletos_db = arquivamento.linhas(conn, [linha[0] for linha in boletos_db], campos)
+
+        return boletos_db, total_itens, proximo_cursor
+
+    def _buscar_pagina_cursor(self, conn, sql_base, params, cursor, limite, selecao='*'):
+        """
+        Paginação por chave (keyset).
+
+        A ordem da listagem (vencidos, pendentes, demais; depois vencimento,
+        maior valor e id) é a mesma coisa que: primeiro TODOS os pendentes
+        por vencimento, depois os demais por vencimento. Por isso a busca é
+        feita em dois trechos, cada um percorrendo um índice já ordenado e
+        começando logo depois da chave do último boleto da página anterior.
+        """
+        chave = _ler_cursor(cursor)
+        trechos = [
+            (0, "status = 'Pendente'"),
+            (1, "status IS NOT 'Pendente'"),
+        ]
+
+        linhas = []
+        for trecho, condicao in trechos:
+            if chave and trecho < chave[0]:
+                continue
+
+            sql = f"SELECT {selecao} {sql_base} AND {condicao}"
+            params_trecho = list(params)
+
+            if chave and trecho == chave[0]:
+                _, venc, valor, id_boleto = chave
+                # O "vencimento >= ?" isolado deixa o SQLite usar o índice como ponto de partida
+                sql += """
+                    AND vencimento >= ?
+                    AND (vencimento > ? OR valor_original < ? OR (valor_original = ? AND id > ?))
+                """
+                params_trecho += [venc, venc, valor, valor, id_boleto]
+
+            sql += " ORDER BY vencimento ASC, valor_original DESC, id ASC LIMIT ?"
+            # Pede um a mais para saber se existe próxima página
+            params_trecho.append(limite + 1 - len(linhas))
+
+            linhas.extend(conn.execute(sql, params_trecho).fetchall())
+            if len(linhas) > limite:
+                break
+
+        proximo_cursor = None
+        if len(linhas) > limite:
+            linhas = linhas[:limite]
+            ultima = linhas[-1]
+            trecho = 0 if ultima['status'] == 'Pendente' else 1
+            proximo_cursor = _gerar_cursor(trecho, ultima['vencimento'], ultima['valor_original'], ultima['id'])
+
+        return linhas, proximo_cursor
+
+    def exportar_boletos(self, filtros, formato='csv', caminho=None):
+        """
+        Exporta TODOS os boletos que batem com os filtros (os mesmos da
+        listagem) para CSV ou XLSX, com valor atualizado e dias de atraso.
+        Sem caminho, abre a janela de "Salvar como".
+        O progresso chega no JS pelo evento 'progresso-exportacao'.
+        A janela de "Salvar como" abre na thread de quem chamou; só a
+        exportação ocupa uma thread de leitura.
+        """
+        if not self.estaLogado():
+            return {'status': 'erro', 'msg': 'Login necessário'}
+        if formato not in ('csv', 'xlsx'):
+            return {'status': 'erro', 'msg': f'Formato inválido: {formato}'}
+
+        if not caminho:
+            caminho = self._escolher_arquivo(
+                (f'Arquivo {formato.upper()} (*.{formato})',),
+                salvar=True,
+                nome_sugerido=f"boletos_{date.today().strftime('%Y-%m-%d')}.{formato}"
+            )
+            if not caminho:
+                return {'status': 'erro', 'msg': 'Nenhum arquivo selecionado.'}
+
+        return execucao.executor.executar('exportar_boletos', self._exportar_boletos, filtros, formato, caminho)
+
+    def _exportar_boletos(self, filtros, formato, caminho):
+        try:
+            with conexao(self.usuario_atual['id']) as conn:
+                sql_base, params = self._montar_filtros(filtros, conn, campos=exportacao.COLUNAS_DO_BANCO)
+                # Mesma ordem da listagem: pendentes (vencidos primeiro) e depois os demais
+                # (só as colunas que vão para o arquivo)
+                sql = f"""
+                    SELECT {', '.join(exportacao.COLUNAS_DO_BANCO)} {sql_base}
+                    ORDER BY status IS NOT 'Pendente', vencimento ASC, valor_original DESC, id ASC
+                """
+                total = conn.execute(f"SELECT COUNT(*) {sql_base}", params).fetchone()[0] or 1
+
+                def ao_escrever(linhas):
+                    self._notificar_js('progresso-exportacao', {
+                        'linhas': linhas,
+                        'percentual': min(100, int(linhas * 100 / total)),
+                    })
+
+                linhas = exportacao.exportar(conn, sql, params, caminho, formato, ao_escrever)
+        except Exception as e:
+            return {'status': 'erro', 'msg': f'Falha na exportação: {e}'}
+
+        return {'status': 'sucesso', 'msg': f'{linhas} boletos exportados para {os.path.basename(caminho)}', 'dados': {'linhas': linhas, 'caminho': caminho}}
+
     def excluir_boleto(self, id_boleto):
         if not self.estaLogado():
             return {'status': 'erro', 'msg': 'Login necessário'}
         
-        conn = get_db_connection()
         # O filtro usuario_id garante que ninguém apague boleto dos outros
-        cursor = conn.execute("DELETE FROM boletos WHERE id = ? AND usuario_id = ?", 
-                              (id_boleto, self.usuario_atual['id']))
-        conn.commit()
-        rows = cursor.rowcount
-        conn.close()
+        usuario_id = self.usuario_atual['id']
+        with conexao(usuario_id) as conn:
+            arquivamento.restaurar(conn, usuario_id, [id_boleto])
+            antes = alteracoes.estado(conn, usuario_id, [id_boleto])
+            cursor = conn.execute("DELETE FROM boletos WHERE id = ? AND usuario_id = ?", 
+                                  (id_boleto, usuario_id))
+            rows = cursor.rowcount
+            delta = self._ler_alteracao(conn, usuario_id, antes)
         
         if rows > 0:
-            return {'status': 'sucesso', 'msg': 'Boleto excluído com sucesso!'}
+            alteracao = self._publicar_alteracao(usuario_id, delta)
+            return {'status': 'sucesso', 'msg': 'Boleto excluído com sucesso!', 'alteracao': alteracao}
         return {'status': 'erro', 'msg': 'Boleto não encontrado.'}
 
     def pagar_boleto(self, dados):
         if not self.estaLogado():
             return {'status': 'erro', 'msg': 'Login necessário'}
         
-        conn = get_db_connection()
         id_boleto = dados['id']
         banco = dados['banco']
         data_pagamento = dados['data']
-        valor_pago = float(dados['valor'])
+        valor_pago = dinheiro.para_centavos(dados['valor'])
         
-        conn.execute('''
-            UPDATE boletos 
-            SET status = 'Pago', 
-                data_pagamento = ?, 
-                banco_pagamento = ?,
-                valor_total = ?
-            WHERE id = ? AND usuario_id = ?
-        ''', (data_pagamento, banco, valor_pago, id_boleto, self.usuario_atual['id']))
+        usuario_id = self.usuario_atual['id']
+        with conexao(usuario_id) as conn:
+            # Boleto arquivado volta para o banco principal antes de mudar
+            arquivamento.restaurar(conn, usuario_id, [id_boleto])
+            antes = alteracoes.estado(conn, usuario_id, [id_boleto])
+            conn.execute('''
+                UPDATE boletos 
+                SET status = 'Pago', 
+                    data_pagamento = ?, 
+                    banco_pagamento = ?,
+                    valor_total = ?
+                WHERE id = ? AND usuario_id = ?
+            ''', (data_pagamento, banco, valor_pago, id_boleto, usuario_id))
+            delta = self._ler_alteracao(conn, usuario_id, antes)
+        alteracao = self._publicar_alteracao(usuario_id, delta)
         
-        conn.commit()
-        conn.close()
-        return {'status': 'sucesso', 'msg': 'Pagamento Registrado'}
+        return {'status': 'sucesso', 'msg': 'Pagamento Registrado', 'alteracao': alteracao}
 
     def atualizar_boleto(self, dados):
         if not self.estaLogado():
@@ -405,26 +981,35 @@ class BoletoAPI:
         id_boleto = dados['id']
         
         try:
-            conn = get_db_connection()
             # Convertendo a data para ISO
             data_venc = datetime.strptime(boleto['vencimento'], '%Y-%m-%d').date()
             
-            conn.execute('''
-                UPDATE boletos SET
-                    empresa = ?, categoria = ?, placa = ?, descricao = ?,
-                    vencimento = ?, valor_original = ?, 
-                    juros = ?, multa = ?, tipo_juros = ?
-                WHERE id = ? AND usuario_id = ?
-            ''', (
-                boleto['empresa'], boleto['categoria'], boleto['placa'], boleto['descricao'],
-                data_venc, float(boleto['valor']), 
-                float(boleto['juros'] or 0), float(boleto['multa'] or 0), boleto['tipoJuros'],
-                id_boleto, self.usuario_atual['id']
-            ))
+            usuario_id = self.usuario_atual['id']
+            with conexao(usuario_id) as conn:
+                arquivamento.restaurar(conn, usuario_id, [id_boleto])
+                antes = alteracoes.estado(conn, usuario_id, [id_boleto])
+                nomes.cadastrar(conn, 'empresa', [(usuario_id, boleto['empresa'])])
+                nomes.cadastrar(conn, 'categoria', [(usuario_id, boleto['categoria'])])
+                conn.execute('''
+                    UPDATE boletos SET
+                        empresa_id = (SELECT id FROM empresas WHERE usuario_id = ?12 AND nome = ?1),
+                        categoria_id = (SELECT id FROM categorias WHERE usuario_id = ?12 AND nome = ?2),
+                        placa = ?3, descricao = ?4,
+                        vencimento = ?5, vencimento_util = ?6, valor_original = ?7,
+                        juros = ?8, multa = ?9, tipo_juros = ?10
+                    WHERE id = ?11 AND usuario_id = ?12
+                ''', (
+                    boleto['empresa'], boleto['categoria'], boleto['placa'], boleto['descricao'],
+                    data_venc.strftime('%Y-%m-%d'), self.proximo_dia_util(data_venc).strftime('%Y-%m-%d'),
+                    dinheiro.para_centavos(boleto['valor']),
+                    dinheiro.juros_para_banco(boleto['tipoJuros'], boleto['juros']),
+                    dinheiro.para_centavos(boleto['multa']), boleto['tipoJuros'],
+                    id_boleto, usuario_id
+                ))
+                delta = self._ler_alteracao(conn, usuario_id, antes)
+            alteracao = self._publicar_alteracao(usuario_id, delta)
             
-            conn.commit()
-            conn.close()
-            return {'status': 'sucesso', 'msg': 'Boleto atualizado!'}
+            return {'status': 'sucesso', 'msg': 'Boleto atualizado!', 'alteracao': alteracao}
         except Exception as e:
             return {'status': 'erro', 'msg': str(e)}
 
@@ -432,21 +1017,97 @@ class BoletoAPI:
         if not self.estaLogado():
             return {'status': 'erro', 'msg': 'Login necessário'}
         
-        conn = get_db_connection()
         # Volta para Pendente, apaga a data, o banco e o valor total pago
         # Mantém o valor original e os dados do boleto intactos
-        conn.execute('''
-            UPDATE boletos 
-            SET status = 'Pendente', 
-                data_pagamento = NULL, 
-                banco_pagamento = NULL,
-                valor_total = valor_original
-            WHERE id = ? AND usuario_id = ?
-        ''', (id_boleto, self.usuario_atual['id']))
+        usuario_id = self.usuario_atual['id']
+        with conexao(usuario_id) as conn:
+            arquivamento.restaurar(conn, usuario_id, [id_boleto])
+            antes = alteracoes.estado(conn, usuario_id, [id_boleto])
+            conn.execute('''
+                UPDATE boletos 
+                SET status = 'Pendente', 
+                    data_pagamento = NULL, 
+                    banco_pagamento = NULL,
+                    valor_total = valor_original
+                WHERE id = ? AND usuario_id = ?
+            ''', (id_boleto, usuario_id))
+            delta = self._ler_alteracao(conn, usuario_id, antes)
+        alteracao = self._publicar_alteracao(usuario_id, delta)
         
-        conn.commit()
-        conn.close()
-        return {'status': 'sucesso', 'msg': 'Pagamento cancelado (Estorno realizado)'}
+        return {'status': 'sucesso', 'msg': 'Pagamento cancelado (Estorno realizado)', 'alteracao': alteracao}
+
+    def _ids_do_lote(self, conn, dados):
+        """ Ids de dados['ids'] ou, sem eles, todos os que batem com dados['filtros'] (os mesmos da listagem) """
+        if dados.get('ids') is not None:
+            return lotes.normalizar_ids(dados['ids'])
+        sql_base, params = self._montar_filtros(dados.get('filtros') or {}, conn)
+        # Um a mais para saber se passou do limite
+        linhas = conn.execute(f"SELECT id {sql_base} ORDER BY id LIMIT ?", params + [lotes.MAXIMO_LOTE + 1])
+        return [linha[0] for linha in linhas]
+
+    def _em_lote(self, dados, operacao, feito):
+        """
+        Roda operacao(conn, usuario_id, ids) numa transação só (os arquivados
+        voltam antes para o banco principal).
+        Retorna o resultado de cada boleto em dados['itens'].
+        """
+        if not self.estaLogado():
+            return {'status': 'erro', 'msg': 'Login necessário'}
+
+        usuario_id = self.usuario_atual['id']
+        try:
+            with conexao(usuario_id) as conn:
+                ids = self._ids_do_lote(conn, dados)
+                if not ids:
+                    return {'status': 'erro', 'msg': 'Nenhum boleto selecionado.'}
+                if len(ids) > lotes.MAXIMO_LOTE:
+                    return {'status': 'erro', 'msg': f'Selecione no máximo {lotes.MAXIMO_LOTE} boletos por vez.'}
+                arquivamento.restaurar(conn, usuario_id, ids)
+                antes = alteracoes.estado(conn, usuario_id, ids) if len(ids) <= alteracoes.MAXIMO_BOLETOS else {}
+                itens = operacao(conn, usuario_id, ids)
+                delta = self._ler_alteracao(conn, usuario_id, antes, ids)
+        except (KeyError, TypeError, ValueError, OverflowError, InvalidOperation) as e:
+            return {'status': 'erro', 'msg': f'Dados inválidos: {e}'}
+
+        sucessos = sum(1 for item in itens if item['status'] == 'sucesso')
+        alteracao = self._publicar_alteracao(usuario_id, delta) if sucessos else None
+        return {
+            'status': 'sucesso',
+            'msg': f'{sucessos} de {len(itens)} boletos {feito}.',
+            'dados': {'itens': itens, 'sucessos': sucessos, 'erros': len(itens) - sucessos},
+            'alteracao': alteracao,
+        }
+
+    def pagar_boletos(self, dados):
+        """
+        Baixa de vários boletos: {ids: [...]} ou {filtros: {...}}, mais banco e
+        data. Cada um é pago pelo valor atualizado na data do pagamento.
+        """
+        data_pagamento = dados.get('data') or date.today().isoformat()
+        return self._em_lote(
+            dados,
+            lambda conn, usuario_id, ids: lotes.pagar(conn, usuario_id, ids, dados.get('banco') or '', data_pagamento),
+            'pagos'
+        )
+
+    def cancelar_pagamentos(self, dados):
+        """ Estorno de vários boletos: {ids: [...]} ou {filtros: {...}} """
+        return self._em_lote(dados, lotes.cancelar_pagamentos, 'estornados')
+
+    def excluir_boletos(self, dados):
+        """ Exclusão de vários boletos: {ids: [...]} ou {filtros: {...}} """
+        return self._em_lote(dados, lotes.excluir, 'excluídos')
+
+    def reagendar_boletos(self, dados):
+        """
+        Novo vencimento para vários boletos pendentes: {ids: [...]} ou
+        {filtros: {...}}, mais 'vencimento' ('YYYY-MM-DD') ou 'dias' (deslocamento).
+        """
+        return self._em_lote(
+            dados,
+            lambda conn, usuario_id, ids: lotes.reagendar(conn, usuario_id, ids, dados.get('vencimento'), dados.get('dias')),
+            'reagendados'
+        )
 
     def estaLogado(self):
         if not self.usuario_atual: return False
@@ -456,176 +1117,87 @@ class BoletoAPI:
         """
         Recebe um objeto date e retorna o próximo dia útil,
         pulando Sábados, Domingos e Feriados de Nova Venécia/ES.
+        (Consulta direta no calendário pré-calculado)
         """
-        dia_analise = data_vencimento
-
-        # Cache para evitar recálculo de feriados se o ano não mudar
-        ano_cache = None
-        feriados_cache = set()
-
-        # Loop infinito até achar um dia útil
-        while True:
-            # Se mudou de ano (ex: boleto vence 31/12), carrega feriados do próximo ano
-            if dia_analise.year != ano_cache:
-                ano_cache = dia_analise.year
-                feriados_cache = self.obter_feriados_nova_venecia(ano_cache)
-
-            dia_semana = dia_analise.weekday() # 0=Seg, 5=Sab, 6=Dom
-            str_data = dia_analise.strftime('%Y-%m-%d')
-
-            # Se for Sábado (5), Domingo (6) OU estiver na lista de feriados
-            if dia_semana >= 5 or str_data in feriados_cache:
-                # Pula para o próximo dia e repete a verificação
-                dia_analise += timedelta(days=1)
-            else:
-                # É um dia útil!
-                return dia_analise
+        return calendario.proximo_dia_util(data_vencimento)
 
     def calcular_pascoa(self, ano):
         """ Calcula a data do Domingo de Páscoa para qualquer ano """
-        a = ano % 19
-        b = ano // 100
-        c = ano % 100
-        d = b // 4
-        e = b % 4
-        f = (b + 8) // 25
-        g = (b - f + 1) // 3
-        h = (19 * a + b - d - g + 15) % 30
-        i = c // 4
-        k = c % 4
-        l = (32 + 2 * e + 2 * i - h - k) % 7
-        m = (a + 11 * h + 22 * l) // 451
-        
-        mes = (h + l - 7 * m + 114) // 31
-        dia = ((h + l - 7 * m + 114) % 31) + 1
-        
-        return date(ano, mes, dia)
+        return calcular_pascoa(ano)
 
-    # --- GERADOR DE FERIADOS DINÂMICO ---
     def obter_feriados_nova_venecia(self, ano):
         """ Retorna um SET com as datas dos feriados para o ano solicitado """
-        pascoa = self.calcular_pascoa(ano)
-
-        # Feriados Móveis (Baseados na Páscoa)
-        carnaval_seg = pascoa - timedelta(days=48)
-        carnaval_ter = pascoa - timedelta(days=47)
-        quarta_cinzas = pascoa - timedelta(days=46)
-        sexta_paixao = pascoa - timedelta(days=2)
-        corpus_christi = pascoa + timedelta(days=60)
-        
-        # N. Sra. da Penha (ES) - Tradicionalmente na segunda-feira, 8 dias após a Páscoa
-        nossa_sra_penha = pascoa + timedelta(days=8)
-
-        feriados_moveis = [
-            carnaval_seg, carnaval_ter, quarta_cinzas, 
-            sexta_paixao, pascoa, corpus_christi, nossa_sra_penha
-        ]
-
-        # Feriados Fixos (Nacionais, Estaduais e Municipais de Nova Venécia)
-        # Formato (Mês, Dia)
-        datas_fixas = [
-            (1, 1),   # Confraternização Universal
-            (1, 26),  # Aniversário de Nova Venécia (Municipal)
-            (4, 21),  # Tiradentes
-            (4, 24),  # São Marcos (Municipal)
-            (5, 1),   # Dia do Trabalho
-            (5, 23),  # Colonização do Solo ES (Estadual)
-            (9, 7),   # Independência
-            (10, 12), # N. Sra. Aparecida
-            (11, 2),  # Finados
-            (11, 15), # Proclamação da República
-            (11, 20), # Consciência Negra
-            (12, 25), # Natal
-        ]
-
-        lista_feriados = set()
-        
-        # Adiciona móveis formatados
-        for data in feriados_moveis:
-            lista_feriados.add(data.strftime('%Y-%m-%d'))
-
-        # Adiciona fixos formatados
-        for mes, dia in datas_fixas:
-            lista_feriados.add(date(ano, mes, dia).strftime('%Y-%m-%d'))
-
-        return lista_feriados
+        return {dia.strftime('%Y-%m-%d') for dia in feriados_do_ano(ano)}
 
+    @em_cache(depende_da_data=True)
     def obter_resumo_dashboard(self):
             if not self.usuario_atual:
                 return {'status': 'erro', 'msg': 'Não logado'}
 
-            conn = get_db_connection()
             user_id = self.usuario_atual['id']
-            hoje = date.today()
-            
-            # 1. Definição das Datas Limite (Semana e Mês)
-            # Semana (Domingo a Sábado)
-            # Se hoje é Domingo (6), volta 0 dias. Se é Segunda (0), volta 1 dia...
-            inicio_semana = hoje - timedelta(days=hoje.weekday() + 1) if hoje.weekday() != 6 else hoje
-            fim_semana = inicio_semana + timedelta(days=6)
-            
-            # Mês (Primeiro e Último dia)
-            inicio_mes = date(hoje.year, hoje.month, 1)
-            proximo_mes = hoje.replace(day=28) + timedelta(days=4)
-            fim_mes = proximo_mes - timedelta(days=proximo_mes.day)
-
-            # 2. Estrutura do Resumo
-            resumo = {
-                'hoje': {'qtd': 0, 'valor': 0, 'inicio': hoje.strftime('%Y-%m-%d'), 'fim': hoje.strftime('%Y-%m-%d')},
-                'vencidos': {'qtd': 0, 'valor': 0, 'inicio': '...', 'fim': (hoje - timedelta(days=1)).strftime('%Y-%m-%d')},
-                'semana': {'qtd': 0, 'valor': 0, 'inicio': inicio_semana.strftime('%Y-%m-%d'), 'fim': fim_semana.strftime('%Y-%m-%d')},
-                'mes': {'qtd': 0, 'valor': 0, 'inicio': inicio_mes.strftime('%Y-%m-%d'), 'fim': fim_mes.strftime('%Y-%m-%d')}
-            }
-
-            # 3. Busca TODOS os Pendentes e filtra no Python (para usar a lógica de feriados)
-            # Trazemos apenas o necessário para ser rápido
-            boletos_db = conn.execute("SELECT vencimento, valor_original FROM boletos WHERE usuario_id = ? AND status = 'Pendente'", (user_id,)).fetchall()
-            conn.close()
-
-            for b in boletos_db:
-                valor = float(b['valor_original'])
-                
-                # --- O GRANDE SEGREDO ---
-                # Pegamos a data original e "empurramos" se cair em feriado/FDS
-                dt_original = datetime.strptime(b['vencimento'], '%Y-%m-%d').date()
-                dt_util = self.proximo_dia_util(dt_original) 
-                # ------------------------
-
-                # A. Verifica HOJE
-                if dt_util == hoje:
-                    resumo['hoje']['qtd'] += 1
-                    resumo['hoje']['valor'] += valor
-
-                # B. Verifica VENCIDOS (Só é vencido se a data ÚTIL já passou)
-                if dt_util < hoje:
-                    resumo['vencidos']['qtd'] += 1
-                    resumo['vencidos']['valor'] += valor
-                
-                # C. Verifica SEMANA (Considera a data útil para o fluxo de caixa)
-                if inicio_semana <= dt_util <= fim_semana:
-                    resumo['semana']['qtd'] += 1
-                    resumo['semana']['valor'] += valor
 
-                # D. Verifica MÊS
-                if inicio_mes <= dt_util <= fim_mes:
-                    resumo['mes']['qtd'] += 1
-                    resumo['mes']['valor'] += valor
+            # 1 e 2. Datas limite (semana e mês) e estrutura do resumo
+            # (as mesmas faixas dão o delta do dashboard nas escritas, ver _ler_alteracao)
+            resumo = _esqueleto_resumo(date.today())
+
+            # 3. Soma os quatro grupos direto no SQLite, em uma passada só pelo índice.
+            # A coluna vencimento_util já guarda a data "empurrada" para o dia útil
+            # (feriado/FDS), então nenhuma linha precisa passar pelo Python.
+            # Os valores são centavos inteiros: a soma é exata.
+            sql = """
+                SELECT
+                    COUNT(CASE WHEN vencimento_util = :hoje THEN 1 END) AS hoje_qtd,
+                    COALESCE(SUM(CASE WHEN vencimento_util = :hoje THEN valor_original END), 0) AS hoje_valor,
+                    COUNT(CASE WHEN vencimento_util < :hoje THEN 1 END) AS vencidos_qtd,
+                    COALESCE(SUM(CASE WHEN vencimento_util < :hoje THEN valor_original END), 0) AS vencidos_valor,
+                    COUNT(CASE WHEN vencimento_util BETWEEN :ini_semana AND :fim_semana THEN 1 END) AS semana_qtd,
+                    COALESCE(SUM(CASE WHEN vencimento_util BETWEEN :ini_semana AND :fim_semana THEN valor_original END), 0) AS semana_valor,
+                    COUNT(CASE WHEN vencimento_util BETWEEN :ini_mes AND :fim_mes THEN 1 END) AS mes_qtd,
+                    COALESCE(SUM(CASE WHEN vencimento_util BETWEEN :ini_mes AND :fim_mes THEN valor_original END), 0) AS mes_valor
+                FROM boletos
+                WHERE usuario_id = :usuario AND status = 'Pendente'
+            """
+            with conexao(user_id) as conn:
+                linha = conn.execute(sql, {
+                    'usuario': user_id,
+                    'hoje': resumo['hoje']['inicio'],
+                    'ini_semana': resumo['semana']['inicio'], 'fim_semana': resumo['semana']['fim'],
+                    'ini_mes': resumo['mes']['inicio'], 'fim_mes': resumo['mes']['fim'],
+                }).fetchone()
+
+            for grupo in ('hoje', 'vencidos', 'semana', 'mes'):
+                resumo[grupo]['qtd'] = linha[f'{grupo}_qtd']
+                resumo[grupo]['valor'] = dinheiro.para_reais(linha[f'{grupo}_valor'])
 
             return {'status': 'sucesso', 'dados': resumo}
 
+    def _nomes_usados(self, coluna):
+        """ Categorias ou empresas do perfil logado (tabelas de nomes dos dois bancos), em ordem alfabética """
+        with conexao(self.usuario_atual['id']) as conn:
+            return nomes.usados(conn, self.usuario_atual['id'], coluna, _esquemas_nomes(conn))
+
+    @em_cache()
     def obter_categorias_usadas(self):
         if not self.usuario_atual:
             return []
         
-        conn = get_db_connection()
-        # Busca todas as categorias distintas, ordena alfabeticamente e remove vazias
-        sql = "SELECT DISTINCT categoria FROM boletos WHERE usuario_id = ? AND categoria <> '' ORDER BY categoria ASC"
-        rows = conn.execute(sql, (self.usuario_atual['id'],)).fetchall()
-        conn.close()
-        
-        # Retorna uma lista simplebs de strings: ['Combustível', 'Manutenção', 'Peças']
-        return [r[0] for r in rows]
+        # Lista simples de strings, sem vazias: ['Combustível', 'Manutenção', 'Peças']
+        return self._nomes_usados('categoria')
+
+    @em_cache()
+    def obter_empresas_usadas(self):
+        """ Empresas já usadas pelo perfil (sugestões do campo empresa) """
+        if not self.usuario_atual:
+            return []
+        return self._nomes_usados('empresa')
+
+    def _origem_relatorio(self, conn, inicio):
+        """ A visão com os nomes ou, se o período começa antes da data de corte, os boletos + o arquivo """
+        if arquivamento.alcanca(conn, inicio.isoformat()):
+            return arquivamento.origem(conn)
+        return nomes.VISAO
 
+    @em_cache(depende_da_data=True)
     def gerar_relatorio_mensal(self, mes_ano):
         """ 
         Recebe uma string 'YYYY-MM' (ex: '2026-01') 
@@ -634,53 +1206,87 @@ class BoletoAPI:
         if not self.estaLogado():
             return {'status': 'erro', 'msg': 'Login necessário'}
 
-        conn = get_db_connection()
-        
-        # Filtra boletos onde o vencimento começa com 'YYYY-MM'
-        # SQLite usa strftime para pegar parte da data
-        sql = """
-            SELECT * FROM boletos 
-            WHERE usuario_id = ? AND strftime('%Y-%m', vencimento) = ?
-        """
-        boletos_db = conn.execute(sql, (self.usuario_atual['id'], mes_ano)).fetchall()
-        conn.close()
+        try:
+            inicio = date.fromisoformat(f"{mes_ano}-01")
+        except (TypeError, ValueError):
+            return {'status': 'erro', 'msg': 'Mês inválido (use AAAA-MM)'}
+        fim = relatorios.proximo_periodo(inicio, 'mes') - timedelta(days=1)
 
-        # Estrutura do Relatório
+        with conexao(self.usuario_atual['id']) as conn:
+            totais = relatorios.gerar(conn, self.usuario_atual['id'], inicio, fim, origem=self._origem_relatorio(conn, inicio))['totais']
+
+        # Mesmo formato de sempre: por categoria soma o pago + o pendente atualizado
         relatorio = {
-            'total_esperado': 0.0,    # Soma dos valores originais de tudo
-            'total_pago': 0.0,        # O que realmente saiu do bolso (valor_total)
-            'total_pendente': 0.0,    # O que falta pagar (valor_atualizado)
-            'qtd_pagos': 0,
-            'qtd_pendentes': 0,
-            'por_categoria': {}       # Ex: {'Manutenção': 500.00, 'Luz': 100.00}
+            'total_esperado': totais['total_esperado'],
+            'total_pago': totais['total_pago'],
+            'total_pendente': totais['total_pendente'],
+            'qtd_pagos': totais['qtd_pagos'],
+            'qtd_pendentes': totais['qtd_pendentes'],
+            'por_categoria': {
+                cat: round(v['pago'] + v['pendente'], 2)
+                for cat, v in totais['por_categoria'].items()
+            },
         }
+        return {'status': 'sucesso', 'dados': relatorio}
 
-        for b in boletos_db:
-            boleto = dict(b)
-            
-            # 1. Soma ao Total Esperado (Planejamento)
-            relatorio['total_esperado'] += boleto['valor_original']
-
-            # 2. Verifica Status
-            if boleto['status'] == 'Pago':
-                relatorio['qtd_pagos'] += 1
-                # Se pagou, soma o valor REAL pago (com juros ou desconto)
-                relatorio['total_pago'] += boleto['valor_total']
-                
-                # Soma por Categoria (Usando valor pago)
-                cat = boleto['categoria']
-                relatorio['por_categoria'][cat] = relatorio['por_categoria'].get(cat, 0) + boleto['valor_total']
+    @em_cache(depende_da_data=True)
+    def gerar_relatorio(self, inicio, fim, granularidade='mes'):
+        """
+        Relatório de um período qualquer ('YYYY-MM-DD' a 'YYYY-MM-DD', inclusivo),
+        em série por 'dia', 'mes', 'trimestre' e/ou 'ano' (string ou lista).
+        Ex: gerar_relatorio('2025-01-01', '2025-12-31', ['mes', 'trimestre', 'ano'])
+        devolve as três séries com uma única consulta ao banco.
+        """
+        if not self.estaLogado():
+            return {'status': 'erro', 'msg': 'Login necessário'}
 
-            else:
-                # Se Pendente
-                relatorio['qtd_pendentes'] += 1
-                
-                # Calcula valor atualizado (reutiliza sua lógica de juros)
-                valor_atual = self.calculaValorComJuros(boleto)
-                relatorio['total_pendente'] += valor_atual
+        granularidades = [granularidade] if isinstance(granularidade, str) else list(granularidade or [])
+        try:
+            inicio = date.fromisoformat(inicio)
+            fim = date.fromisoformat(fim)
+        except (TypeError, ValueError):
+            return {'status': 'erro', 'msg': 'Datas inválidas (use AAAA-MM-DD)'}
 
-                # Soma por Categoria (Usando valor atualizado)
-                cat = boleto['categoria']
-                relatorio['por_categoria'][cat] = relatorio['por_categoria'].get(cat, 0) + valor_atual
+        try:
+            with conexao(self.usuario_atual['id']) as conn:
+                dados = relatorios.gerar(
+                    conn, self.usuario_atual['id'], inicio, fim, granularidades,
+                    origem=self._origem_relatorio(conn, inicio)
+                )
+        except ValueError as e:
+            return {'status': 'erro', 'msg': str(e)}
+        return {'status': 'sucesso', 'dados': dados}
 
-        return {'status': 'sucesso', 'dados': relatorio}
+    def gerar_relatorio_perfis(self, inicio, fim):
+        """
+        Totais de [inicio, fim] ('YYYY-MM-DD', inclusivo) de cada perfil, lado a lado.
+        No modo um banco por perfil, os bancos são anexados (ATTACH) para a consulta.
+        Só na janela: o servidor HTTP não publica (ver servidor.NAO_EXPOSTOS).
+        """
+        if not self.estaLogado():
+            return {'status': 'erro', 'msg': 'Login necessário'}
+
+        try:
+            inicio = date.fromisoformat(inicio)
+            fim = date.fromisoformat(fim)
+        except (TypeError, ValueError):
+            return {'status': 'erro', 'msg': 'Datas inválidas (use AAAA-MM-DD)'}
+
+        totais = {}
+        try:
+            with conexao() as conn:
+                perfis = conn.execute("SELECT id, nome FROM usuarios ORDER BY nome").fetchall()
+                parciais = bancos_perfil.consultar_todos(
+                    conn, relatorios.COLUNAS_POR_PERFIL,
+                    lambda origem: relatorios.por_perfil(conn, inicio, fim, origem)
+                )
+        except ValueError as e:
+            return {'status': 'erro', 'msg': str(e)}
+        for parcial in parciais:
+            totais.update(parcial)
+
+        dados = [
+            {'id': perfil['id'], 'nome': perfil['nome'], **totais.get(perfil['id'], relatorios.totais_perfil_vazios())}
+            for perfil in perfis
+        ]
+        return {'status': 'sucesso', 'dados': dados}
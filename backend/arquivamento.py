@@ -0,0 +1,306 @@
+"""
+Arquivo "frio" dos boletos pagos antigos, anexado a cada conexão como 'arquivo'.
+
+    python -m backend.arquivamento [--dias 730] [--banco sistema_boletos.db]
+"""
+import argparse
+import os
+import time
+from datetime import date, timedelta
+
+from backend import database, nomes
+
+ESQUEMA = 'arquivo'
+
+# Pagos com vencimento mais antigo que isso (arredondado para o início do mês) vão para o arquivo
+ARQUIVAR_APOS_DIAS = 730
+
+# Boletos movidos por transação, e pausa entre uma e outra (fora da fila do
+# escritor: é quando as gravações da tela que chegaram no meio passam)
+LINHAS_POR_LOTE = 2000
+PAUSA_ENTRE_LOTES = 0.01
+
+# Ids por "IN (...)" no restaurar
+IDS_POR_CONSULTA = 500
+
+def caminho_arquivo(caminho_banco):
+    """ sistema_boletos.db -> sistema_boletos_arquivo.db """
+    return os.path.splitext(caminho_banco)[0] + '_arquivo.db'
+
+def _bancos(conn):
+    """ {esquema: caminho} dos bancos abertos na conexão """
+    return {linha[1]: linha[2] for linha in conn.execute("PRAGMA database_list")}
+
+def anexado(conn):
+    return ESQUEMA in _bancos(conn)
+
+def _anexar(conn):
+    """ Gancho de conexão: ATTACH do arquivo do banco, se ele já existir """
+    bancos = _bancos(conn)
+    if ESQUEMA in bancos or not bancos.get('main'):
+        return
+    caminho = caminho_arquivo(bancos['main'])
+    if os.path.exists(caminho):
+        conn.execute(f"ATTACH DATABASE ? AS {ESQUEMA}", (caminho,))
+        conn.execute(f"PRAGMA {ESQUEMA}.synchronous = NORMAL")
+
+database.registrar_gancho_conexao(_anexar)
+
+def limite(conn):
+    """
+    Data 'YYYY-MM-DD' antes da qual pode haver boleto arquivado, ou None se
+    não há nada arquivado (ou o arquivo não está anexado nesta conexão).
+    """
+    if not anexado(conn):
+        return None
+    linha = conn.execute("SELECT valor FROM main.configuracao WHERE chave = 'arquivo_ate'").fetchone()
+    return linha[0] if linha else None
+
+def alcanca(conn, data_inicio=None, status=None):
+    """ A consulta (vencimento a partir de 'data_inicio', com 'status') precisa do arquivo? """
+    ate = limite(conn)
+    if ate is None or status == 'Pendente':
+        return False
+    return not data_inicio or data_inicio < ate
+
+def colunas(conn, esquema='main', tabela='boletos'):
+    return [linha[1] for linha in conn.execute(f"PRAGMA {esquema}.table_info({tabela})")]
+
+def selecao(conn, campos=None):
+    """
+    (colunas da visão com os nomes do banco principal ou 'campos', as
+    mesmas lidas do arquivo). Coluna nova que o arquivo ainda não tem
+    (migração depois do último arquivamento) sai como NULL.
+    """
+    principais = list(campos or colunas(conn, tabela=nomes.VISAO))
+    do_arquivo = set(colunas(conn, ESQUEMA, nomes.fonte(conn, ESQUEMA)))
+    lista = ', '.join(principais)
+    return lista, ', '.join(c if c in do_arquivo else f'NULL AS {c}' for c in principais)
+
+def origem(conn, campos=None):
+    """ Trecho do FROM com os boletos (e os nomes) dos dois bancos, ou só a visão, se não há arquivo """
+    if limite(conn) is None:
+        return nomes.VISAO
+    lista, do_arquivo = selecao(conn, campos)
+    return (
+        f"(SELECT {lista} FROM main.{nomes.VISAO} "
+        f"UNION ALL SELECT {do_arquivo} FROM {ESQUEMA}.{nomes.fonte(conn, ESQUEMA)})"
+    )
+
+def linhas(conn, ids, campos=None):
+    """ Linhas (inteiras ou só 'campos') dos boletos 'ids', estejam em qual banco estiverem, na ordem de 'ids' """
+    if not ids:
+        return []
+    lista, do_arquivo = selecao(conn, campos)
+    marcadores = ','.join('?' * len(ids))
+    por_id = {
+        linha['id']: linha
+        for linha in conn.execute(f'''
+            SELECT {lista} FROM main.{nomes.VISAO} WHERE id IN ({marcadores})
+            UNION ALL
+            SELECT {do_arquivo} FROM {ESQUEMA}.{nomes.fonte(conn, ESQUEMA)} WHERE id IN ({marcadores})
+        ''', list(ids) * 2)
+    }
+    return [por_id[id_boleto] for id_boleto in ids if id_boleto in por_id]
+
+def data_de_corte(apos_dias=ARQUIVAR_APOS_DIAS, hoje=None):
+    """ Primeiro dia do mês de (hoje - apos_dias): relatórios mensais antigos leem um banco só """
+    return ((hoje or date.today()) - timedelta(days=apos_dias)).replace(day=1)
+
+def _subir_versao(conn, esquema):
+    versao = conn.execute(f"PRAGMA {esquema}.user_version").fetchone()[0]
+    conn.execute(f"PRAGMA {esquema}.user_version = {versao + 1}")
+
+def _criar_tabela(conn, esquema, definicoes, nome='boletos'):
+    """ Tabela do arquivo com as colunas 'definicoes' (table_info do principal) """
+    campos = ', '.join(
+        f"{linha[1]} INTEGER PRIMARY KEY" if linha[1] == 'id' else f"{linha[1]} {linha[2]}"
+        for linha in definicoes
+    )
+    conn.execute(f"CREATE TABLE {esquema}.{nome} ({campos})")
+
+def _criar_indices(conn, esquema):
+    """ As mesmas ordens da listagem do banco principal """
+    conn.execute(f'''
+        CREATE INDEX {esquema}.idx_arquivo_listagem
+        ON boletos (usuario_id, vencimento, valor_original DESC, id)
+    ''')
+    conn.execute(f'''
+        CREATE INDEX {esquema}.idx_arquivo_listagem_status
+        ON boletos (usuario_id, status, vencimento, valor_original DESC, id)
+    ''')
+
+def _preparar(conn, esquema_arquivo, esquema_principal):
+    """
+    Cria a tabela do arquivo (mesmas colunas do principal) ou acrescenta as
+    que faltam. O arquivo tem as próprias tabelas de nomes e a visão
+    (backend/nomes.py). Um arquivo de antes da migração 8, ainda com o
+    texto de categoria e empresa, ganha os ids pelo texto e é recriado sem
+    ele (mesmos ids).
+    """
+    definicoes = conn.execute(f"PRAGMA {esquema_principal}.table_info(boletos)").fetchall()
+    existentes = set(colunas(conn, esquema_arquivo))
+    if not existentes:
+        _criar_tabela(conn, esquema_arquivo, definicoes)
+        _criar_indices(conn, esquema_arquivo)
+        nomes.criar(conn, esquema_arquivo)
+        return
+    for linha in definicoes:
+        if linha[1] not in existentes:
+            conn.execute(f"ALTER TABLE {esquema_arquivo}.boletos ADD COLUMN {linha[1]} {linha[2]}")
+    nomes.criar(conn, esquema_arquivo)
+    if existentes & set(nomes.TABELAS):
+        lista = ', '.join(linha[1] for linha in definicoes)
+        _criar_tabela(conn, esquema_arquivo, definicoes, 'boletos_novo')
+        conn.execute(f"INSERT INTO {esquema_arquivo}.boletos_novo ({lista}) SELECT {lista} FROM {esquema_arquivo}.boletos")
+        conn.execute(f"DROP TABLE {esquema_arquivo}.boletos")
+        conn.execute(f"ALTER TABLE {esquema_arquivo}.boletos_novo RENAME TO boletos")
+        _criar_indices(conn, esquema_arquivo)
+        nomes.criar(conn, esquema_arquivo)
+    # O filtro de categoria usa o índice de categoria_id (backend/nomes.py)
+    conn.execute(f"DROP INDEX IF EXISTS {esquema_arquivo}.idx_arquivo_categoria")
+
+def _remover_duplicados(conn, esquema_arquivo, esquema_principal):
+    """ Sobra de uma mudança interrompida: o boleto que está no principal vale """
+    return conn.execute(f'''
+        DELETE FROM {esquema_arquivo}.boletos
+        WHERE id IN (SELECT id FROM {esquema_principal}.boletos)
+    ''').rowcount
+
+def _direto(funcao):
+    return funcao()
+
+def arquivar(caminho_banco, ate, linhas_por_lote=None, ao_progredir=None, em_lote=_direto):
+    """
+    Move os pagos de 'caminho_banco' com vencimento antes de 'ate' (date)
+    para o arquivo dele, em transações de 'linhas_por_lote' boletos.
+    Cada transação roda como em_lote(funcao) (padrão: ali mesmo; com o
+    programa aberto, na fila do escritor) e a pausa entre elas fica fora.
+    ao_progredir(movidos) é chamado depois de cada lote. Retorna quantos moveu.
+    """
+    ate = ate.isoformat()
+    linhas_por_lote = linhas_por_lote or LINHAS_POR_LOTE
+    conn = database.get_db_connection(caminho_arquivo(caminho_banco))
+
+    def preparar():
+        conn.execute("ATTACH DATABASE ? AS principal", (caminho_banco,))
+        conn.execute("PRAGMA principal.synchronous = NORMAL")
+        conn.execute("BEGIN IMMEDIATE")
+        _preparar(conn, 'main', 'principal')
+        if _remover_duplicados(conn, 'main', 'principal'):
+            _subir_versao(conn, 'main')
+        conn.commit()
+        # As conexões do pool passam a anexar o arquivo antes do primeiro boleto sair do principal
+        database.reaplicar_ganchos_conexao()
+
+    def mover(depois_de):
+        """ Um lote: os pagos seguintes a 'depois_de' (id). Retorna os ids movidos """
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            ids = [linha[0] for linha in conn.execute('''
+                SELECT id FROM principal.boletos
+                WHERE id > ? AND status = 'Pago' AND vencimento < ?
+                ORDER BY id LIMIT ?
+            ''', (depois_de, ate, linhas_por_lote))]
+            if not ids:
+                return ids
+
+            marcadores = ','.join('?' * len(ids))
+            nomes.copiar(conn, 'principal', 'main', lista, f"id IN ({marcadores})", ids)
+            conn.execute(f"DELETE FROM principal.boletos WHERE id IN ({marcadores})", ids)
+            conn.execute('''
+                INSERT INTO principal.configuracao (chave, valor) VALUES ('arquivo_ate', ?)
+                ON CONFLICT (chave) DO UPDATE SET valor = max(valor, excluded.valor)
+            ''', (ate,))
+            _subir_versao(conn, 'main')
+            conn.commit()
+            return ids
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+
+    try:
+        em_lote(preparar)
+        lista = colunas(conn, 'principal')
+        movidos, ultimo_id = 0, 0
+        while True:
+            ids = em_lote(lambda: mover(ultimo_id))
+            if not ids:
+                return movidos
+            movidos += len(ids)
+            ultimo_id = ids[-1]
+            if ao_progredir:
+                ao_progredir(movidos)
+            time.sleep(PAUSA_ENTRE_LOTES)
+    finally:
+        conn.close()
+
+def arquivar_todos(apos_dias=ARQUIVAR_APOS_DIAS, hoje=None, em_lote=_direto):
+    """
+    arquivar em cada banco de boletos: o principal ou, no modo um banco por
+    perfil, o de cada perfil (cada lote passa por em_lote). Retorna {'ate', 'boletos'}.
+    """
+    from backend import bancos_perfil # bancos_perfil também usa este módulo
+
+    ate = data_de_corte(apos_dias, hoje)
+    if database.BANCOS_POR_PERFIL:
+        caminhos = [database.caminho_perfil(usuario_id) for usuario_id in bancos_perfil.perfis_com_banco()]
+    else:
+        caminhos = [database.CAMINHO_BANCO]
+    return {'ate': ate.isoformat(), 'boletos': sum(arquivar(caminho, ate, em_lote=em_lote) for caminho in caminhos)}
+
+def restaurar(conn, usuario_id, ids):
+    """
+    Devolve ao banco principal os boletos arquivados entre 'ids' (antes de
+    alterá-los), dentro da transação de quem chamou. Retorna quantos voltaram.
+    """
+    if not ids or limite(conn) is None:
+        return 0
+    lista = colunas(conn)
+    voltaram = 0
+    for inicio in range(0, len(ids), IDS_POR_CONSULTA):
+        trecho = list(ids[inicio:inicio + IDS_POR_CONSULTA])
+        condicao = f"usuario_id = ? AND id IN ({','.join('?' * len(trecho))})"
+        # ignorar: se uma mudança interrompida deixou o boleto nos dois, o do principal vale
+        nomes.copiar(conn, ESQUEMA, 'main', lista, condicao, [usuario_id] + trecho, ignorar=True)
+        voltaram += conn.execute(f"DELETE FROM {ESQUEMA}.boletos WHERE {condicao}", [usuario_id] + trecho).rowcount
+    if voltaram:
+        _subir_versao(conn, ESQUEMA)
+    return voltaram
+
+def restaurar_tudo(conn):
+    """
+    Devolve todo o arquivo ao banco de 'conn' e esquece a data de corte
+    (ex: antes de dividir ou juntar os bancos por perfil). 'conn' precisa
+    estar fora de transação. Retorna quantos boletos voltaram.
+    """
+    if not anexado(conn):
+        caminho = caminho_arquivo(_bancos(conn)['main'])
+        if not os.path.exists(caminho):
+            return 0
+        conn.execute(f"ATTACH DATABASE ? AS {ESQUEMA}", (caminho,))
+    if not colunas(conn, ESQUEMA):
+        return 0
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _remover_duplicados(conn, ESQUEMA, 'main')
+        voltaram = nomes.copiar(conn, ESQUEMA, 'main', colunas(conn), '1 = 1')
+        conn.execute(f"DELETE FROM {ESQUEMA}.boletos")
+        conn.execute("DELETE FROM main.configuracao WHERE chave = 'arquivo_ate'")
+        _subir_versao(conn, ESQUEMA)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return voltaram
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Move os boletos pagos antigos para o arquivo')
+    parser.add_argument('--dias', type=int, default=ARQUIVAR_APOS_DIAS)
+    parser.add_argument('--banco', default=database.CAMINHO_BANCO)
+    args = parser.parse_args()
+
+    database.configurar_banco(args.banco)
+    database.init_db()
+    print(arquivar_todos(args.dias))
@@ -0,0 +1,237 @@
+"""
+Backup diário do banco, feito com a API de backup do próprio SQLite.
+
+A cópia é feita em pequenos lotes de páginas, de dentro de uma transação de
+leitura aberta na origem: com WAL, a tela continua respondendo e gravando
+normalmente, o resultado é sempre uma foto consistente (sem o risco de
+copiar o arquivo no meio de uma escrita ou esquecer o que ainda está no
+-wal) e as gravações de outras conexões não fazem a cópia recomeçar.
+
+Depois da cópia, o arquivo passa por PRAGMA integrity_check, é compactado
+(.db.gz) e só então ganha o nome final. A rotação mantém os N mais recentes.
+
+O arquivo dos pagos antigos (backend/arquivamento.py) quase nunca muda: ele
+só é copiado de novo quando a versão dele (PRAGMA user_version) não é a da
+última cópia, gravada em VERSAO_ARQUIVO na pasta do backup dele.
+"""
+import gzip
+import os
+import shutil
+import sqlite3
+import threading
+from datetime import datetime
+
+# Configuração padrão (pode ser trocada ao criar a BoletoAPI)
+PASTA_BACKUP = 'backups'
+QTD_BACKUPS = 5
+
+# Páginas copiadas por passo e pausa entre passos (libera o banco para a tela)
+PAGINAS_POR_PASSO = 1024
+PAUSA_ENTRE_PASSOS = 0.005
+
+# Versão do arquivo dos pagos antigos que está na cópia mais recente
+VERSAO_ARQUIVO = 'versao.txt'
+
+# Evita dois backups ao mesmo tempo (ex: o automático e um manual)
+_trava = threading.Lock()
+
+class ErroBackup(Exception):
+    pass
+
+def _nome_do_dia():
+    # Gera nome SÓ com a DATA (Sem hora) -> backup_2025-01-06.db.gz
+    # Isso garante apenas 1 arquivo por dia
+    return f"backup_{datetime.now().strftime('%Y-%m-%d')}"
+
+def _eh_backup(nome):
+    return nome.startswith('backup_') and (nome.endswith('.db') or nome.endswith('.db.gz'))
+
+def backup_de_hoje(pasta=PASTA_BACKUP):
+    """ Caminho do backup de hoje, se já existir (aceita o formato antigo .db) """
+    base = os.path.join(pasta, _nome_do_dia())
+    for extensao in ('.db.gz', '.db'):
+        if os.path.exists(base + extensao):
+            return base + extensao
+    return None
+
+def _copiar(conn_origem, destino, ao_progredir=None, esquema='main'):
+    """ Cópia online e incremental do 'esquema' de conn_origem para o arquivo 'destino' """
+    conn_destino = sqlite3.connect(destino)
+    try:
+        def progresso(status, restantes, total):
+            if ao_progredir and total:
+                ao_progredir(int((total - restantes) * 100 / total))
+
+        conn_origem.backup(
+            conn_destino,
+            pages=PAGINAS_POR_PASSO,
+            progress=progresso,
+            name=esquema,
+            sleep=PAUSA_ENTRE_PASSOS,
+        )
+
+        resultado = conn_destino.execute("PRAGMA integrity_check").fetchone()[0]
+        if resultado != 'ok':
+            raise ErroBackup(f"Cópia corrompida (integrity_check: {resultado})")
+    finally:
+        conn_destino.close()
+
+def copiar_banco(origem, destino, ao_progredir=None):
+    """ Cópia online e incremental de 'origem' para o arquivo 'destino' """
+    conn_origem = sqlite3.connect(origem, timeout=30, isolation_level=None)
+    try:
+        # Foto fixa: sem a transação de leitura aberta, cada gravação de outra
+        # conexão reinicia a cópia, e um banco movimentado nunca terminaria
+        conn_origem.execute("BEGIN")
+        conn_origem.execute("SELECT COUNT(*) FROM main.sqlite_master").fetchone()
+        _copiar(conn_origem, destino, ao_progredir)
+    finally:
+        conn_origem.close()
+
+def _versao_copiada(pasta):
+    """ Versão do arquivo na cópia mais recente de 'pasta' (None se não há cópia ou se não dá para ler) """
+    caminho = os.path.join(pasta, VERSAO_ARQUIVO)
+    if not os.path.exists(caminho) or not any(_eh_backup(nome) for nome in os.listdir(pasta)):
+        return None
+    with open(caminho) as arquivo:
+        try:
+            return int(arquivo.read())
+        except ValueError: # Vazio ou estragado: copia de novo
+            return None
+
+def _abrir_foto(origem, arquivo):
+    """
+    Conexão em 'origem', com 'arquivo' anexado, já dentro de uma transação
+    de leitura nos dois: as duas cópias saem do mesmo instante. As fotos
+    são abertas com as escritas seguradas por um instante (BEGIN IMMEDIATE
+    em outra conexão), senão um boleto que mudou de banco bem no meio
+    poderia faltar nas duas cópias.
+    """
+    conn = sqlite3.connect(origem, timeout=30, isolation_level=None)
+    trava = sqlite3.connect(origem, timeout=30, isolation_level=None)
+    try:
+        for c in (conn, trava):
+            c.execute("ATTACH DATABASE ? AS arquivo", (arquivo,))
+        trava.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("BEGIN")
+            conn.execute("SELECT COUNT(*) FROM main.sqlite_master").fetchone()
+            conn.execute("SELECT COUNT(*) FROM arquivo.sqlite_master").fetchone()
+        finally:
+            trava.execute("ROLLBACK")
+    except Exception:
+        conn.close()
+        raise
+    finally:
+        trava.close()
+    return conn
+
+def compactar(origem, destino):
+    """ Compacta em gzip escrevendo primeiro num .part (nunca deixa um .gz pela metade) """
+    temporario = destino + '.part'
+    with open(origem, 'rb') as entrada, gzip.open(temporario, 'wb', compresslevel=6) as saida:
+        shutil.copyfileobj(entrada, saida, 1024 * 1024)
+    os.replace(temporario, destino)
+
+def rotacionar(pasta=PASTA_BACKUP, manter=QTD_BACKUPS):
+    """ ROTAÇÃO: Apaga os antigos para sobrar só os 'manter' mais recentes """
+    arquivos = sorted([
+        os.path.join(pasta, f)
+        for f in os.listdir(pasta)
+        if _eh_backup(f)
+    ], key=os.path.getmtime)
+
+    removidos = []
+    while len(arquivos) > manter:
+        arquivo_velho = arquivos.pop(0)
+        os.remove(arquivo_velho)
+        removidos.append(arquivo_velho)
+    return removidos
+
+def fazer_backup(origem, pasta=PASTA_BACKUP, manter=QTD_BACKUPS, ao_progredir=None, arquivo=None):
+    """
+    Faz o backup do dia (se ainda não existir) e aplica a rotação.
+    arquivo: (caminho, pasta) do arquivo dos pagos antigos de 'origem', que
+    é copiado junto (mesmo instante) só quando mudou desde a última cópia.
+    Retorna os caminhos dos arquivos criados ([] se o de hoje já existia).
+    """
+    with _trava:
+        if not os.path.exists(pasta):
+            os.makedirs(pasta)
+
+        if backup_de_hoje(pasta):
+            return []
+
+        base = os.path.join(pasta, _nome_do_dia())
+        temporario = base + '.tmp.db'
+        criados = []
+        if arquivo and os.path.exists(arquivo[0]):
+            caminho_arquivo, pasta_arquivo = arquivo
+            os.makedirs(pasta_arquivo, exist_ok=True)
+            base_arquivo = os.path.join(pasta_arquivo, _nome_do_dia())
+            temporario_arquivo = base_arquivo + '.tmp.db'
+            try:
+                conn_origem = _abrir_foto(origem, caminho_arquivo)
+                try:
+                    versao = conn_origem.execute("PRAGMA arquivo.user_version").fetchone()[0]
+                    copiar_arquivo = versao != _versao_copiada(pasta_arquivo)
+                    _copiar(conn_origem, temporario, ao_progredir)
+                    if copiar_arquivo:
+                        _copiar(conn_origem, temporario_arquivo, esquema='arquivo')
+                finally:
+                    conn_origem.close()
+
+                compactar(temporario, base + '.db.gz')
+                criados.append(base + '.db.gz')
+                if copiar_arquivo:
+                    compactar(temporario_arquivo, base_arquivo + '.db.gz')
+                    with open(os.path.join(pasta_arquivo, VERSAO_ARQUIVO), 'w') as saida:
+                        saida.write(str(versao))
+                    rotacionar(pasta_arquivo, manter)
+                    criados.append(base_arquivo + '.db.gz')
+            finally:
+                for caminho in (temporario, temporario_arquivo):
+                    if os.path.exists(caminho):
+                        os.remove(caminho)
+        else:
+            try:
+                copiar_banco(origem, temporario, ao_progredir)
+                compactar(temporario, base + '.db.gz')
+                criados.append(base + '.db.gz')
+            finally:
+                if os.path.exists(temporario):
+                    os.remove(temporario)
+
+        rotacionar(pasta, manter)
+        return criados
+
+def fazer_backups(alvos, manter=QTD_BACKUPS, ao_progredir=None):
+    """
+    fazer_backup de vários bancos, cada um na sua pasta e com a sua rotação
+    (ex: o catálogo e o banco de cada perfil). alvos: [(origem, pasta)] ou
+    [(origem, pasta, arquivo)], com 'arquivo' como em fazer_backup.
+    Retorna os caminhos criados (os que já tinham backup de hoje ficam de fora).
+    """
+    criados = []
+    for posicao, (origem, pasta, *arquivo) in enumerate(alvos):
+        def progresso(percentual, posicao=posicao):
+            if ao_progredir:
+                ao_progredir(int((posicao * 100 + percentual) / len(alvos)))
+
+        criados += fazer_backup(origem, pasta, manter, progresso, *arquivo)
+    return criados
+
+def fazer_backup_em_segundo_plano(alvos, manter=QTD_BACKUPS, ao_terminar=None):
+    """ Roda fazer_backups numa thread separada; ao_terminar(caminhos, erro) é chamado no fim """
+    def tarefa():
+        caminhos, erro = [], None
+        try:
+            caminhos = fazer_backups(alvos, manter)
+        except Exception as e:
+            erro = e
+        if ao_terminar:
+            ao_terminar(caminhos, erro)
+
+    thread = threading.Thread(target=tarefa, name='backup', daemon=True)
+    thread.start()
+    return thread
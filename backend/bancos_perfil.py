@@ -0,0 +1,287 @@
+"""
+Modo opcional "um banco por perfil": o arquivo principal vira só o catálogo
+e os boletos de cada perfil ficam em sistema_boletos_perfis/perfil_<id>.db.
+
+    python -m backend.bancos_perfil dividir [--banco sistema_boletos.db]
+    python -m backend.bancos_perfil juntar [--banco sistema_boletos.db]
+"""
+import argparse
+import os
+import re
+import sqlite3
+
+from backend import arquivamento, backup, database, nomes
+
+# Nomes dos arquivos dentro da pasta dos perfis
+_ARQUIVO_PERFIL = re.compile(r'^perfil_(\d+)\.db$')
+
+# Limite de bancos anexados de uma vez quando o SQLite não informa o dele
+# (o padrão de compilação é 10, e o principal não conta)
+MAXIMO_ANEXADOS = 10
+
+def perfis_com_banco(caminho=None):
+    """ Ids dos perfis que já têm arquivo próprio, em ordem """
+    pasta = database.pasta_perfis(caminho)
+    if not os.path.isdir(pasta):
+        return []
+    return sorted(
+        int(encontrado.group(1))
+        for encontrado in map(_ARQUIVO_PERFIL.match, os.listdir(pasta))
+        if encontrado
+    )
+
+def alvos_backup(pasta_backup):
+    """
+    [(banco, pasta do backup, (arquivo, pasta do backup dele))]: o banco
+    principal na pasta de sempre e, no modo por perfil, cada perfil em
+    pasta_backup/perfil_<id>. O arquivo dos pagos antigos de cada banco
+    (backend/arquivamento.py) fica na subpasta 'arquivo' da pasta dele.
+    """
+    alvos = [(database.CAMINHO_BANCO, pasta_backup)]
+    if database.BANCOS_POR_PERFIL:
+        alvos += [
+            (database.caminho_perfil(usuario_id), os.path.join(pasta_backup, f'perfil_{usuario_id}'))
+            for usuario_id in perfis_com_banco()
+        ]
+    return [
+        (banco, pasta, (arquivamento.caminho_arquivo(banco), os.path.join(pasta, 'arquivo')))
+        for banco, pasta in alvos
+    ]
+
+def remover_banco(usuario_id):
+    """ Apaga o arquivo de um perfil excluído (e o -wal/-shm), com o arquivo dos pagos antigos dele """
+    database.fechar_banco_perfil(usuario_id)
+    caminho = database.caminho_perfil(usuario_id)
+    for banco in (caminho, arquivamento.caminho_arquivo(caminho)):
+        for arquivo in (banco, banco + '-wal', banco + '-shm'):
+            if os.path.exists(arquivo):
+                os.remove(arquivo)
+
+def _limite_anexados(conn):
+    try:
+        return conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    except AttributeError: # Python < 3.11
+        return MAXIMO_ANEXADOS
+
+def consultar_todos(conn, colunas, funcao):
+    """
+    Roda funcao(origem) sobre os boletos de todos os perfis e devolve a lista
+    dos resultados. 'origem' é o trecho do FROM: 'boletos' no banco único
+    (com o arquivo dos pagos antigos, se houver); no modo por perfil, um
+    UNION ALL das 'colunas' dos bancos anexados e dos arquivos deles (em
+    grupos, até o limite de ATTACH do SQLite, então funcao pode ser chamada
+    mais de uma vez e cada chamada vê um grupo de perfis diferente).
+    'conn' precisa ser do banco principal e estar fora de transação.
+    """
+    if not database.BANCOS_POR_PERFIL:
+        return [funcao(arquivamento.origem(conn, colunas))]
+
+    # [(perfil, [(apelido, caminho)])]: o banco e o arquivo de um perfil vão no mesmo grupo
+    bancos = []
+    for usuario_id in perfis_com_banco():
+        caminho = database.caminho_perfil(usuario_id)
+        deste = [(f'perfil_{usuario_id}', caminho)]
+        if os.path.exists(arquivamento.caminho_arquivo(caminho)):
+            deste.append((f'perfil_{usuario_id}_arquivo', arquivamento.caminho_arquivo(caminho)))
+        bancos.append(deste)
+
+    # O que já está anexado na conexão (ex: o arquivo do catálogo) ocupa vaga
+    ja_anexados = sum(1 for linha in conn.execute("PRAGMA database_list") if linha[1] not in ('main', 'temp'))
+    vagas = max(1, _limite_anexados(conn) - ja_anexados)
+    lista_colunas = ', '.join(colunas)
+    resultados = []
+    while bancos:
+        grupo = []
+        while bancos and len(grupo) + len(bancos[0]) <= vagas:
+            grupo.extend(bancos.pop(0))
+        if not grupo:
+            grupo = bancos.pop(0)
+        anexados = []
+        try:
+            for apelido, caminho in grupo:
+                conn.execute("ATTACH DATABASE ? AS " + apelido, (caminho,))
+                anexados.append(apelido)
+            # Arquivo sem tabela (nunca recebeu boleto) fica de fora
+            com_boletos = [
+                apelido for apelido in anexados
+                if conn.execute(f"SELECT 1 FROM {apelido}.sqlite_master WHERE name = 'boletos'").fetchone()
+            ]
+            origem = '(' + ' UNION ALL '.join(
+                f"SELECT {lista_colunas} FROM {apelido}.boletos" for apelido in com_boletos
+            ) + ')'
+            resultados.append(funcao(origem))
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            for apelido in anexados:
+                conn.execute("DETACH DATABASE " + apelido)
+    return resultados
+
+def _colunas_boletos(conn, esquema='main'):
+    return [linha[1] for linha in conn.execute(f"PRAGMA {esquema}.table_info(boletos)")]
+
+def _marcar_modo(conn, ligado):
+    conn.execute(
+        "INSERT OR REPLACE INTO configuracao (chave, valor) VALUES ('bancos_por_perfil', ?)",
+        ('1' if ligado else '0',)
+    )
+
+def dividir(ao_progredir=None):
+    """
+    Separa o banco único (database.CAMINHO_BANCO) em catálogo + um banco por
+    perfil, mantendo os ids dos boletos. Antes de tudo, faz uma cópia do
+    arquivo ao lado (<nome>_antes_da_divisao.db).
+
+    Só depois que todos os perfis foram copiados é que os boletos saem do
+    banco principal e o modo é ligado, numa única transação: se algo falhar
+    no meio, o banco único continua valendo e basta rodar de novo.
+    Boletos de perfis já excluídos ficam no banco principal. Os arquivados
+    voltam antes para o banco principal (cada perfil arquiva de novo os seus).
+    """
+    database.init_db()
+    if database.BANCOS_POR_PERFIL:
+        raise ValueError('O banco já está dividido por perfil.')
+
+    copia = os.path.splitext(database.CAMINHO_BANCO)[0] + '_antes_da_divisao.db'
+    backup.copiar_banco(database.CAMINHO_BANCO, copia)
+
+    # Sobras de uma divisão interrompida não valem nada: o modo ainda está desligado
+    for usuario_id in perfis_com_banco():
+        remover_banco(usuario_id)
+
+    resumo = {'perfis': 0, 'boletos': 0, 'pasta': database.pasta_perfis(), 'copia': copia}
+    with database.conexao() as conn:
+        arquivamento.restaurar_tudo(conn)
+        ids = [linha[0] for linha in conn.execute("SELECT id FROM usuarios ORDER BY id")]
+        colunas = _colunas_boletos(conn)
+
+        for posicao, usuario_id in enumerate(ids, start=1):
+            caminho = database.caminho_perfil(usuario_id)
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            conn_perfil = database.get_db_connection(caminho)
+            try:
+                database.preparar_banco(conn_perfil)
+            finally:
+                conn_perfil.close()
+
+            conn.execute("ATTACH DATABASE ? AS perfil", (caminho,))
+            try:
+                com_fts = conn.execute(
+                    "SELECT 1 FROM perfil.sqlite_master WHERE name = 'boletos_fts'"
+                ).fetchone() is not None
+                if com_fts:
+                    # Mesmo truque da importação: indexa tudo de uma vez no fim
+                    conn.execute("INSERT INTO perfil.boletos_fts_pausa (pausado) VALUES (1)")
+                # Os ids de categoria e empresa passam a ser os das tabelas de nomes do perfil
+                copiados = nomes.copiar(conn, 'main', 'perfil', colunas, "usuario_id = ?", (usuario_id,))
+                if com_fts:
+                    conn.execute("DELETE FROM perfil.boletos_fts_pausa")
+                    conn.execute("INSERT INTO perfil.boletos_fts (boletos_fts) VALUES ('rebuild')")
+                conn.commit()
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                conn.execute("DETACH DATABASE perfil")
+
+            resumo['perfis'] += 1
+            resumo['boletos'] += copiados
+            if ao_progredir:
+                ao_progredir(posicao, len(ids))
+
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM boletos WHERE usuario_id IN (SELECT id FROM usuarios)")
+        _marcar_modo(conn, True)
+        conn.commit()
+        conn.execute("VACUUM")
+
+    database.fechar_conexoes()
+    return resumo
+
+def juntar(ao_progredir=None):
+    """
+    Volta para o banco único: os boletos de cada perfil voltam para a tabela
+    do banco principal. Os ids são renumerados (cada perfil numerava os seus
+    a partir de 1), e os arquivados de cada perfil voltam junto. A pasta dos
+    perfis é renomeada para <pasta>_juntada, não apagada.
+    """
+    database.init_db()
+    if not database.BANCOS_POR_PERFIL:
+        raise ValueError('O banco não está dividido por perfil.')
+
+    ids = perfis_com_banco()
+    resumo = {'perfis': 0, 'boletos': 0}
+    with database.conexao() as conn:
+        colunas = [c for c in _colunas_boletos(conn) if c != 'id']
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if database.FTS_DISPONIVEL:
+                conn.execute("INSERT INTO boletos_fts_pausa (pausado) VALUES (1)")
+            for posicao, usuario_id in enumerate(ids, start=1):
+                # Migra o banco do perfil antes (pode ter ficado numa versão anterior)
+                conn_perfil = database.get_db_connection(database.caminho_perfil(usuario_id))
+                try:
+                    database.preparar_banco(conn_perfil)
+                    arquivamento.restaurar_tudo(conn_perfil)
+                finally:
+                    conn_perfil.close()
+
+                resumo['boletos'] += _copiar_de_volta(conn, usuario_id, colunas)
+                resumo['perfis'] += 1
+                if ao_progredir:
+                    ao_progredir(posicao, len(ids))
+            if database.FTS_DISPONIVEL:
+                conn.execute("DELETE FROM boletos_fts_pausa")
+                conn.execute("INSERT INTO boletos_fts (boletos_fts) VALUES ('rebuild')")
+            _marcar_modo(conn, False)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    database.fechar_conexoes()
+    pasta = database.pasta_perfis()
+    if os.path.isdir(pasta):
+        os.replace(pasta, pasta + '_juntada')
+    return resumo
+
+def _copiar_de_volta(conn, usuario_id, colunas):
+    """
+    INSERT dos boletos de um perfil no banco principal, dentro da transação
+    já aberta. Os ids de categoria e empresa do perfil não valem aqui: as
+    linhas vêm da visão com os nomes e o id sai do nome, como em nomes.copiar.
+    """
+    campos = [c for c in colunas if c not in nomes.IDS]
+    lidos = campos + list(nomes.IDS.values())
+    dono = f"?{campos.index('usuario_id') + 1}"
+    valores = [f'?{posicao}' for posicao in range(1, len(campos) + 1)] + [
+        f"(SELECT id FROM {nomes.TABELAS[coluna]} WHERE usuario_id = {dono} AND nome = ?{posicao})"
+        for posicao, coluna in enumerate(nomes.IDS.values(), start=len(campos) + 1)
+    ]
+    sql = f"INSERT INTO boletos ({', '.join(campos + list(nomes.IDS))}) VALUES ({', '.join(valores)})"
+
+    # ATTACH não pode rodar dentro de transação: o arquivo é lido por outra conexão
+    conn_perfil = database.get_db_connection(database.caminho_perfil(usuario_id))
+    try:
+        cursor = conn_perfil.execute(f"SELECT {', '.join(lidos)} FROM {nomes.VISAO} ORDER BY id")
+        total = 0
+        while True:
+            lote = cursor.fetchmany(5000)
+            if not lote:
+                return total
+            for coluna in nomes.IDS.values():
+                nomes.cadastrar(conn, coluna, ((linha['usuario_id'], linha[coluna]) for linha in lote))
+            conn.executemany(sql, lote)
+            total += len(lote)
+    finally:
+        conn_perfil.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Liga ou desliga o modo "um banco por perfil"')
+    parser.add_argument('acao', choices=('dividir', 'juntar'))
+    parser.add_argument('--banco', default=database.CAMINHO_BANCO)
+    args = parser.parse_args()
+
+    database.configurar_banco(args.banco)
+    acao = dividir if args.acao == 'dividir' else juntar
+    resultado = acao(ao_progredir=lambda feitos, total: print(f"  perfil {feitos}/{total}"))
+    print(resultado)
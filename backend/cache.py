@@ -0,0 +1,189 @@
+"""
+Cache em memória das respostas de leitura (buscas, categorias, dashboard).
+
+A chave é (banco, usuário, método, argumentos ligados à assinatura, com os
+valores padrão). Só dentro de 'filtros' os vazios são descartados e as listas
+ordenadas, então {'empresa': ''} e {} caem na mesma entrada, assim como
+['Peças', 'Combustível'] e ['Combustível', 'Peças']; nos outros argumentos
+None, '' e False são diferentes e a ordem das listas (ex: colunas) conta.
+
+Invalidação:
+- cada usuário tem um contador de geração, que os métodos de escrita
+  incrementam (invalidar) DEPOIS do commit. Uma entrada só vale se foi
+  calculada na geração atual; a geração é lida ANTES da consulta, então
+  uma leitura que correu junto com uma escrita nunca fica valendo;
+- entradas que dependem da data (juros, "vence hoje") morrem na virada do dia.
+
+O tamanho é limitado por quantidade de entradas e pelo total de linhas
+guardadas; as usadas há mais tempo saem primeiro (LRU).
+"""
+import inspect
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+from backend import database
+
+MAXIMO_ENTRADAS = 256
+MAXIMO_LINHAS = 20000
+
+def _normalizar_filtros(valor):
+    """
+    Forma canônica de 'filtros': filtros vazios somem e as listas
+    (categorias) são ordenadas, porque aqui vazio e ausente, ou a mesma
+    lista em outra ordem, filtram igual.
+    """
+    if isinstance(valor, dict):
+        return tuple(sorted(
+            (chave, _normalizar_filtros(v))
+            for chave, v in valor.items()
+            if v not in (None, '', [], False)
+        ))
+    if isinstance(valor, (list, tuple, set)):
+        return tuple(sorted((_normalizar_filtros(v) for v in valor), key=repr))
+    return valor
+
+def _normalizar(valor):
+    """
+    Forma 'hasheável' de um argumento, sem perder nada: None, '' e False
+    continuam diferentes e listas mantêm a ordem (ex: colunas da listagem).
+    """
+    if isinstance(valor, dict):
+        return ('dict', tuple(sorted((chave, _normalizar(v)) for chave, v in valor.items())))
+    if isinstance(valor, (list, tuple)):
+        return ('list', tuple(_normalizar(v) for v in valor))
+    if isinstance(valor, set):
+        return ('set', tuple(sorted((_normalizar(v) for v in valor), key=repr)))
+    return (type(valor).__name__, valor)
+
+def chave_argumentos(assinatura, args, kwargs):
+    """
+    Argumentos de uma chamada como parte da chave: ligados aos parâmetros
+    (com os valores padrão), então buscar_boletos(f, 1) e
+    buscar_boletos(f, pagina=1) caem na mesma entrada, mas cursor=None e
+    cursor='' não.
+    """
+    ligados = assinatura.bind(*args, **kwargs)
+    ligados.apply_defaults()
+    return tuple(
+        (nome, _normalizar_filtros(valor) if nome == 'filtros' else _normalizar(valor))
+        for nome, valor in ligados.arguments.items()
+        if nome != 'self'
+    )
+
+def _linhas(resposta):
+    if isinstance(resposta, list):
+        return len(resposta)
+    if isinstance(resposta, dict) and isinstance(resposta.get('dados'), list):
+        return len(resposta['dados'])
+    if isinstance(resposta, dict) and isinstance(resposta.get('dados'), dict) and 'linhas' in resposta['dados']:
+        # Formato compacto da listagem ({'colunas', 'linhas'})
+        return len(resposta['dados']['linhas'])
+    return 1
+
+class CacheResultados:
+    def __init__(self, maximo_entradas=MAXIMO_ENTRADAS, maximo_linhas=MAXIMO_LINHAS):
+        self.ativo = True
+        self.maximo_entradas = maximo_entradas
+        self.maximo_linhas = maximo_linhas
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict() # chave -> (geração, dia ou None, linhas, resposta)
+        self._geracoes = {}
+        self._linhas = 0
+        self.acertos = 0
+        self.faltas = 0
+
+    def geracao(self, usuario_id):
+        return self._geracoes.get(usuario_id, 0)
+
+    def invalidar(self, usuario_id=None):
+        """ Chamar depois de gravar: tudo que foi calculado antes deixa de valer """
+        with self._lock:
+            if usuario_id is None:
+                # Sem usuário (ex: troca de banco): esvazia tudo
+                self._entradas.clear()
+                self._linhas = 0
+                for usuario in self._geracoes:
+                    self._geracoes[usuario] += 1
+            else:
+                self._geracoes[usuario_id] = self._geracoes.get(usuario_id, 0) + 1
+
+    def obter(self, chave, usuario_id):
+        """ A resposta guardada (cópia rasa do dict) ou None """
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                geracao, dia, linhas, resposta = entrada
+                if geracao == self.geracao(usuario_id) and (dia is None or dia == date.today()):
+                    self._entradas.move_to_end(chave)
+                    self.acertos += 1
+                    return dict(resposta) if isinstance(resposta, dict) else list(resposta)
+                # Velha: sai logo
+                del self._entradas[chave]
+                self._linhas -= linhas
+            self.faltas += 1
+            return None
+
+    def guardar(self, chave, geracao, dia, resposta):
+        linhas = _linhas(resposta)
+        if linhas > self.maximo_linhas:
+            return
+        with self._lock:
+            antiga = self._entradas.pop(chave, None)
+            if antiga is not None:
+                self._linhas -= antiga[2]
+            self._entradas[chave] = (geracao, dia, linhas, resposta)
+            self._linhas += linhas
+            while len(self._entradas) > self.maximo_entradas or self._linhas > self.maximo_linhas:
+                _, removida = self._entradas.popitem(last=False)
+                self._linhas -= removida[2]
+
+    def estatisticas(self):
+        with self._lock:
+            total = self.acertos + self.faltas
+            return {
+                'ativo': self.ativo,
+                'entradas': len(self._entradas),
+                'linhas': self._linhas,
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+                'taxa_acerto': round(self.acertos * 100 / total, 1) if total else 0.0,
+            }
+
+# Instância única usada pela BoletoAPI
+resultados = CacheResultados()
+
+def em_cache(depende_da_data=False):
+    """
+    Decorador para métodos de leitura da BoletoAPI: guarda a resposta por
+    usuário logado + argumentos. Só respostas de sucesso são guardadas.
+    """
+    def decorador(metodo):
+        assinatura = inspect.signature(metodo)
+
+        @wraps(metodo)
+        def com_cache(self, *args, **kwargs):
+            if not resultados.ativo or not self.usuario_atual:
+                return metodo(self, *args, **kwargs)
+
+            usuario_id = self.usuario_atual['id']
+            try:
+                argumentos = chave_argumentos(assinatura, (self,) + args, kwargs)
+            except TypeError:
+                return metodo(self, *args, **kwargs) # Argumentos errados: o próprio método responde
+            chave = (database.CAMINHO_BANCO, usuario_id, metodo.__name__, argumentos)
+            resposta = resultados.obter(chave, usuario_id)
+            if resposta is not None:
+                return resposta
+
+            # Geração e dia lidos ANTES da consulta (uma escrita no meio invalida o resultado)
+            geracao = resultados.geracao(usuario_id)
+            dia = date.today() if depende_da_data else None
+            resposta = metodo(self, *args, **kwargs)
+            if isinstance(resposta, list) or (isinstance(resposta, dict) and resposta.get('status') == 'sucesso'):
+                resultados.guardar(chave, geracao, dia, resposta)
+                resposta = dict(resposta) if isinstance(resposta, dict) else list(resposta)
+            return resposta
+        return com_cache
+    return decorador
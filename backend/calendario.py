@@ -0,0 +1,163 @@
+"""
+Calendário de dias úteis de Nova Venécia/ES.
+
+Os feriados de uma faixa de anos são calculados UMA vez e guardados em
+arrays indexados pelo número do dia (dia 0 = 1º de janeiro do primeiro ano).
+Assim, "qual o próximo dia útil?" e "quantos dias úteis entre A e B?"
+viram uma simples leitura de posição, sem recalcular Páscoa nem feriados.
+"""
+import threading
+from array import array
+from datetime import date, timedelta
+
+# Faixa carregada por padrão (é ampliada sozinha se aparecer data fora dela)
+ANOS_PARA_TRAS = 10
+ANOS_PARA_FRENTE = 15
+
+def calcular_pascoa(ano):
+    """ Calcula a data do Domingo de Páscoa para qualquer ano """
+    a = ano % 19
+    b = ano // 100
+    c = ano % 100
+    d = b // 4
+    e = b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i = c // 4
+    k = c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+
+    mes = (h + l - 7 * m + 114) // 31
+    dia = ((h + l - 7 * m + 114) % 31) + 1
+
+    return date(ano, mes, dia)
+
+def feriados_do_ano(ano):
+    """ Retorna um SET de objetos date com os feriados do ano """
+    pascoa = calcular_pascoa(ano)
+
+    # Feriados Móveis (Baseados na Páscoa)
+    carnaval_seg = pascoa - timedelta(days=48)
+    carnaval_ter = pascoa - timedelta(days=47)
+    quarta_cinzas = pascoa - timedelta(days=46)
+    sexta_paixao = pascoa - timedelta(days=2)
+    corpus_christi = pascoa + timedelta(days=60)
+
+    # N. Sra. da Penha (ES) - Tradicionalmente na segunda-feira, 8 dias após a Páscoa
+    nossa_sra_penha = pascoa + timedelta(days=8)
+
+    feriados = {
+        carnaval_seg, carnaval_ter, quarta_cinzas,
+        sexta_paixao, pascoa, corpus_christi, nossa_sra_penha
+    }
+
+    # Feriados Fixos (Nacionais, Estaduais e Municipais de Nova Venécia)
+    # Formato (Mês, Dia)
+    datas_fixas = [
+        (1, 1),   # Confraternização Universal
+        (1, 26),  # Aniversário de Nova Venécia (Municipal)
+        (4, 21),  # Tiradentes
+        (4, 24),  # São Marcos (Municipal)
+        (5, 1),   # Dia do Trabalho
+        (5, 23),  # Colonização do Solo ES (Estadual)
+        (9, 7),   # Independência
+        (10, 12), # N. Sra. Aparecida
+        (11, 2),  # Finados
+        (11, 15), # Proclamação da República
+        (11, 20), # Consciência Negra
+        (12, 25), # Natal
+    ]
+
+    for mes, dia in datas_fixas:
+        feriados.add(date(ano, mes, dia))
+
+    return feriados
+
+class CalendarioUteis:
+    """
+    Tabela pré-calculada de dias úteis para os anos [ano_inicio, ano_fim].
+
+    - _salto[i]: quantos dias faltam do dia i até o próximo dia útil (0 = já é útil)
+    - _acumulado[i]: quantos dias úteis existem antes do dia i
+    """
+
+    def __init__(self, ano_inicio=None, ano_fim=None):
+        hoje = date.today()
+        self._lock = threading.Lock()
+        self._montar(
+            ano_inicio if ano_inicio is not None else hoje.year - ANOS_PARA_TRAS,
+            ano_fim if ano_fim is not None else hoje.year + ANOS_PARA_FRENTE,
+        )
+
+    def _montar(self, ano_inicio, ano_fim):
+        inicio = date(ano_inicio, 1, 1)
+        # Alguns dias do ano seguinte entram só para resolver o "próximo útil"
+        # de 31/12 em diante; eles não fazem parte da faixa oficial.
+        # No último ano que o Python representa (9999), a faixa para em date.max.
+        fim_interno = date(ano_fim + 1, 1, 31) if ano_fim < date.max.year else date.max
+        total = (fim_interno - inicio).days + 1
+
+        feriados = set()
+        for ano in range(ano_inicio, fim_interno.year + 1):
+            feriados |= feriados_do_ano(ano)
+
+        util = bytearray(total)
+        base = inicio.toordinal()
+        for i in range(total):
+            dia = date.fromordinal(base + i) # Sem somar um dia depois do último (date.max)
+            # 0=Seg, 5=Sab, 6=Dom
+            util[i] = 1 if dia.weekday() < 5 and dia not in feriados else 0
+
+        salto = array('i', bytes(4 * total))
+        for i in range(total - 1, -1, -1):
+            if not util[i]:
+                salto[i] = salto[i + 1] + 1 if i + 1 < total else 1
+
+        acumulado = array('i', bytes(4 * (total + 1)))
+        for i in range(total):
+            acumulado[i + 1] = acumulado[i] + util[i]
+
+        # Troca tudo de uma vez (uma única atribuição) para quem estiver lendo em outra thread
+        self._dados = (inicio.toordinal(), util, salto, acumulado)
+        self.ano_inicio = ano_inicio
+        self.ano_fim = ano_fim
+
+    def arrays(self, *dias):
+        """
+        Retorna (ordinal do dia 0, util, salto, acumulado) garantindo que todos
+        os dias informados estão na faixa. Serve para quem quiser consultar
+        muitos dias de uma vez pelo índice (ex: cálculo de juros em lote).
+        """
+        for dia in dias:
+            if dia.year < self.ano_inicio or dia.year > self.ano_fim:
+                with self._lock:
+                    if dia.year < self.ano_inicio or dia.year > self.ano_fim:
+                        self._montar(min(dia.year, self.ano_inicio), max(dia.year, self.ano_fim))
+        return self._dados
+
+    def eh_dia_util(self, dia):
+        base, util, _, _ = self.arrays(dia)
+        return bool(util[dia.toordinal() - base])
+
+    def proximo_dia_util(self, dia):
+        """ O próprio dia se for útil, senão o próximo dia útil """
+        base, _, salto, _ = self.arrays(dia)
+        pulo = salto[dia.toordinal() - base]
+        if not pulo:
+            return dia
+        # Depois de date.max não há próximo dia: fica o último que existe
+        if dia.toordinal() + pulo > date.max.toordinal():
+            return date.max
+        return dia + timedelta(days=pulo)
+
+    def dias_uteis_entre(self, inicio, fim):
+        """ Quantidade de dias úteis no intervalo [inicio, fim) """
+        if fim <= inicio:
+            return 0
+        base, _, _, acumulado = self.arrays(inicio, fim)
+        return acumulado[fim.toordinal() - base] - acumulado[inicio.toordinal() - base]
+
+# Instância única usada pelo resto do sistema
+calendario = CalendarioUteis()
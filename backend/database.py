@@ -1,13 +1,230 @@
+import logging
+import os
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
 
-def get_db_connection():
-    conn = sqlite3.connect('sistema_boletos.db')
+from backend.migracoes import migrar
+
+CAMINHO_BANCO = 'sistema_boletos.db'
+
+# Modo "um banco por perfil" (opcional, ver backend/bancos_perfil.py):
+# CAMINHO_BANCO vira o catálogo (perfis e fotos) e os boletos de cada perfil
+# ficam em <nome do banco>_perfis/perfil_<id>.db. Preenchido pelo init_db.
+BANCOS_POR_PERFIL = False
+
+# Quantas conexões o pool mantém abertas ao mesmo tempo.
+# O Pywebview dispara cada chamada do JS em uma thread nova, então
+# conexões "por thread" seriam perdidas; um pool pequeno é reaproveitado.
+TAMANHO_POOL = 4
+
+# Pragmas aplicados em toda conexão nova
+PRAGMAS = (
+    "PRAGMA auto_vacuum = INCREMENTAL", # Só vale em arquivo novo (antes do WAL); ver backend/manutencao.py
+    "PRAGMA journal_mode = WAL",        # Leitores não bloqueiam o escritor
+    "PRAGMA synchronous = NORMAL",      # Seguro com WAL e bem menos fsync
+    "PRAGMA mmap_size = 268435456",     # 256 MB mapeados em memória
+    "PRAGMA cache_size = -65536",       # 64 MB de cache de páginas
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 30000",
+    "PRAGMA journal_size_limit = 67108864", # O -wal volta a 64 MB depois de um checkpoint
+)
+
+def get_db_connection(caminho=None):
+    """ Abre uma conexão avulsa já configurada (quem chamar deve fechar) """
+    conn = sqlite3.connect(
+        caminho or CAMINHO_BANCO,
+        timeout=30,
+        check_same_thread=False,
+        cached_statements=256, # Cache de prepared statements por conexão
+    )
     # Isso permite acessar colunas pelo nome (ex: linha['sacado'])
-    conn.row_factory = sqlite3.Row 
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
     return conn
 
-def init_db():
-    conn = get_db_connection()
+# Funções aplicadas em cada conexão do pool antes do uso (ex: instrumentação).
+# Ao mudar a lista, a versão sobe e cada conexão é reconfigurada no próximo
+# empréstimo (nunca enquanto outra thread está usando).
+_ganchos_conexao = []
+_versao_ganchos = 0
+
+def registrar_gancho_conexao(funcao):
+    """ funcao(conn) passa a ser chamada em toda conexão emprestada pelo pool """
+    global _versao_ganchos
+    if funcao not in _ganchos_conexao:
+        _ganchos_conexao.append(funcao)
+    _versao_ganchos += 1
+
+def reaplicar_ganchos_conexao():
+    """ Faz os ganchos rodarem de novo em cada conexão (ex: depois de mudar uma configuração) """
+    global _versao_ganchos
+    _versao_ganchos += 1
+
+class PoolConexoes:
+    """ Mantém conexões de longa duração e empresta uma por vez para cada chamada """
+
+    def __init__(self, tamanho=TAMANHO_POOL, caminho=None):
+        self.tamanho = tamanho
+        self.caminho = caminho # None = CAMINHO_BANCO
+        self._livres = queue.LifoQueue()
+        self._todas = []
+        self._versoes = {} # id(conexão) -> versão dos ganchos já aplicada
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        try:
+            return self._preparar(self._livres.get_nowait())
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._todas) < self.tamanho:
+                conn = get_db_connection(self.caminho)
+                self._todas.append(conn)
+                return self._preparar(conn)
+
+        # Pool cheio: espera alguém devolver
+        return self._preparar(self._livres.get())
+
+    def _preparar(self, conn):
+        versao = _versao_ganchos
+        if self._versoes.get(id(conn)) != versao:
+            for gancho in list(_ganchos_conexao):
+                gancho(conn)
+            self._versoes[id(conn)] = versao
+        return conn
+
+    def devolver(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._livres.put(conn)
+
+    def fechar(self):
+        with self._lock:
+            for conn in self._todas:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._todas = []
+            self._versoes = {}
+            self._livres = queue.LifoQueue()
+
+_pool = None
+_pools_perfil = {} # id do perfil -> pool do banco dele (modo BANCOS_POR_PERFIL)
+_pool_lock = threading.Lock()
+
+# Preenchido pelo init_db: o banco tem o índice de texto boletos_fts?
+FTS_DISPONIVEL = False
+
+def pasta_perfis(caminho=None):
+    """ Pasta dos bancos por perfil: sistema_boletos.db -> sistema_boletos_perfis """
+    return os.path.splitext(caminho or CAMINHO_BANCO)[0] + '_perfis'
+
+def caminho_perfil(usuario_id, caminho=None):
+    return os.path.join(pasta_perfis(caminho), f'perfil_{int(usuario_id)}.db')
+
+def obter_pool(usuario_id=None):
+    """
+    Pool do banco principal ou, no modo BANCOS_POR_PERFIL, o do banco do
+    perfil 'usuario_id' (criado e migrado na primeira vez que é aberto).
+    """
+    global _pool
+    with _pool_lock:
+        if usuario_id is None or not BANCOS_POR_PERFIL:
+            if _pool is None:
+                _pool = PoolConexoes()
+            return _pool
+
+        pool = _pools_perfil.get(usuario_id)
+        if pool is None:
+            caminho = caminho_perfil(usuario_id)
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            pool = PoolConexoes(caminho=caminho)
+            conn = pool.adquirir()
+            try:
+                preparar_banco(conn)
+            finally:
+                pool.devolver(conn)
+            _pools_perfil[usuario_id] = pool
+        return pool
+
+def configurar_banco(caminho):
+    """ Troca o arquivo do banco (fecha as conexões do pool anterior) """
+    global CAMINHO_BANCO, BANCOS_POR_PERFIL
+    fechar_conexoes()
+    CAMINHO_BANCO = caminho
+    BANCOS_POR_PERFIL = False # O init_db lê de novo no banco novo
+
+def fechar_conexoes():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.fechar()
+            _pool = None
+        for pool in _pools_perfil.values():
+            pool.fechar()
+        _pools_perfil.clear()
+
+def fechar_banco_perfil(usuario_id):
+    """ Fecha as conexões do banco de um perfil (ex: antes de apagar o arquivo) """
+    with _pool_lock:
+        pool = _pools_perfil.pop(usuario_id, None)
+    if pool is not None:
+        pool.fechar()
+
+# Conexão emprestada a cada thread neste momento (para interromper uma consulta de fora)
+_em_uso = {}
+_em_uso_lock = threading.Lock()
+
+def interromper(id_thread):
+    """
+    Interrompe o comando SQL em andamento na conexão emprestada à thread
+    'id_thread' (o comando falha com OperationalError: interrupted).
+    Retorna False se a thread não estiver com nenhuma conexão.
+    """
+    with _em_uso_lock:
+        conn = _em_uso.get(id_thread)
+        if conn is None:
+            return False
+        conn.interrupt()
+        return True
+
+@contextmanager
+def conexao(usuario_id=None):
+    """
+    Empresta uma conexão do pool.
+    Faz commit se o bloco terminar sem erro e rollback caso contrário.
+    Com usuario_id, a conexão é a do banco onde ficam os boletos desse perfil
+    (o próprio banco principal, fora do modo BANCOS_POR_PERFIL).
+    """
+    pool = obter_pool(usuario_id)
+    conn = pool.adquirir()
+    id_thread = threading.get_ident()
+    with _em_uso_lock:
+        anterior = _em_uso.get(id_thread)
+        _em_uso[id_thread] = conn
+    try:
+        yield conn
+        if conn.in_transaction:
+            conn.commit()
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        # Sai do registro ANTES de devolver: depois disso a conexão pode ser de outra thread
+        with _em_uso_lock:
+            if anterior is None:
+                _em_uso.pop(id_thread, None)
+            else:
+                _em_uso[id_thread] = anterior
+        pool.devolver(conn)
+
+def criar_tabelas(conn):
     # Cria a tabela se não existir
     conn.execute('''
                  CREATE TABLE IF NOT EXISTS usuarios (
@@ -29,11 +246,12 @@ def init_db():
                      placa TEXT,
                      descricao TEXT,
 
-                     valor_original REAL,
-                     juros REAL,
+                     -- Dinheiro em centavos (ver backend/dinheiro.py)
+                     valor_original INTEGER,
+                     juros NUMERIC,
                      tipo_juros TEXT DEFAULT 'R$',
-                     multa REAL,
-                     valor_total REAL,
+                     multa INTEGER,
+                     valor_total INTEGER,
 
                      data_pagamento TEXT,
                      banco_pagamento TEXT,
@@ -45,4 +263,30 @@ def init_db():
                      )
     ''')
     conn.commit()
-    conn.close()
+
+def preparar_banco(conn):
+    """
+    Deixa um arquivo no esquema atual: tabelas e migrações.
+    Vale para o banco principal e para o banco de cada perfil.
+    Retorna as migrações aplicadas.
+    """
+    criar_tabelas(conn)
+    # Atualiza bancos antigos para o esquema atual (índices, colunas novas...)
+    aplicadas = migrar(conn)
+    conn.commit()
+    return aplicadas
+
+def init_db():
+    global FTS_DISPONIVEL, BANCOS_POR_PERFIL
+
+    with conexao() as conn:
+        aplicadas = preparar_banco(conn)
+        FTS_DISPONIVEL = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'boletos_fts'"
+        ).fetchone() is not None
+        BANCOS_POR_PERFIL = conn.execute(
+            "SELECT 1 FROM configuracao WHERE chave = 'bancos_por_perfil' AND valor = '1'"
+        ).fetchone() is not None
+    if aplicadas:
+        # Sem print: quem usa o backend (janela, servidor, testes) decide se e onde isso aparece
+        logging.getLogger('boletos.migracoes').info(f"Banco migrado para a versão {aplicadas[-1]}")
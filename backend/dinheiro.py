@@ -0,0 +1,48 @@
+"""
+Valores em dinheiro.
+
+No banco, os valores (valor_original, multa, valor_total) ficam em centavos
+inteiros: as somas dos relatórios e do dashboard são SUM exatos no SQLite,
+sem o erro que o float acumula em milhares de linhas.
+
+A coluna juros depende do tipo_juros:
+- 'R$': centavos por dia de atraso (inteiro);
+- '%': percentual ao dia (ex: 0.033), que não é dinheiro e continua REAL.
+
+A tela, as planilhas importadas e os arquivos exportados continuam em reais;
+a conversão é feita só nessas bordas, por estas funções. Reais -> centavos
+passa por Decimal (0.285 vira 29 centavos, não 28.499999...).
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+_CENTAVO = Decimal('0.01')
+
+def para_centavos(valor):
+    """ 12.5 / '12.50' / Decimal -> 1250. Vazio ou None -> 0 """
+    if valor is None or valor == '':
+        return 0
+    return int(Decimal(str(valor)).quantize(_CENTAVO, rounding=ROUND_HALF_UP) * 100)
+
+def para_reais(centavos):
+    """ 1250 -> 12.5 (None continua None) """
+    if centavos is None:
+        return None
+    return centavos / 100
+
+def juros_para_banco(tipo_juros, juros):
+    """ Juros vindo da tela: R$ vira centavos; % fica como está """
+    if tipo_juros == '%':
+        return float(juros) if juros not in (None, '') else 0.0
+    return para_centavos(juros)
+
+def juros_para_tela(tipo_juros, juros):
+    if tipo_juros == '%':
+        return juros
+    return para_reais(juros)
+
+def arredondar_centavos(valor):
+    """
+    Centavos fracionários (juros percentuais) -> inteiro, com meio centavo
+    para cima. Mesma conta do CAST(valor + 0.5 AS INTEGER) usado no SQL.
+    """
+    return int(valor + 0.5)
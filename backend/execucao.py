@@ -0,0 +1,166 @@
+"""
+Camada de execução das chamadas do JS: leituras num pool (LEITORES), escritas
+numa fila de uma thread só e buscas antigas canceladas pela nova (CANCELAVEIS).
+"""
+import contextvars
+import sqlite3
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from functools import wraps
+from types import MethodType
+
+from backend import database
+from backend.sessoes import sessao_atual
+
+# Threads de leitura (o pool do banco tem uma conexão a mais, para o escritor)
+LEITORES = max(1, database.TAMANHO_POOL - 1)
+
+# Só leem o banco: podem rodar em paralelo
+LEITURAS = {
+    'listar_perfis', 'obter_foto', 'buscar_boletos', 'obter_resumo_dashboard',
+    'obter_categorias_usadas', 'obter_empresas_usadas', 'gerar_relatorio_mensal', 'gerar_relatorio', 'gerar_relatorio_perfis',
+    'exportar_boletos',
+}
+
+# Uma chamada nova do mesmo método cancela a anterior
+CANCELAVEIS = {'buscar_boletos', 'obter_resumo_dashboard', 'gerar_relatorio_mensal', 'gerar_relatorio'}
+
+# Não usam o banco (ou têm a própria fila, como o backup): rodam direto.
+# importar_arquivo e exportar_boletos abrem a janela de arquivo aqui e só
+# então mandam o trabalho para o pool certo (executor.executar);
+# arquivar_pagos manda um lote por vez para a fila do escritor
+DIRETOS = {
+    'estaLogado', 'logout', 'proximo_dia_util', 'calcular_pascoa', 'obter_feriados_nova_venecia',
+    'calculaValorComJuros', 'conectar_janela', 'fazer_backup', 'obter_alteracoes',
+    'obter_metricas', 'configurar_instrumentacao', 'limpar_metricas', 'importar_arquivo', 'exportar_boletos',
+    'arquivar_pagos',
+}
+
+RESPOSTA_CANCELADA = {'status': 'cancelado', 'msg': 'Substituída por uma requisição mais nova.'}
+
+class _Requisicao:
+    """ Uma chamada em andamento: número, futuro no pool e thread que está rodando (se já começou) """
+
+    def __init__(self, numero):
+        self.numero = numero
+        self.futuro = None
+        self.id_thread = None
+        self.substituida = False
+
+class Executor:
+    def __init__(self, leitores=LEITORES):
+        self._leitura = ThreadPoolExecutor(max_workers=leitores, thread_name_prefix='leitura')
+        self._escrita = ThreadPoolExecutor(max_workers=1, thread_name_prefix='escrita')
+        self._lock = threading.Lock()
+        self._numero = 0
+        self._ultimas = {} # (sessão, método cancelável) -> última _Requisicao
+        self._local = threading.local()
+        self._em_andamento = 0
+        self._fim_ultima = time.monotonic()
+
+    def _substituir(self, canal, requisicao):
+        """ Registra 'requisicao' como a mais nova do canal e cancela a anterior (chamar com o lock) """
+        anterior = self._ultimas.get(canal)
+        self._ultimas[canal] = requisicao
+        if anterior is None:
+            return
+        anterior.substituida = True
+        if anterior.futuro.cancel():
+            return # Ainda estava na fila: nem chega a rodar
+        if anterior.id_thread is not None:
+            database.interromper(anterior.id_thread)
+
+    def executar(self, nome, funcao, *args, **kwargs):
+        """ Roda funcao(*args, **kwargs) no pool certo e espera a resposta """
+        if getattr(self._local, 'dentro', False):
+            # Chamada feita de dentro de outra já no pool: roda ali mesmo (esperar a
+            # fila do escritor de dentro do próprio escritor nunca terminaria)
+            return funcao(*args, **kwargs)
+
+        def tarefa():
+            with self._lock:
+                if requisicao.substituida:
+                    return dict(RESPOSTA_CANCELADA)
+                requisicao.id_thread = threading.get_ident()
+            self._local.dentro = True
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                self._local.dentro = False
+                with self._lock:
+                    requisicao.id_thread = None
+
+        pool = self._leitura if nome in LEITURAS else self._escrita
+        sessao = sessao_atual.get()
+        canal = (sessao.token if sessao else None, nome)
+        with self._lock:
+            self._numero += 1
+            requisicao = _Requisicao(self._numero)
+            # copy_context: a sessão da chamada continua valendo na thread do pool
+            requisicao.futuro = pool.submit(contextvars.copy_context().run, tarefa)
+            self._em_andamento += 1
+            if nome in CANCELAVEIS:
+                self._substituir(canal, requisicao)
+
+        try:
+            resposta = requisicao.futuro.result()
+        except CancelledError:
+            return dict(RESPOSTA_CANCELADA, requisicao=requisicao.numero)
+        except sqlite3.OperationalError:
+            if requisicao.substituida:
+                return dict(RESPOSTA_CANCELADA, requisicao=requisicao.numero)
+            raise
+        finally:
+            with self._lock:
+                self._em_andamento -= 1
+                self._fim_ultima = time.monotonic()
+                if nome in CANCELAVEIS and self._ultimas.get(canal) is requisicao:
+                    del self._ultimas[canal]
+
+        if requisicao.substituida:
+            # Terminou, mas já existe uma mais nova: a tela vai ignorar esta
+            return dict(RESPOSTA_CANCELADA, requisicao=requisicao.numero)
+        if isinstance(resposta, dict):
+            resposta.setdefault('requisicao', requisicao.numero)
+        return resposta
+
+    def chamadas(self):
+        """ Quantas chamadas já começaram (muda sempre que a tela faz alguma coisa) """
+        return self._numero
+
+    def ocioso_ha(self):
+        """ Segundos desde o fim da última chamada (0 enquanto alguma está rodando) """
+        with self._lock:
+            if self._em_andamento:
+                return 0
+            return time.monotonic() - self._fim_ultima
+
+    def encerrar(self):
+        """ Para de aceitar chamadas e descarta as que ainda estão na fila """
+        self._leitura.shutdown(wait=False, cancel_futures=True)
+        self._escrita.shutdown(wait=True, cancel_futures=True)
+
+# Instância única usada pela BoletoAPI
+executor = Executor()
+
+def encerrar_execucao():
+    executor.encerrar()
+
+def distribuir(api, executor=executor):
+    """ Troca cada método público de 'api' que usa o banco pela versão que roda no 'executor' """
+    for nome in dir(type(api)):
+        if nome.startswith('_') or nome in DIRETOS:
+            continue
+        metodo = getattr(api, nome)
+        if not callable(metodo):
+            continue
+
+        def envolver(nome, metodo):
+            @wraps(metodo)
+            def distribuido(_api, *args, **kwargs):
+                return executor.executar(nome, metodo, *args, **kwargs)
+            return distribuido
+
+        # MethodType: continua sendo um "método" para o Pywebview enxergar
+        setattr(api, nome, MethodType(envolver(nome, metodo), api))
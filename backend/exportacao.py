@@ -0,0 +1,178 @@
+"""
+Exportação dos boletos filtrados para CSV ou XLSX.
+
+As linhas saem do banco em blocos (fetchmany) direto para o arquivo, com
+o valor atualizado e os dias de atraso calculados bloco a bloco. A memória
+usada é a mesma para mil ou para um milhão de boletos.
+
+O XLSX é escrito à mão (é um ZIP com alguns XML), em streaming, para não
+depender de bibliotecas externas.
+"""
+import csv
+import zipfile
+from xml.sax.saxutils import escape
+
+from backend.dinheiro import juros_para_tela, para_reais
+from backend.juros import calcular_lote
+
+# Quantas linhas são lidas do banco por vez
+TAMANHO_BLOCO = 2000
+
+# (coluna do banco ou calculada, título no arquivo)
+COLUNAS = [
+    ('id', 'ID'),
+    ('vencimento', 'Vencimento'),
+    ('vencimento_util', 'Vencimento (dia útil)'),
+    ('status', 'Status'),
+    ('empresa', 'Empresa'),
+    ('categoria', 'Categoria'),
+    ('placa', 'Placa'),
+    ('descricao', 'Descrição'),
+    ('valor_original', 'Valor Original'),
+    ('juros', 'Juros'),
+    ('tipo_juros', 'Tipo Juros'),
+    ('multa', 'Multa'),
+    ('valor_atualizado', 'Valor Atualizado'),
+    ('dias_atraso', 'Dias de Atraso'),
+    ('valor_total', 'Valor Pago'),
+    ('data_pagamento', 'Data Pagamento'),
+    ('banco_pagamento', 'Banco'),
+    ('numero_parcela', 'Parcela'),
+    ('total_parcelas', 'Total Parcelas'),
+]
+
+# Colunas lidas do banco (as calculadas saem de vencimento, valor_original, juros...)
+COLUNAS_DO_BANCO = [coluna for coluna, _ in COLUNAS if coluna not in ('valor_atualizado', 'dias_atraso')]
+
+# Colunas que o Excel brasileiro precisa ver com vírgula decimal no CSV
+_COLUNAS_MONETARIAS = {'valor_original', 'juros', 'multa', 'valor_atualizado', 'valor_total'}
+
+# Guardadas em centavos no banco, saem em reais no arquivo
+_COLUNAS_CENTAVOS = {'valor_original', 'multa', 'valor_total'}
+
+def blocos_com_juros(cursor):
+    """ Lê o cursor em blocos e devolve cada bloco como lista de tuplas já com os campos calculados (em reais) """
+    nomes = [c[0] for c in cursor.description]
+    posicao = {nome: i for i, nome in enumerate(nomes)}
+
+    while True:
+        linhas = cursor.fetchmany(TAMANHO_BLOCO)
+        if not linhas:
+            break
+
+        valores, atrasos = calcular_lote(
+            [l[posicao['vencimento']] for l in linhas],
+            [l[posicao['valor_original']] for l in linhas],
+            [l[posicao['tipo_juros']] for l in linhas],
+            [l[posicao['juros']] for l in linhas],
+            [l[posicao['multa']] for l in linhas],
+            pendentes=[l[posicao['status']] == 'Pendente' for l in linhas],
+        )
+
+        bloco = []
+        for linha, valor, atraso in zip(linhas, valores, atrasos):
+            saida = []
+            for coluna, _ in COLUNAS:
+                if coluna == 'valor_atualizado':
+                    saida.append(para_reais(valor))
+                elif coluna == 'dias_atraso':
+                    saida.append(atraso)
+                elif coluna in _COLUNAS_CENTAVOS:
+                    saida.append(para_reais(linha[posicao[coluna]]))
+                elif coluna == 'juros':
+                    saida.append(juros_para_tela(linha[posicao['tipo_juros']], linha[posicao['juros']]))
+                else:
+                    saida.append(linha[posicao[coluna]])
+            bloco.append(saida)
+        yield bloco
+
+def escrever_csv(caminho, blocos, ao_escrever=None):
+    """ CSV com ';' e vírgula decimal (abre direto no Excel em português) """
+    monetarias = [i for i, (c, _) in enumerate(COLUNAS) if c in _COLUNAS_MONETARIAS]
+    total = 0
+
+    with open(caminho, 'w', encoding='utf-8-sig', newline='') as arquivo:
+        escritor = csv.writer(arquivo, delimiter=';')
+        escritor.writerow([titulo for _, titulo in COLUNAS])
+        for bloco in blocos:
+            for linha in bloco:
+                for i in monetarias:
+                    if linha[i] is not None:
+                        linha[i] = f"{float(linha[i]):.2f}".replace('.', ',')
+            escritor.writerows(bloco)
+            total += len(bloco)
+            if ao_escrever:
+                ao_escrever(total)
+    return total
+
+def _celula(valor):
+    if valor is None:
+        return '<c/>'
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return f'<c><v>{valor}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(str(valor))}</t></is></c>'
+
+def _linha_xml(valores):
+    return '<row>' + ''.join(_celula(v) for v in valores) + '</row>'
+
+_XLSX_ARQUIVOS_FIXOS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Boletos" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+def escrever_xlsx(caminho, blocos, ao_escrever=None):
+    """ Planilha XLSX de uma aba, com a aba escrita em streaming dentro do ZIP """
+    total = 0
+
+    with zipfile.ZipFile(caminho, 'w', compression=zipfile.ZIP_DEFLATED) as pacote:
+        for nome, conteudo in _XLSX_ARQUIVOS_FIXOS.items():
+            pacote.writestr(nome, conteudo)
+
+        with pacote.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as aba:
+            aba.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            aba.write(_linha_xml([titulo for _, titulo in COLUNAS]).encode('utf-8'))
+            for bloco in blocos:
+                aba.write(''.join(_linha_xml(linha) for linha in bloco).encode('utf-8'))
+                total += len(bloco)
+                if ao_escrever:
+                    ao_escrever(total)
+            aba.write(b'</sheetData></worksheet>')
+
+    return total
+
+def exportar(conn, sql, params, caminho, formato='csv', ao_escrever=None):
+    """ Executa a consulta e grava o resultado no arquivo; retorna quantas linhas foram escritas """
+    cursor = conn.execute(sql, params)
+    blocos = blocos_com_juros(cursor)
+    if formato == 'xlsx':
+        return escrever_xlsx(caminho, blocos, ao_escrever)
+    return escrever_csv(caminho, blocos, ao_escrever)
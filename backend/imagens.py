@@ -0,0 +1,94 @@
+"""
+Fotos de perfil.
+
+As imagens ficam em binário na tabela 'imagens', identificadas pelo SHA-256
+do conteúdo (a mesma foto em dois perfis é gravada uma vez só), junto com
+uma miniatura quadrada de LADO_MINIATURA pixels. A tabela usuarios guarda
+só o hash (foto_hash): listar_perfis manda para a tela as miniaturas, e a
+imagem inteira só é lida quando alguém pede por obter_foto(hash).
+
+A miniatura normalmente já vem pronta do JS (canvas). Se não vier (bancos
+antigos migrados, chamadas diretas), é gerada com o Pillow, quando ele
+estiver instalado; sem ele, imagens pequenas servem de miniatura delas
+mesmas e as grandes ficam sem (a tela busca a imagem inteira).
+"""
+import base64
+import binascii
+import hashlib
+import io
+
+try:
+    from PIL import Image, ImageOps
+except ImportError: # Pillow é opcional
+    Image = None
+
+# Miniatura: quadrado de LADO_MINIATURA px em JPEG
+LADO_MINIATURA = 160
+QUALIDADE_MINIATURA = 85
+
+# Sem miniatura, imagens até esse tamanho vão inteiras na listagem
+MAXIMO_SEM_MINIATURA = 32 * 1024
+
+def ler_data_url(texto):
+    """ 'data:image/png;base64,...' -> ('image/png', bytes). None se não for uma imagem em data URL """
+    if not isinstance(texto, str) or not texto.startswith('data:image/'):
+        return None
+    cabecalho, _, conteudo = texto.partition(',')
+    if not cabecalho.endswith(';base64'):
+        return None
+    try:
+        return cabecalho[5:-7], base64.b64decode(conteudo, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+def data_url(mime, dados):
+    if not dados:
+        return None
+    return f"data:{mime};base64,{base64.b64encode(dados).decode()}"
+
+def gerar_miniatura(dados):
+    """ (mime, bytes) da miniatura, ou None sem o Pillow ou se a imagem não abrir """
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(dados)) as imagem:
+            imagem = ImageOps.exif_transpose(imagem)
+            miniatura = ImageOps.fit(imagem.convert('RGB'), (LADO_MINIATURA, LADO_MINIATURA))
+        saida = io.BytesIO()
+        miniatura.save(saida, 'JPEG', quality=QUALIDADE_MINIATURA)
+        return 'image/jpeg', saida.getvalue()
+    except (OSError, ValueError):
+        return None
+
+def guardar(conn, foto, miniatura=None):
+    """
+    Grava a foto (data URL) e a miniatura (data URL opcional, senão é gerada)
+    e devolve o hash. None se 'foto' não for uma imagem.
+    """
+    imagem = ler_data_url(foto)
+    if imagem is None:
+        return None
+    mime, dados = imagem
+    hash_foto = hashlib.sha256(dados).hexdigest()
+
+    if conn.execute("SELECT 1 FROM imagens WHERE hash = ?", (hash_foto,)).fetchone():
+        return hash_foto # Já guardada (ex: mesma foto em outro perfil)
+
+    mini = ler_data_url(miniatura) or gerar_miniatura(dados)
+    if mini is None and len(dados) <= MAXIMO_SEM_MINIATURA:
+        mini = (mime, dados)
+
+    conn.execute(
+        "INSERT INTO imagens (hash, mime, dados, mime_miniatura, miniatura) VALUES (?, ?, ?, ?, ?)",
+        (hash_foto, mime, dados, mini[0] if mini else None, mini[1] if mini else None)
+    )
+    return hash_foto
+
+def obter(conn, hash_foto):
+    """ A imagem inteira em data URL (None se não existir) """
+    linha = conn.execute("SELECT mime, dados FROM imagens WHERE hash = ?", (hash_foto,)).fetchone()
+    return data_url(linha[0], linha[1]) if linha else None
+
+def remover_orfas(conn):
+    """ Apaga as imagens que nenhum perfil usa mais """
+    conn.execute("DELETE FROM imagens WHERE hash NOT IN (SELECT foto_hash FROM usuarios WHERE foto_hash IS NOT NULL)")
@@ -0,0 +1,342 @@
+"""
+Importação em massa de boletos a partir de planilhas (CSV) e extratos (OFX).
+
+O arquivo é processado como um fluxo de geradores, sem nunca carregar tudo
+na memória:
+
+    ler (CSV/OFX) -> validar -> expandir parcelas -> gravar em lotes
+
+Cada lote é gravado com um único executemany e a sua própria transação.
+
+CSV: primeira linha com o cabeçalho, separado por ';' ou ','. Colunas
+aceitas (maiúsculas/acentos tanto faz): vencimento, valor, empresa,
+categoria, placa, descricao, juros, tipo_juros, multa, parcelas, regra,
+status, data_pagamento, banco, valor_pago. Só vencimento e valor são
+obrigatórias. Datas em AAAA-MM-DD ou DD/MM/AAAA; valores em 1234.56 ou 1.234,56.
+
+OFX: cada débito do extrato (<STMTTRN> com TRNAMT negativo) vira um boleto
+já PAGO na data do lançamento. Créditos são ignorados.
+"""
+import csv
+import math
+import os
+import unicodedata
+from datetime import date
+from decimal import InvalidOperation
+from itertools import islice
+
+from backend import database, nomes
+from backend.lancamentos import gerar_vencimentos, inserir, linhas_parcelas, valores_em_centavos
+
+# Quantos boletos cada transação grava
+TAMANHO_LOTE = 5000
+
+# Quantas mensagens de erro de validação são devolvidas para a tela
+MAXIMO_ERROS_LISTADOS = 100
+
+# Maior inteiro que o SQLite grava (valores em centavos)
+MAXIMO_CENTAVOS = 2 ** 63 - 1
+
+# Nomes de coluna aceitos na planilha -> nome interno
+COLUNAS_CSV = {
+    'vencimento': 'vencimento', 'data_vencimento': 'vencimento', 'data': 'vencimento',
+    'valor': 'valor', 'valor_original': 'valor',
+    'empresa': 'empresa', 'fornecedor': 'empresa',
+    'categoria': 'categoria',
+    'placa': 'placa',
+    'descricao': 'descricao', 'observacao': 'descricao',
+    'juros': 'juros',
+    'tipo_juros': 'tipo_juros', 'tipojuros': 'tipo_juros',
+    'multa': 'multa',
+    'parcelas': 'parcelas',
+    'regra': 'regra',
+    'status': 'status',
+    'data_pagamento': 'data_pagamento',
+    'banco': 'banco', 'banco_pagamento': 'banco',
+    'valor_pago': 'valor_pago', 'valor_total': 'valor_pago',
+}
+
+class _LeitorContado:
+    """ Repassa o texto do arquivo contando quantos caracteres já foram lidos (para o progresso) """
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self.lidos = 0
+
+    def __iter__(self):
+        for linha in self.arquivo:
+            self.lidos += len(linha)
+            yield linha
+
+    def read(self, tamanho):
+        bloco = self.arquivo.read(tamanho)
+        self.lidos += len(bloco)
+        return bloco
+
+def _abrir_texto(caminho):
+    """ Abre o arquivo como texto; planilhas antigas do Excel costumam vir em latin-1 """
+    with open(caminho, 'rb') as f:
+        amostra = f.read(65536)
+    try:
+        amostra.decode('utf-8')
+        codificacao = 'utf-8-sig'
+    except UnicodeDecodeError:
+        codificacao = 'latin-1'
+    return open(caminho, 'r', encoding=codificacao, newline='')
+
+def _normalizar_nome(texto):
+    """ 'Descrição ' -> 'descricao' """
+    texto = unicodedata.normalize('NFKD', texto.strip().lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return texto.replace(' ', '_')
+
+def _ler_data(texto):
+    texto = (texto or '').strip()
+    if not texto:
+        return None
+    try:
+        return _converter_data(texto)
+    except ValueError:
+        raise ValueError(f"data inválida: {texto}")
+
+def _converter_data(texto):
+    if '/' in texto:
+        # DD/MM/AAAA (montado na mão: strptime é lento demais para 100 mil linhas)
+        dia, mes, ano = texto.split('/')
+        return date(int(ano), int(mes), int(dia))
+    if len(texto) >= 8 and texto[:8].isdigit():
+        # Formato OFX: AAAAMMDD[HHMMSS...]
+        return date(int(texto[:4]), int(texto[4:6]), int(texto[6:8]))
+    return date.fromisoformat(texto[:10])
+
+def _ler_valor(texto):
+    texto = str(texto or '').replace('R$', '').replace(' ', '').strip()
+    if not texto:
+        return 0.0
+    if ',' in texto:
+        # Formato brasileiro: 1.234,56
+        texto = texto.replace('.', '').replace(',', '.')
+    valor = float(texto)
+    if not math.isfinite(valor):
+        raise ValueError(f"valor inválido: {texto}")
+    return valor
+
+# --- 1. LEITURA ---
+
+def ler_csv(leitor):
+    """ Gera (numero_da_linha, registro) para cada linha da planilha """
+    cabecalho_linha = next(iter(leitor), '')
+    separador = ';' if cabecalho_linha.count(';') > cabecalho_linha.count(',') else ','
+    cabecalho = next(csv.reader([cabecalho_linha], delimiter=separador), [])
+    colunas = [COLUNAS_CSV.get(_normalizar_nome(nome)) for nome in cabecalho]
+
+    for numero, valores in enumerate(csv.reader(leitor, delimiter=separador), start=2):
+        if not any(v.strip() for v in valores):
+            continue # Linha em branco
+        registro = {}
+        for coluna, valor in zip(colunas, valores):
+            if coluna:
+                registro[coluna] = valor.strip()
+        yield numero, registro
+
+def _tags_ofx(leitor):
+    """ Quebra o OFX em pedaços 'TAG>valor', lendo em blocos (funciona com o arquivo todo em uma linha) """
+    resto = ''
+    for bloco in iter(lambda: leitor.read(65536), ''):
+        partes = (resto + bloco).split('<')
+        resto = partes.pop()
+        for parte in partes:
+            if parte:
+                yield parte
+    if resto:
+        yield resto
+
+def ler_ofx(leitor):
+    """ Gera (numero_da_transacao, registro) para cada débito do extrato """
+    banco = 'OFX'
+    transacao = None
+    numero = 0
+
+    for parte in _tags_ofx(leitor):
+        tag, _, valor = parte.partition('>')
+        tag = tag.strip().upper()
+        valor = valor.strip()
+
+        if tag == 'ORG' and valor:
+            banco = valor
+        elif tag == 'STMTTRN':
+            transacao = {}
+        elif tag == '/STMTTRN' and transacao is not None:
+            numero += 1
+            try:
+                valor_trn = _ler_valor(transacao.get('TRNAMT', '0').replace(',', '.'))
+            except ValueError:
+                # A validação anota o erro desta transação
+                yield numero, {'valor': transacao.get('TRNAMT'), 'vencimento': transacao.get('DTPOSTED')}
+                transacao = None
+                continue
+            if valor_trn < 0:
+                data_trn = _ler_data(transacao.get('DTPOSTED'))
+                data_iso = data_trn.isoformat() if data_trn else ''
+                yield numero, {
+                    'vencimento': data_iso,
+                    'valor': abs(valor_trn),
+                    'empresa': transacao.get('NAME') or transacao.get('MEMO', ''),
+                    'descricao': transacao.get('MEMO', ''),
+                    'status': 'Pago',
+                    'data_pagamento': data_iso,
+                    'banco': banco,
+                    'valor_pago': abs(valor_trn),
+                }
+            transacao = None
+        elif transacao is not None and not tag.startswith('/'):
+            transacao[tag] = valor
+
+# --- 2. VALIDAÇÃO ---
+
+def validar(registros, resumo):
+    """
+    Confere cada registro e gera os lançamentos prontos para expandir.
+    Registros inválidos são pulados e anotados em resumo['erros'].
+    """
+    for numero, registro in registros:
+        resumo['linhas_lidas'] += 1
+        try:
+            vencimento = _ler_data(registro.get('vencimento'))
+            if not vencimento:
+                raise ValueError('vencimento vazio')
+            valor = _ler_valor(registro.get('valor'))
+            if valor <= 0:
+                raise ValueError('valor deve ser maior que zero')
+
+            tipo_juros = registro.get('tipo_juros') or 'R$'
+            if tipo_juros not in ('R$', '%'):
+                raise ValueError(f"tipo de juros inválido: {tipo_juros}")
+
+            status = (registro.get('status') or 'Pendente').capitalize()
+            if status not in ('Pendente', 'Pago'):
+                raise ValueError(f"status inválido: {status}")
+
+            data_pagamento = _ler_data(registro.get('data_pagamento'))
+            valor_pago = registro.get('valor_pago')
+            valor_pago = _ler_valor(valor_pago) if valor_pago not in (None, '') else None
+
+            boleto = {
+                'valor': valor,
+                'empresa': registro.get('empresa', ''),
+                'categoria': registro.get('categoria', ''),
+                'placa': registro.get('placa', ''),
+                'descricao': registro.get('descricao', ''),
+                'juros': _ler_valor(registro.get('juros')),
+                'tipoJuros': tipo_juros,
+                'multa': _ler_valor(registro.get('multa')),
+            }
+            try:
+                centavos = valores_em_centavos(boleto, valor_pago)
+            except InvalidOperation: # Decimal não cabe na precisão
+                raise ValueError('valor grande demais')
+            if any(c is not None and abs(c) > MAXIMO_CENTAVOS for c in centavos):
+                raise ValueError('valor grande demais')
+            regra = registro.get('regra', '')
+            datas = gerar_vencimentos(
+                vencimento,
+                int(registro.get('parcelas') or 1),
+                'custom' if regra else 'auto',
+                regra
+            )
+        except (ValueError, TypeError, OverflowError, InvalidOperation) as e:
+            resumo['qtd_erros'] += 1
+            if len(resumo['erros']) < MAXIMO_ERROS_LISTADOS:
+                resumo['erros'].append({'linha': numero, 'msg': str(e)})
+            continue
+
+        yield {
+            'boleto': boleto,
+            'datas': datas,
+            'status': status,
+            'data_pagamento': data_pagamento.isoformat() if data_pagamento else None,
+            'banco': registro.get('banco') or None,
+            'centavos': centavos,
+        }
+
+# --- 3. EXPANSÃO DAS PARCELAS ---
+
+def expandir(lancamentos, usuario_id):
+    """ Gera as tuplas de INSERT de todas as parcelas de todos os lançamentos """
+    for lanc in lancamentos:
+        yield from linhas_parcelas(
+            usuario_id, lanc['boleto'], lanc['datas'],
+            status=lanc['status'],
+            data_pagamento=lanc['data_pagamento'],
+            banco=lanc['banco'],
+            centavos=lanc['centavos'],
+        )
+
+# --- 4. GRAVAÇÃO ---
+
+def gravar_em_lotes(conn, linhas, ao_gravar=None, tamanho_lote=TAMANHO_LOTE):
+    """ executemany + commit a cada lote; retorna quantos boletos foram gravados """
+    total = 0
+    linhas = iter(linhas)
+    while True:
+        lote = list(islice(linhas, tamanho_lote))
+        if not lote:
+            break
+
+        # Pausa os triggers de contagem de nomes e de busca e faz os dois para o
+        # lote inteiro de uma vez no fim (a pausa só existe dentro desta
+        # transação; ninguém mais a enxerga)
+        ultimo_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM boletos").fetchone()[0]
+        conn.execute("INSERT INTO nomes_pausa (pausado) VALUES (1)")
+        if database.FTS_DISPONIVEL:
+            conn.execute("INSERT INTO boletos_fts_pausa (pausado) VALUES (1)")
+        inserir(conn, lote)
+        if database.FTS_DISPONIVEL:
+            conn.execute(f'''
+                INSERT INTO boletos_fts (rowid, empresa, placa, descricao)
+                SELECT id, empresa, placa, descricao FROM {nomes.VISAO} WHERE id > ?
+            ''', (ultimo_id,))
+            conn.execute("DELETE FROM boletos_fts_pausa")
+        nomes.contar_novos(conn, ultimo_id)
+        conn.commit()
+        total += len(lote)
+        if ao_gravar:
+            ao_gravar(total)
+    return total
+
+def importar(caminho, usuario_id, conn, ao_progredir=None):
+    """
+    Importa o arquivo (o tipo vem da extensão: .ofx ou planilha .csv/.txt).
+    ao_progredir(resumo) é chamado a cada lote gravado.
+    Retorna o resumo: linhas lidas, boletos gravados e erros de validação.
+    """
+    tamanho_arquivo = os.path.getsize(caminho) or 1
+    resumo = {
+        'arquivo': os.path.basename(caminho),
+        'linhas_lidas': 0,
+        'boletos': 0,
+        'qtd_erros': 0,
+        'erros': [],
+        'percentual': 0,
+    }
+
+    with _abrir_texto(caminho) as arquivo:
+        leitor = _LeitorContado(arquivo)
+        if caminho.lower().endswith('.ofx'):
+            registros = ler_ofx(leitor)
+        else:
+            registros = ler_csv(leitor)
+
+        def ao_gravar(total):
+            resumo['boletos'] = total
+            resumo['percentual'] = min(99, int(leitor.lidos * 100 / tamanho_arquivo))
+            if ao_progredir:
+                ao_progredir(resumo)
+
+        linhas = expandir(validar(registros, resumo), usuario_id)
+        resumo['boletos'] = gravar_em_lotes(conn, linhas, ao_gravar)
+
+    resumo['percentual'] = 100
+    if ao_progredir:
+        ao_progredir(resumo)
+    return resumo
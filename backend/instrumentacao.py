@@ -0,0 +1,305 @@
+"""
+Instrumentação opcional (diagnóstico de lentidão): tempo, linhas e bytes de
+cada método da BoletoAPI e de cada comando SQL. Desligada por padrão; liga com
+BOLETOS_DIAGNOSTICO=1 ou configurar_instrumentacao(True).
+"""
+import json
+import logging
+import logging.handlers
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import wraps
+from types import MethodType
+
+from backend import database
+
+# Comandos acima disso vão para o log de consultas lentas
+LIMITE_LENTA_MS = 100
+
+# A cada quantas instruções da VM do SQLite o progress handler é chamado
+PASSOS_PROGRESSO = 4000
+
+# Quantas medições recentes de cada método entram nos histogramas
+JANELA = 1000
+
+# Log rotativo das consultas lentas
+PASTA_LOGS = 'logs'
+ARQUIVO_LENTAS = 'consultas_lentas.log'
+TAMANHO_LOG = 1024 * 1024
+QTD_LOGS = 3
+
+# Limites (em ms) das faixas do histograma; a última faixa é "acima de 5000"
+FAIXAS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+def normalizar_sql(sql):
+    """ Tira os valores literais para agrupar os comandos iguais com parâmetros diferentes """
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    return ' '.join(sql.split())
+
+def percentis(valores):
+    """ p50/p90/p99 pelo método do posto mais próximo, média e extremos """
+    ordenados = sorted(valores)
+    if not ordenados:
+        return {'p50': 0, 'p90': 0, 'p99': 0, 'min': 0, 'max': 0, 'media': 0}
+
+    def posto(p):
+        return ordenados[max(0, -(-len(ordenados) * p // 100) - 1)]
+
+    return {
+        'p50': round(posto(50), 3),
+        'p90': round(posto(90), 3),
+        'p99': round(posto(99), 3),
+        'min': round(ordenados[0], 3),
+        'max': round(ordenados[-1], 3),
+        'media': round(sum(ordenados) / len(ordenados), 3),
+    }
+
+def histograma(valores):
+    """ [{'ate_ms': 1, 'qtd': n}, ..., {'ate_ms': None, 'qtd': n}] (None = acima da última faixa) """
+    contagem = [0] * (len(FAIXAS_MS) + 1)
+    for valor in valores:
+        for i, limite in enumerate(FAIXAS_MS):
+            if valor <= limite:
+                contagem[i] += 1
+                break
+        else:
+            contagem[-1] += 1
+    return [
+        {'ate_ms': limite, 'qtd': qtd}
+        for limite, qtd in zip(FAIXAS_MS + (None,), contagem)
+    ]
+
+def _contar_linhas(resposta):
+    """ Quantos itens a resposta leva para a tela (listas em 'dados' ou a própria lista) """
+    if isinstance(resposta, list):
+        return len(resposta)
+    if isinstance(resposta, dict):
+        dados = resposta.get('dados')
+        if isinstance(dados, list):
+            return len(dados)
+        if dados is not None:
+            return 1
+    return 0
+
+class Coletor:
+    """ Guarda as medições (métodos e comandos SQL) e liga/desliga os ganchos no SQLite """
+
+    def __init__(self):
+        self.ativo = False
+        self.desde = None
+        self.limite_lenta_ms = LIMITE_LENTA_MS
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._metodos = {}
+        self._consultas = {}
+        self._lentas = deque(maxlen=50)
+        self._log = None
+        database.registrar_gancho_conexao(self._configurar_conexao)
+
+    # --- Liga / desliga ---
+
+    def ligar(self, limite_lenta_ms=None):
+        if limite_lenta_ms is not None:
+            self.limite_lenta_ms = limite_lenta_ms
+        if not self.ativo:
+            self.ativo = True
+            self.desde = datetime.now().isoformat(timespec='seconds')
+            database.reaplicar_ganchos_conexao()
+
+    def desligar(self):
+        if self.ativo:
+            self.ativo = False
+            database.reaplicar_ganchos_conexao()
+
+    def limpar(self):
+        with self._lock:
+            self._metodos = {}
+            self._consultas = {}
+            self._lentas.clear()
+            self.desde = datetime.now().isoformat(timespec='seconds')
+
+    def _configurar_conexao(self, conn):
+        # Chamado pelo pool, com a conexão já nas mãos de uma única thread
+        if self.ativo:
+            conn.set_trace_callback(self._ao_iniciar_comando)
+            conn.set_progress_handler(self._ao_progredir, PASSOS_PROGRESSO)
+        else:
+            conn.set_trace_callback(None)
+            conn.set_progress_handler(None, 0)
+
+    # --- SQL ---
+
+    def _ao_iniciar_comando(self, sql):
+        if sql.startswith('--'):
+            return # Comandos internos dos triggers (fazem parte do comando atual)
+        agora = time.perf_counter()
+        self._encerrar_comando(agora)
+        self._local.comando = [sql, agora, None]
+
+    def _ao_progredir(self):
+        comando = getattr(self._local, 'comando', None)
+        if comando is not None:
+            comando[2] = time.perf_counter()
+        return 0
+
+    def _encerrar_comando(self, agora=None):
+        comando = getattr(self._local, 'comando', None)
+        if comando is None:
+            return
+        self._local.comando = None
+        sql, inicio, ultimo_passo = comando
+        if ultimo_passo is None:
+            ultimo_passo = agora or time.perf_counter()
+        duracao = (ultimo_passo - inicio) * 1000
+
+        chamada = getattr(self._local, 'chamada', None)
+        metodo = chamada['metodo'] if chamada else None
+        if chamada:
+            chamada['ms_sql'] += duracao
+            chamada['comandos'] += 1
+
+        chave = normalizar_sql(sql)
+        with self._lock:
+            item = self._consultas.get(chave)
+            if item is None:
+                item = self._consultas[chave] = {'sql': chave, 'qtd': 0, 'ms_total': 0.0, 'ms_max': 0.0}
+            item['qtd'] += 1
+            item['ms_total'] += duracao
+            item['ms_max'] = max(item['ms_max'], duracao)
+
+            if duracao >= self.limite_lenta_ms:
+                lenta = {
+                    'quando': datetime.now().isoformat(timespec='seconds'),
+                    'ms': round(duracao, 1),
+                    'metodo': metodo,
+                    'sql': sql[:2000],
+                }
+                self._lentas.append(lenta)
+                self._registrar_lenta(lenta)
+
+    def _registrar_lenta(self, lenta):
+        try:
+            if self._log is None:
+                os.makedirs(PASTA_LOGS, exist_ok=True)
+                self._log = logging.getLogger('boletos.consultas_lentas')
+                self._log.propagate = False
+                self._log.setLevel(logging.INFO)
+                manipulador = logging.handlers.RotatingFileHandler(
+                    os.path.join(PASTA_LOGS, ARQUIVO_LENTAS),
+                    maxBytes=TAMANHO_LOG, backupCount=QTD_LOGS, encoding='utf-8'
+                )
+                manipulador.setFormatter(logging.Formatter('%(message)s'))
+                self._log.addHandler(manipulador)
+            self._log.info(
+                f"{lenta['quando']} {lenta['ms']:.1f}ms [{lenta['metodo'] or '-'}] "
+                + ' '.join(lenta['sql'].split())
+            )
+        except OSError:
+            pass # Sem permissão de escrita: fica só na memória (obter_metricas)
+
+    # --- Métodos da API ---
+
+    def envolver(self, nome, metodo):
+        """ Devolve uma função que mede 'metodo' (ou só repassa, com o coletor desligado) """
+        coletor = self
+
+        @wraps(metodo)
+        def medido(_api, *args, **kwargs):
+            if not coletor.ativo or getattr(coletor._local, 'chamada', None) is not None:
+                # Desligado, ou método chamado de dentro de outro (conta só o de fora)
+                return metodo(*args, **kwargs)
+
+            chamada = coletor._local.chamada = {'metodo': nome, 'ms_sql': 0.0, 'comandos': 0}
+            inicio = time.perf_counter()
+            erro = False
+            try:
+                resposta = metodo(*args, **kwargs)
+                erro = isinstance(resposta, dict) and resposta.get('status') == 'erro'
+                return resposta
+            except Exception:
+                erro = True
+                resposta = None
+                raise
+            finally:
+                coletor._encerrar_comando()
+                coletor._local.chamada = None
+                total = (time.perf_counter() - inicio) * 1000
+                coletor._registrar_chamada(nome, chamada, total, resposta, erro)
+
+        return medido
+
+    def _registrar_chamada(self, nome, chamada, total_ms, resposta, erro):
+        # Mede a serialização que o Pywebview vai fazer com a resposta
+        inicio = time.perf_counter()
+        try:
+            tamanho = len(json.dumps(resposta, default=str))
+        except (TypeError, ValueError):
+            tamanho = 0
+        json_ms = (time.perf_counter() - inicio) * 1000
+
+        amostra = (total_ms, chamada['ms_sql'], json_ms, _contar_linhas(resposta), tamanho, chamada['comandos'])
+        with self._lock:
+            item = self._metodos.get(nome)
+            if item is None:
+                item = self._metodos[nome] = {'chamadas': 0, 'erros': 0, 'amostras': deque(maxlen=JANELA)}
+            item['chamadas'] += 1
+            item['erros'] += 1 if erro else 0
+            item['amostras'].append(amostra)
+
+    # --- Relatório ---
+
+    def metricas(self):
+        with self._lock:
+            metodos = {nome: (m['chamadas'], m['erros'], list(m['amostras'])) for nome, m in self._metodos.items()}
+            consultas = [dict(c) for c in self._consultas.values()]
+            lentas = list(self._lentas)
+
+        resultado = {}
+        for nome, (chamadas, erros, amostras) in sorted(metodos.items()):
+            totais = [a[0] for a in amostras]
+            qtd = len(amostras) or 1
+            resultado[nome] = {
+                'chamadas': chamadas,
+                'erros': erros,
+                'ms': percentis(totais),
+                'histograma': histograma(totais),
+                'ms_sql_medio': round(sum(a[1] for a in amostras) / qtd, 3),
+                'ms_json_medio': round(sum(a[2] for a in amostras) / qtd, 3),
+                'linhas_media': round(sum(a[3] for a in amostras) / qtd, 1),
+                'bytes_medio': round(sum(a[4] for a in amostras) / qtd),
+                'comandos_medio': round(sum(a[5] for a in amostras) / qtd, 1),
+            }
+
+        for consulta in consultas:
+            consulta['ms_total'] = round(consulta['ms_total'], 3)
+            consulta['ms_max'] = round(consulta['ms_max'], 3)
+            consulta['ms_medio'] = round(consulta['ms_total'] / consulta['qtd'], 3)
+        consultas.sort(key=lambda c: c['ms_total'], reverse=True)
+
+        return {
+            'ativo': self.ativo,
+            'desde': self.desde,
+            'janela': JANELA,
+            'limite_lenta_ms': self.limite_lenta_ms,
+            'metodos': resultado,
+            'consultas': consultas[:20],
+            'lentas': lentas[::-1][:20],
+        }
+
+# Instância única usada pela BoletoAPI
+coletor = Coletor()
+
+def instrumentar(api, excluir=()):
+    """ Troca cada método público de 'api' (os que o Pywebview expõe ao JS) pela versão medida """
+    for nome in dir(type(api)):
+        if nome.startswith('_') or nome in excluir:
+            continue
+        metodo = getattr(api, nome)
+        if callable(metodo):
+            # MethodType: continua sendo um "método" para o Pywebview enxergar
+            setattr(api, nome, MethodType(coletor.envolver(nome, metodo), api))
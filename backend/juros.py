@@ -0,0 +1,123 @@
+"""
+Cálculo de juros e multa em lote.
+
+Recebe as colunas dos boletos (vencimentos, valores, tipo de juros...) e
+devolve o valor atualizado e os dias de atraso de todos de uma vez,
+consultando o calendário de dias úteis pelo índice do dia.
+
+Tudo em centavos (ver backend/dinheiro.py): valores e multas em centavos,
+juros em centavos por dia ('R$') ou percentual ao dia ('%'). Juros em R$
+dão sempre centavos exatos; os percentuais são arredondados com meio
+centavo para cima (dinheiro.arredondar_centavos), igual ao SQL dos relatórios.
+
+Se o NumPy estiver instalado, as contas são vetorizadas; senão, o mesmo
+cálculo roda em um laço Python simples (mesmo resultado).
+"""
+from datetime import date
+
+from backend.calendario import calendario
+from backend.dinheiro import arredondar_centavos
+
+try:
+    import numpy as np
+except ImportError: # NumPy é opcional
+    np = None
+
+# Abaixo disso o custo de montar os arrays do NumPy não compensa
+MINIMO_PARA_NUMPY = 64
+
+# 1970-01-01 (dia 0 do datetime64 do NumPy) no formato toordinal()
+_ORDINAL_EPOCH = date(1970, 1, 1).toordinal()
+
+def _numero(valor):
+    """ Juros/multa vazios ou None contam como zero """
+    return valor if valor else 0
+
+def calcular_lote(vencimentos, valores, tipos_juros, juros, multas, pendentes=None, hoje=None):
+    """
+    Calcula juros/multa para uma lista de boletos.
+
+    vencimentos: datas (date ou 'YYYY-MM-DD'), o dia útil é resolvido aqui
+    valores, multas: centavos (int)
+    tipos_juros: 'R$' (centavos fixos por dia) ou '%' (percentual simples por dia)
+    pendentes: opcional, lista de bool; quem não estiver pendente não é cobrado
+
+    Retorna (valores_atualizados, dias_atraso), duas listas na mesma ordem,
+    com os valores em centavos. Boleto em dia volta com o valor original intacto.
+    """
+    if hoje is None:
+        hoje = date.today()
+
+    total = len(valores)
+    if total == 0:
+        return [], []
+    if pendentes is None:
+        pendentes = [True] * total
+
+    if np is not None and total >= MINIMO_PARA_NUMPY:
+        return _calcular_numpy(vencimentos, valores, tipos_juros, juros, multas, pendentes, hoje)
+    return _calcular_python(vencimentos, valores, tipos_juros, juros, multas, pendentes, hoje)
+
+def _calcular_python(vencimentos, valores, tipos_juros, juros, multas, pendentes, hoje):
+    atualizados = []
+    dias_atraso = []
+
+    for venc, valor, tipo, juro, multa, pendente in zip(vencimentos, valores, tipos_juros, juros, multas, pendentes):
+        if isinstance(venc, str):
+            venc = date.fromisoformat(venc)
+        venc_util = calendario.proximo_dia_util(venc)
+
+        # Em dia (ou já pago): valor original
+        if not pendente or hoje <= venc_util:
+            atualizados.append(valor)
+            dias_atraso.append(0)
+            continue
+
+        dias = (hoje - venc_util).days
+
+        valor_juros_total = 0
+        if tipo == 'R$':
+            # Valor fixo diário
+            valor_juros_total = dias * _numero(juro)
+        elif tipo == '%':
+            # Juros simples diários
+            valor_juros_total = arredondar_centavos(valor * (_numero(juro) / 100) * dias)
+
+        atualizados.append(valor + valor_juros_total + _numero(multa))
+        dias_atraso.append(dias)
+
+    return atualizados, dias_atraso
+
+def _calcular_numpy(vencimentos, valores, tipos_juros, juros, multas, pendentes, hoje):
+    # Datas -> número do dia (o NumPy converte 'YYYY-MM-DD' direto em C)
+    ordinais = np.array(vencimentos, dtype='datetime64[D]').astype(np.int64) + _ORDINAL_EPOCH
+
+    # Índice no calendário -> quantos dias pular até o dia útil
+    menor = date.fromordinal(int(ordinais.min()))
+    maior = date.fromordinal(int(ordinais.max()))
+    base, _, salto, _ = calendario.arrays(menor, maior)
+    saltos = np.frombuffer(salto, dtype=np.int32)
+    ordinais_uteis = ordinais + saltos[ordinais - base]
+
+    dias = hoje.toordinal() - ordinais_uteis
+    atrasado = (dias > 0) & np.array(pendentes, dtype=bool)
+    dias = np.where(atrasado, dias, 0)
+
+    valor_original = np.array(valores, dtype=np.int64)
+    juro = np.array([_numero(j) for j in juros], dtype=np.float64)
+    multa = np.array([_numero(m) for m in multas], dtype=np.int64)
+    tipos = np.array(tipos_juros, dtype=object)
+
+    # Centavos inteiros são exatos em float64; o percentual é arredondado
+    # como em arredondar_centavos (soma 0.5 e trunca)
+    valor_juros_total = np.where(
+        tipos == 'R$', dias * juro,
+        np.where(tipos == '%', valor_original * (juro / 100) * dias + 0.5, 0.0)
+    ).astype(np.int64)
+    calculado = valor_original + valor_juros_total + multa
+
+    atualizados = [
+        c if a else v
+        for c, a, v in zip(calculado.tolist(), atrasado.tolist(), valores)
+    ]
+    return atualizados, dias.tolist()
@@ -0,0 +1,102 @@
+"""
+Geração das parcelas de um lançamento.
+
+Usado tanto pelo formulário (BoletoAPI.salvar_lancamento) quanto pela
+importação de planilhas/extratos, para que as duas telas criem as
+parcelas exatamente do mesmo jeito.
+"""
+from datetime import timedelta
+
+from backend import nomes
+from backend.calendario import calendario
+from backend.dinheiro import juros_para_banco, para_centavos
+
+# Os parâmetros seguem a ordem das tuplas de linhas_parcelas, com os nomes em
+# ?2 (empresa) e ?3 (categoria): os ids saem das tabelas de nomes na própria
+# instrução. Gravar por inserir, que cadastra antes os nomes novos.
+SQL_INSERIR_BOLETO = '''
+    INSERT INTO boletos (
+        usuario_id, empresa_id, categoria_id, placa, descricao,
+        valor_original, juros, tipo_juros, multa, valor_total,
+        vencimento, vencimento_util, numero_parcela, total_parcelas,
+        status, data_pagamento, banco_pagamento
+        ) VALUES (?1,
+        (SELECT id FROM empresas WHERE usuario_id = ?1 AND nome = ?2),
+        (SELECT id FROM categorias WHERE usuario_id = ?1 AND nome = ?3),
+        ?4, ?5, ?6, ?7, ?8, ?9, ?10, ?11, ?12, ?13, ?14, ?15, ?16, ?17)
+'''
+
+def inserir(conn, linhas):
+    """ Grava as tuplas de 'linhas' (ordem de SQL_INSERIR_BOLETO): nomes novos primeiro, cada boleto uma vez """
+    linhas = list(linhas)
+    nomes.cadastrar(conn, 'empresa', ((linha[0], linha[1]) for linha in linhas))
+    nomes.cadastrar(conn, 'categoria', ((linha[0], linha[2]) for linha in linhas))
+    conn.executemany(SQL_INSERIR_BOLETO, linhas)
+
+def gerar_vencimentos(data_inicial, qtd_parcelas, modo='auto', regra=''):
+    """ Retorna a lista de datas de vencimento de cada parcela """
+    datas_vencimento = []
+
+    if modo == 'custom' and regra:
+        # Modo personalizado: "15/30/45"
+        dias_extras = regra.split('/')
+        for dia in dias_extras:
+            if dia == dias_extras[0]:
+                datas_vencimento.append(data_inicial)
+                continue
+            if dia.strip():
+                # Soma os dias à data inicial
+                nova_data = data_inicial + timedelta(days=int(dia))
+                datas_vencimento.append(nova_data)
+
+    else:
+        # Modo mensal padrão
+        datas_vencimento.append(data_inicial) # Adiciona a data escolhida como primeira
+        for i in range(1, qtd_parcelas):
+            nova_data = data_inicial + timedelta(days=i * 30)
+            datas_vencimento.append(nova_data)
+
+    return datas_vencimento
+
+def valores_em_centavos(boleto, valor_pago=None):
+    """ (valor, juros, multa, valor_pago) de 'boleto' (em reais) como vão para o banco """
+    return (
+        para_centavos(boleto['valor']),
+        juros_para_banco(boleto['tipoJuros'], boleto['juros']),
+        para_centavos(boleto['multa']),
+        None if valor_pago is None else para_centavos(valor_pago),
+    )
+
+def linhas_parcelas(usuario_id, boleto, datas_vencimento, status='Pendente', data_pagamento=None, banco=None,
+                    valor_pago=None, centavos=None):
+    """
+    Gera uma tupla (na ordem de SQL_INSERIR_BOLETO) para cada parcela.
+    'boleto' usa os mesmos nomes de campo do formulário (valor, tipoJuros...),
+    com os valores em reais; as tuplas saem em centavos. 'centavos' são os
+    valores já convertidos por valores_em_centavos (senão são convertidos aqui).
+    """
+    if centavos is None:
+        centavos = valores_em_centavos(boleto, valor_pago)
+    valor_por_parcela, juros, multa, valor_pago = centavos
+    qtd_parcelas = len(datas_vencimento)
+
+    for indice, data_venc in enumerate(datas_vencimento):
+        yield (
+            usuario_id,
+            boleto['empresa'],
+            boleto['categoria'],
+            boleto['placa'],
+            boleto['descricao'],
+            valor_por_parcela,
+            juros,
+            boleto['tipoJuros'],
+            multa,
+            valor_por_parcela if valor_pago is None else valor_pago,
+            data_venc.isoformat(), # Converte data volta pra string
+            calendario.proximo_dia_util(data_venc).isoformat(),
+            indice + 1,    # Parcela atual (1, 2, 3...)
+            qtd_parcelas,  # Total (de 3)
+            status,
+            data_pagamento,
+            banco,
+        )
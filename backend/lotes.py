@@ -0,0 +1,165 @@
+"""
+Operações em lote: pagar, estornar, excluir e reagendar vários boletos.
+
+Cada operação lê de uma vez os boletos pedidos (só os do perfil), decide
+boleto a boleto se a mudança vale e grava todos os válidos com UM
+executemany, dentro da transação de quem chamou: um commit (um fsync) para
+o lote inteiro, em vez de uma chamada da tela e um commit por boleto.
+
+O retorno é um item por id pedido, na mesma ordem (ids repetidos contam uma
+vez): {'id', 'status': 'sucesso'} ou {'id', 'status': 'erro', 'msg'}.
+"""
+from datetime import date
+
+from backend import nomes
+from backend.calendario import calendario
+from backend.juros import calcular_lote
+
+# Ids por "IN (...)": fica bem abaixo do limite de parâmetros do SQLite
+IDS_POR_CONSULTA = 500
+
+# Maior lote aceito (um filtro pode pegar o histórico inteiro)
+MAXIMO_LOTE = 10000
+
+NAO_ENCONTRADO = 'Boleto não encontrado.'
+
+def normalizar_ids(ids):
+    """ Inteiros, sem repetição, na ordem em que vieram """
+    vistos = {}
+    for id_boleto in ids:
+        vistos.setdefault(int(id_boleto), None)
+    return list(vistos)
+
+def carregar(conn, usuario_id, ids, colunas='id, status'):
+    """
+    {id: linha} dos boletos do perfil entre 'ids' (os que não existem ficam
+    de fora). Lê a visão: 'colunas' pode ter categoria e empresa.
+    """
+    linhas = {}
+    for inicio in range(0, len(ids), IDS_POR_CONSULTA):
+        trecho = ids[inicio:inicio + IDS_POR_CONSULTA]
+        sql = f"SELECT {colunas} FROM {nomes.VISAO} WHERE usuario_id = ? AND id IN ({','.join('?' * len(trecho))})"
+        for linha in conn.execute(sql, [usuario_id] + trecho):
+            linhas[linha['id']] = linha
+    return linhas
+
+def _resultado(ids, erros):
+    """ Itens na ordem dos ids; quem não está em 'erros' deu certo """
+    return [
+        {'id': id_boleto, 'status': 'erro', 'msg': erros[id_boleto]} if id_boleto in erros
+        else {'id': id_boleto, 'status': 'sucesso'}
+        for id_boleto in ids
+    ]
+
+def pagar(conn, usuario_id, ids, banco, data_pagamento):
+    """
+    Dá baixa nos pendentes. O valor pago de cada um é o valor atualizado
+    (juros/multa) na data do pagamento, como a tela sugere no pagamento avulso.
+    """
+    linhas = carregar(conn, usuario_id, ids, 'id, status, vencimento, valor_original, tipo_juros, juros, multa')
+    erros = {i: NAO_ENCONTRADO for i in ids if i not in linhas}
+    pendentes = []
+    for id_boleto in ids:
+        linha = linhas.get(id_boleto)
+        if linha is None:
+            continue
+        if linha['status'] == 'Pago':
+            erros[id_boleto] = 'Boleto já está pago.'
+        else:
+            pendentes.append(linha)
+
+    valores, _ = calcular_lote(
+        [b['vencimento'] for b in pendentes],
+        [b['valor_original'] for b in pendentes],
+        [b['tipo_juros'] for b in pendentes],
+        [b['juros'] for b in pendentes],
+        [b['multa'] for b in pendentes],
+        hoje=date.fromisoformat(data_pagamento),
+    )
+    conn.executemany('''
+        UPDATE boletos
+        SET status = 'Pago',
+            data_pagamento = ?,
+            banco_pagamento = ?,
+            valor_total = ?
+        WHERE id = ? AND usuario_id = ?
+    ''', [
+        (data_pagamento, banco, valor, boleto['id'], usuario_id)
+        for boleto, valor in zip(pendentes, valores)
+    ])
+    return _resultado(ids, erros)
+
+def cancelar_pagamentos(conn, usuario_id, ids):
+    """ Estorno: os pagos voltam para Pendente (mesma regra de cancelar_pagamento) """
+    linhas = carregar(conn, usuario_id, ids)
+    erros = {}
+    pagos = []
+    for id_boleto in ids:
+        linha = linhas.get(id_boleto)
+        if linha is None:
+            erros[id_boleto] = NAO_ENCONTRADO
+        elif linha['status'] != 'Pago':
+            erros[id_boleto] = 'Boleto não está pago.'
+        else:
+            pagos.append((id_boleto, usuario_id))
+
+    conn.executemany('''
+        UPDATE boletos
+        SET status = 'Pendente',
+            data_pagamento = NULL,
+            banco_pagamento = NULL,
+            valor_total = valor_original
+        WHERE id = ? AND usuario_id = ?
+    ''', pagos)
+    return _resultado(ids, erros)
+
+def excluir(conn, usuario_id, ids):
+    linhas = carregar(conn, usuario_id, ids, 'id')
+    erros = {i: NAO_ENCONTRADO for i in ids if i not in linhas}
+    conn.executemany(
+        "DELETE FROM boletos WHERE id = ? AND usuario_id = ?",
+        [(i, usuario_id) for i in ids if i in linhas]
+    )
+    return _resultado(ids, erros)
+
+def reagendar(conn, usuario_id, ids, vencimento=None, dias=None):
+    """
+    Muda o vencimento dos pendentes: para a data 'vencimento' ('YYYY-MM-DD')
+    ou 'dias' para frente (negativo = para trás). O dia útil é recalculado.
+    """
+    vencimento = vencimento or None
+    dias = None if dias in (None, '') else dias
+    if (vencimento is None) == (dias is None):
+        raise ValueError('Informe a nova data ou a quantidade de dias')
+    novo = date.fromisoformat(vencimento) if vencimento is not None else None
+    deslocamento = int(dias or 0)
+
+    linhas = carregar(conn, usuario_id, ids, 'id, status, vencimento')
+    erros = {}
+    mudancas = []
+    for id_boleto in ids:
+        linha = linhas.get(id_boleto)
+        if linha is None:
+            erros[id_boleto] = NAO_ENCONTRADO
+            continue
+        if linha['status'] == 'Pago':
+            erros[id_boleto] = 'Boleto já está pago.'
+            continue
+        if novo:
+            data = novo
+        else:
+            # Em ordinal, para não estourar o date (ano 1 a 9999)
+            dia = date.fromisoformat(linha['vencimento']).toordinal() + deslocamento
+            if not date.min.toordinal() <= dia <= date.max.toordinal():
+                erros[id_boleto] = 'Novo vencimento fora do calendário.'
+                continue
+            data = date.fromordinal(dia)
+        mudancas.append((
+            data.isoformat(), calendario.proximo_dia_util(data).isoformat(), id_boleto, usuario_id
+        ))
+
+    conn.executemany(
+        "UPDATE boletos SET vencimento = ?, vencimento_util = ? WHERE id = ? AND usuario_id = ?",
+        mudancas
+    )
+    return _resultado(ids, erros)
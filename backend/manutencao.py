@@ -0,0 +1,301 @@
+"""
+Manutenção do banco (checkpoint, optimize, analyze e incremental_vacuum) em
+segundo plano, só enquanto a tela está parada.
+
+    python -m backend.manutencao [--converter] [--banco sistema_boletos.db]
+"""
+import argparse
+import logging
+import logging.handlers
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from backend import arquivamento, bancos_perfil, database, execucao, instrumentacao
+
+# Segundos sem nenhuma chamada da tela para a manutenção começar
+OCIOSO_APOS = 60
+
+# De quanto em quanto tempo a thread olha se a tela está parada
+VERIFICAR_A_CADA = 5
+
+# Intervalo mínimo entre duas rodadas completas
+INTERVALO_RODADAS = 15 * 60
+
+# Tempo máximo de cada tarefa (o incremental_vacuum solta o banco a cada passo, então pode ir mais longe)
+ORCAMENTO_TAREFA = 0.5
+ORCAMENTO_PAGINAS = 5
+
+# De quanto em quanto tempo a vigia confere o orçamento e as chamadas da tela
+VIGIAR_A_CADA = 0.05
+
+# Linhas lidas por índice no ANALYZE/optimize (PRAGMA analysis_limit)
+LIMITE_ANALISE = 1000
+
+# ANALYZE completo (limitado) no máximo uma vez a cada tanto tempo
+ANALISAR_A_CADA = timedelta(days=1)
+
+# Páginas devolvidas por passo do incremental_vacuum, e pausa entre passos
+PAGINAS_POR_PASSO = 256
+PAUSA_ENTRE_PASSOS = 0.01
+
+# Quantas tarefas recentes o histórico guarda
+HISTORICO = 100
+
+ARQUIVO_LOG = 'manutencao.log'
+
+# auto_vacuum = INCREMENTAL
+INCREMENTAL = 2
+
+def _bancos():
+    """ usuario_id de cada banco para database.conexao (None = o principal) """
+    if database.BANCOS_POR_PERFIL:
+        return [None] + bancos_perfil.perfis_com_banco()
+    return [None]
+
+def _nome_banco(usuario_id, esquema):
+    nome = 'principal' if usuario_id is None else f'perfil {usuario_id}'
+    return nome if esquema == 'main' else f'{nome}/{esquema}'
+
+def _esquemas(conn):
+    return ['main', arquivamento.ESQUEMA] if arquivamento.anexado(conn) else ['main']
+
+def _interrompido(erro):
+    return isinstance(erro, sqlite3.OperationalError) and 'interrupted' in str(erro)
+
+def _checkpoint(conn, esquema, parada):
+    ocupado, paginas, copiadas = conn.execute(f"PRAGMA {esquema}.wal_checkpoint(PASSIVE)").fetchone()
+    if paginas <= 0:
+        return None # Nada no -wal
+    return f"{copiadas} de {paginas} páginas do -wal" + (" (leitor aberto)" if copiadas < paginas else "")
+
+def _otimizar(conn, esquema, parada):
+    anterior = conn.execute("PRAGMA analysis_limit").fetchone()[0]
+    try:
+        # executescript: o PRAGMA roda até o fim (execute pararia no primeiro passo)
+        conn.executescript(f"PRAGMA analysis_limit = {LIMITE_ANALISE}; PRAGMA {esquema}.optimize;")
+    finally:
+        conn.execute(f"PRAGMA analysis_limit = {anterior}")
+    return 'ok'
+
+def _analisar(conn, esquema, parada):
+    anterior = conn.execute("PRAGMA analysis_limit").fetchone()[0]
+    try:
+        conn.execute(f"PRAGMA analysis_limit = {LIMITE_ANALISE}")
+        conn.execute(f"ANALYZE {esquema}")
+    finally:
+        conn.execute(f"PRAGMA analysis_limit = {anterior}")
+    return 'ok'
+
+def _liberar_paginas(conn, esquema, parada):
+    livres = conn.execute(f"PRAGMA {esquema}.freelist_count").fetchone()[0]
+    if not livres:
+        return None
+    if conn.execute(f"PRAGMA {esquema}.auto_vacuum").fetchone()[0] != INCREMENTAL:
+        return f"{livres} páginas livres, arquivo sem auto_vacuum incremental (python -m backend.manutencao --converter)"
+
+    liberadas = 0
+    while livres and not parada.is_set():
+        # Cada passo é uma transação curta; executescript para o PRAGMA liberar todas as páginas pedidas
+        conn.executescript(f"PRAGMA {esquema}.incremental_vacuum({PAGINAS_POR_PASSO})")
+        restantes = conn.execute(f"PRAGMA {esquema}.freelist_count").fetchone()[0]
+        liberadas += livres - restantes
+        livres = restantes
+        time.sleep(PAUSA_ENTRE_PASSOS)
+    return f"{liberadas} páginas liberadas, {livres} ainda livres"
+
+# (nome, função, orçamento em segundos, intervalo mínimo entre execuções em cada banco ou None)
+TAREFAS = (
+    ('checkpoint', _checkpoint, ORCAMENTO_TAREFA, None),
+    ('optimize', _otimizar, ORCAMENTO_TAREFA, None),
+    ('analyze', _analisar, ORCAMENTO_TAREFA, ANALISAR_A_CADA),
+    ('incremental_vacuum', _liberar_paginas, ORCAMENTO_PAGINAS, None),
+)
+
+class Manutencao:
+    def __init__(self, executor=execucao.executor):
+        self.executor = executor
+        self.ocioso_apos = OCIOSO_APOS
+        self._historico = deque(maxlen=HISTORICO)
+        self._concluidas = {} # (tarefa, usuario_id, esquema) -> datetime da última execução completa
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self._log = None
+        self._ultima_rodada = None # time.monotonic() do fim da última rodada completa
+        self._chamadas_rodada = None # executor.chamadas() no início dela
+
+    def iniciar(self, ocioso_apos=OCIOSO_APOS):
+        """ Liga a thread de manutenção (se ainda não está rodando) """
+        self.ocioso_apos = ocioso_apos
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._laco, name='manutencao', daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        """ Para a thread, interrompendo a tarefa em andamento (antes de fechar as conexões) """
+        self._parar.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            database.interromper(thread.ident)
+            thread.join(timeout=5)
+
+    def historico(self):
+        """ Tarefas recentes, da mais nova para a mais antiga """
+        with self._lock:
+            return list(reversed(self._historico))
+
+    def _ociosa(self):
+        return self.executor.ocioso_ha() >= self.ocioso_apos
+
+    def _hora_de_rodar(self):
+        if not self._ociosa():
+            return False
+        if self._chamadas_rodada is not None and self._chamadas_rodada == self.executor.chamadas():
+            return False # Ninguém usou o programa desde a última rodada
+        return self._ultima_rodada is None or time.monotonic() - self._ultima_rodada >= INTERVALO_RODADAS
+
+    def _laco(self):
+        while not self._parar.wait(VERIFICAR_A_CADA):
+            if not self._hora_de_rodar():
+                continue
+            try:
+                self.rodar()
+            except Exception as e:
+                logging.getLogger('boletos.manutencao').exception(f"Falha na manutenção do banco: {e}")
+
+    def rodar(self, so_ociosa=True):
+        """
+        Uma rodada em todos os bancos. Com so_ociosa, para (sem terminar)
+        assim que a tela volta a chamar alguma coisa. Retorna True se completou.
+        """
+        self._chamadas_rodada = self.executor.chamadas()
+        for usuario_id in _bancos():
+            with database.conexao(usuario_id) as conn:
+                esquemas = _esquemas(conn)
+            for esquema in esquemas:
+                for nome, funcao, orcamento, intervalo in TAREFAS:
+                    if self._parar.is_set() or (so_ociosa and not self._ociosa()):
+                        return False
+                    ultima = self._concluidas.get((nome, usuario_id, esquema))
+                    if intervalo and ultima and datetime.now() - ultima < intervalo:
+                        continue
+                    if not self._executar(nome, funcao, orcamento, usuario_id, esquema, so_ociosa):
+                        return False
+        self._ultima_rodada = time.monotonic()
+        return True
+
+    def _executar(self, nome, funcao, orcamento, usuario_id, esquema, so_ociosa):
+        """ Roda uma tarefa vigiada; retorna False se ela foi interrompida """
+        inicio = time.perf_counter()
+        prazo = time.monotonic() + orcamento
+        chamadas = self.executor.chamadas()
+        feito = threading.Event()
+        parada = threading.Event() # Orçamento acabou, a tela voltou ou parar() (vale entre um comando e outro)
+        completa = True
+        try:
+            with database.conexao(usuario_id) as conn:
+                id_thread = threading.get_ident()
+
+                def vigiar():
+                    while not feito.wait(VIGIAR_A_CADA):
+                        voltou = so_ociosa and self.executor.chamadas() != chamadas
+                        if voltou or self._parar.is_set() or time.monotonic() > prazo:
+                            parada.set()
+                            database.interromper(id_thread)
+                            return
+
+                threading.Thread(target=vigiar, name='manutencao-vigia', daemon=True).start()
+                try:
+                    resultado = funcao(conn, esquema, parada)
+                finally:
+                    feito.set()
+        except Exception as e:
+            if not _interrompido(e):
+                resultado = f'erro: {e}'
+            else:
+                resultado, completa = 'interrompida', False
+        else:
+            self._concluidas[(nome, usuario_id, esquema)] = datetime.now()
+
+        if resultado is not None:
+            self._registrar({
+                'quando': datetime.now().isoformat(timespec='seconds'),
+                'banco': _nome_banco(usuario_id, esquema),
+                'tarefa': nome,
+                'ms': round((time.perf_counter() - inicio) * 1000, 1),
+                'resultado': resultado,
+            })
+        return completa
+
+    def _registrar(self, item):
+        with self._lock:
+            self._historico.append(item)
+        try:
+            if self._log is None:
+                os.makedirs(instrumentacao.PASTA_LOGS, exist_ok=True)
+                self._log = logging.getLogger('boletos.manutencao')
+                self._log.propagate = False
+                self._log.setLevel(logging.INFO)
+                manipulador = logging.handlers.RotatingFileHandler(
+                    os.path.join(instrumentacao.PASTA_LOGS, ARQUIVO_LOG),
+                    maxBytes=instrumentacao.TAMANHO_LOG, backupCount=instrumentacao.QTD_LOGS, encoding='utf-8'
+                )
+                manipulador.setFormatter(logging.Formatter('%(message)s'))
+                self._log.addHandler(manipulador)
+            self._log.info(f"{item['quando']} [{item['banco']}] {item['tarefa']} {item['ms']:.1f}ms {item['resultado']}")
+        except OSError:
+            pass # Sem log em disco, o histórico em memória continua valendo
+
+# Instância única usada pela BoletoAPI
+agendador = Manutencao()
+
+def parar_manutencao():
+    agendador.parar()
+
+def converter(caminho_banco):
+    """
+    Passa cada arquivo do banco (principal, perfis e os arquivos dos pagos
+    antigos) para auto_vacuum = INCREMENTAL com um VACUUM completo. Só com
+    o programa fechado. Retorna os caminhos convertidos.
+    """
+    caminhos = [caminho_banco]
+    caminhos += [database.caminho_perfil(usuario_id, caminho_banco) for usuario_id in bancos_perfil.perfis_com_banco(caminho_banco)]
+    caminhos += [arquivamento.caminho_arquivo(caminho) for caminho in list(caminhos)]
+
+    convertidos = []
+    for caminho in caminhos:
+        if not os.path.exists(caminho):
+            continue
+        conn = sqlite3.connect(caminho, timeout=30, isolation_level=None)
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == INCREMENTAL:
+                continue
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            convertidos.append(caminho)
+        finally:
+            conn.close()
+    return convertidos
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manutenção do banco (checkpoint, estatísticas e páginas livres)')
+    parser.add_argument('--banco', default=database.CAMINHO_BANCO)
+    parser.add_argument('--converter', action='store_true',
+                        help='passa os arquivos para auto_vacuum incremental (VACUUM completo, com o programa fechado)')
+    args = parser.parse_args()
+
+    if args.converter:
+        for caminho in converter(args.banco):
+            print(f"Convertido: {caminho}")
+    else:
+        database.configurar_banco(args.banco)
+        database.init_db()
+        agendador.rodar(so_ociosa=False)
+        for item in reversed(agendador.historico()):
+            print(f"[{item['banco']}] {item['tarefa']} {item['ms']:.1f}ms {item['resultado']}")
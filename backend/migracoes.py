@@ -0,0 +1,389 @@
+"""
+Migrações do esquema do banco.
+
+A versão atual fica gravada em PRAGMA user_version. Cada migração é uma
+função que recebe a conexão e leva o banco da versão N-1 para a versão N.
+Para criar uma nova, basta escrever a função e adicioná-la no FIM da lista
+MIGRACOES (nunca mudar a ordem nem editar uma que já foi publicada).
+"""
+from datetime import date
+
+from backend import dinheiro, imagens, nomes
+from backend.calendario import calendario
+
+def _migracao_1_indices(conn):
+    """ Índices compostos para as consultas mais usadas (sempre filtram por usuário) """
+    # buscar_boletos / obter_resumo_dashboard: usuário + status + vencimento
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_boletos_usuario_status_venc
+        ON boletos (usuario_id, status, vencimento)
+    ''')
+    # Filtros por período sem status e gerar_relatorio_mensal
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_boletos_usuario_venc
+        ON boletos (usuario_id, vencimento)
+    ''')
+    # obter_categorias_usadas e filtro por categoria
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_boletos_usuario_categoria
+        ON boletos (usuario_id, categoria)
+    ''')
+
+def _proximo_util_iso(vencimento):
+    """ Versão em texto de calendario.proximo_dia_util, para usar dentro do SQL """
+    if not vencimento:
+        return None
+    return calendario.proximo_dia_util(date.fromisoformat(vencimento)).isoformat()
+
+def _migracao_2_vencimento_util(conn):
+    """ Guarda o vencimento já empurrado para o dia útil (usado no dashboard) """
+    conn.execute("ALTER TABLE boletos ADD COLUMN vencimento_util TEXT")
+
+    conn.create_function('proximo_util', 1, _proximo_util_iso, deterministic=True)
+    conn.execute("UPDATE boletos SET vencimento_util = proximo_util(vencimento)")
+
+    # Índice de cobertura: o resumo do dashboard é lido só dele, sem tocar na tabela
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_boletos_usuario_status_venc_util
+        ON boletos (usuario_id, status, vencimento_util, valor_original)
+    ''')
+
+def _migracao_3_indices_listagem(conn):
+    """
+    Índices na mesma ordem da listagem (vencimento, maior valor, id), para a
+    paginação por cursor começar direto do último boleto visto.
+    Substituem os índices (usuario_id, status, vencimento) e (usuario_id, vencimento).
+    """
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_boletos_listagem_status
+        ON boletos (usuario_id, status, vencimento, valor_original DESC, id)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_boletos_listagem
+        ON boletos (usuario_id, vencimento, valor_original DESC, id)
+    ''')
+    conn.execute("DROP INDEX IF EXISTS idx_boletos_usuario_status_venc")
+    conn.execute("DROP INDEX IF EXISTS idx_boletos_usuario_venc")
+
+def _fts5_disponivel(conn):
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._teste_fts USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp._teste_fts")
+        return True
+    except Exception:
+        return False
+
+def _migracao_4_busca_textual(conn):
+    """
+    Índice de texto (FTS5 com trigramas) sobre empresa, placa e descrição.
+    Trigramas permitem achar pedaços de palavra ("ofic" acha "Oficina do Zé")
+    sem varrer a tabela. Os triggers mantêm o índice igual à tabela boletos.
+    Se o SQLite não tiver FTS5, a busca continua funcionando com LIKE.
+    """
+    if not _fts5_disponivel(conn):
+        return
+
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS boletos_fts USING fts5(
+            empresa, placa, descricao,
+            content='boletos', content_rowid='id',
+            tokenize='trigram'
+        )
+    ''')
+    # Enquanto houver linha em boletos_fts_pausa (só dentro da transação de uma
+    # importação em massa), o trigger de INSERT não indexa linha a linha: a
+    # importação indexa o lote inteiro de uma vez no fim, o que é bem mais rápido.
+    conn.execute("CREATE TABLE IF NOT EXISTS boletos_fts_pausa (pausado INTEGER)")
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS boletos_fts_insert AFTER INSERT ON boletos
+        WHEN NOT EXISTS (SELECT 1 FROM boletos_fts_pausa) BEGIN
+            INSERT INTO boletos_fts (rowid, empresa, placa, descricao)
+            VALUES (new.id, new.empresa, new.placa, new.descricao);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS boletos_fts_delete AFTER DELETE ON boletos BEGIN
+            INSERT INTO boletos_fts (boletos_fts, rowid, empresa, placa, descricao)
+            VALUES ('delete', old.id, old.empresa, old.placa, old.descricao);
+        END
+    ''')
+    # Só reindexa quando um dos campos de texto muda (pagar um boleto não mexe no índice)
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS boletos_fts_update
+        AFTER UPDATE OF empresa, placa, descricao ON boletos BEGIN
+            INSERT INTO boletos_fts (boletos_fts, rowid, empresa, placa, descricao)
+            VALUES ('delete', old.id, old.empresa, old.placa, old.descricao);
+            INSERT INTO boletos_fts (rowid, empresa, placa, descricao)
+            VALUES (new.id, new.empresa, new.placa, new.descricao);
+        END
+    ''')
+    conn.execute("INSERT INTO boletos_fts (boletos_fts) VALUES ('rebuild')")
+
+def _migracao_5_imagens(conn):
+    """
+    Fotos de perfil saem da coluna usuarios.foto (data URL em base64) para a
+    tabela imagens, em binário e com miniatura; o perfil guarda só o hash.
+    Fotos que eram links (não data URL) continuam em usuarios.foto.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS imagens (
+            hash TEXT PRIMARY KEY,
+            mime TEXT NOT NULL,
+            dados BLOB NOT NULL,
+            mime_miniatura TEXT,
+            miniatura BLOB
+        )
+    ''')
+    conn.execute("ALTER TABLE usuarios ADD COLUMN foto_hash TEXT")
+
+    for id_usuario, foto in conn.execute("SELECT id, foto FROM usuarios WHERE foto LIKE 'data:%'").fetchall():
+        hash_foto = imagens.guardar(conn, foto)
+        if hash_foto: # Data URL quebrada fica como estava
+            conn.execute("UPDATE usuarios SET foto = NULL, foto_hash = ? WHERE id = ?", (hash_foto, id_usuario))
+
+def _centavos(valor):
+    return None if valor is None else dinheiro.para_centavos(valor)
+
+def _migracao_6_centavos(conn):
+    """
+    Dinheiro em centavos inteiros (valor_original, multa, valor_total e o
+    juros em R$; juros em % continua percentual). O SQLite não muda o tipo
+    de uma coluna, então a tabela é recriada com os mesmos ids e os índices
+    e triggers são refeitos a partir do próprio sqlite_master.
+    """
+    conn.create_function('centavos', 1, _centavos, deterministic=True)
+    objetos = [
+        linha[0] for linha in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name = 'boletos' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+        )
+    ]
+    # Próximo id do AUTOINCREMENT (ids de boletos apagados não voltam a ser usados)
+    sequencia = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'boletos'").fetchone()
+
+    conn.execute('''
+        CREATE TABLE boletos_novo (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER,
+            vencimento TEXT,
+            status TEXT DEFAULT 'Pendente',
+
+            empresa TEXT,
+            categoria TEXT,
+            placa TEXT,
+            descricao TEXT,
+
+            -- Dinheiro em centavos (ver backend/dinheiro.py)
+            valor_original INTEGER,
+            juros NUMERIC,
+            tipo_juros TEXT DEFAULT 'R$',
+            multa INTEGER,
+            valor_total INTEGER,
+
+            data_pagamento TEXT,
+            banco_pagamento TEXT,
+
+            numero_parcela INTEGER,
+            total_parcelas INTEGER,
+
+            vencimento_util TEXT,
+
+            FOREIGN KEY(usuario_id) REFERENCES usuarios(id)
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO boletos_novo
+        SELECT
+            id, usuario_id, vencimento, status,
+            empresa, categoria, placa, descricao,
+            centavos(valor_original),
+            CASE WHEN tipo_juros = '%' THEN juros ELSE centavos(juros) END,
+            tipo_juros,
+            centavos(multa),
+            centavos(valor_total),
+            data_pagamento, banco_pagamento,
+            numero_parcela, total_parcelas,
+            vencimento_util
+        FROM boletos
+    ''')
+    conn.execute("DROP TABLE boletos")
+    conn.execute("ALTER TABLE boletos_novo RENAME TO boletos")
+    if sequencia:
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = 'boletos'")
+        conn.execute(
+            "INSERT INTO sqlite_sequence (name, seq) VALUES ('boletos', MAX(?, (SELECT COALESCE(MAX(id), 0) FROM boletos)))",
+            (sequencia[0],)
+        )
+    for sql in objetos:
+        conn.execute(sql)
+
+def _migracao_7_configuracao(conn):
+    """ Configurações gravadas no próprio banco (ex: bancos_por_perfil, ver backend/bancos_perfil.py) """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS configuracao (
+            chave TEXT PRIMARY KEY,
+            valor TEXT
+        )
+    ''')
+
+def _migracao_8_nomes(conn):
+    """
+    Categorias e empresas em tabelas próprias, com a contagem de uso
+    (backend/nomes.py): boletos guarda só categoria_id e empresa_id e quem
+    precisa do nome lê a visão boletos_com_nomes. A tabela é recriada como
+    na migração 6 (mesmos ids) e o índice de texto passa a ter a visão como
+    conteúdo, com os triggers buscando o nome da empresa pelo id.
+    """
+    nomes.criar_tabelas(conn) # Já contadas pelo texto
+    # O filtro de categoria passa a usar o índice de categoria_id
+    conn.execute("DROP INDEX IF EXISTS idx_boletos_usuario_categoria")
+    indices = [
+        linha[0] for linha in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name = 'boletos' AND type = 'index' AND sql IS NOT NULL"
+        )
+    ]
+    sequencia = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'boletos'").fetchone()
+    tem_fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'boletos_fts'").fetchone()
+    conn.execute("DROP TABLE IF EXISTS boletos_fts")
+
+    conn.execute('''
+        CREATE TABLE boletos_novo (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER,
+            vencimento TEXT,
+            status TEXT DEFAULT 'Pendente',
+
+            categoria_id INTEGER REFERENCES categorias(id),
+            empresa_id INTEGER REFERENCES empresas(id),
+            placa TEXT,
+            descricao TEXT,
+
+            -- Dinheiro em centavos (ver backend/dinheiro.py)
+            valor_original INTEGER,
+            juros NUMERIC,
+            tipo_juros TEXT DEFAULT 'R$',
+            multa INTEGER,
+            valor_total INTEGER,
+
+            data_pagamento TEXT,
+            banco_pagamento TEXT,
+
+            numero_parcela INTEGER,
+            total_parcelas INTEGER,
+
+            vencimento_util TEXT,
+
+            FOREIGN KEY(usuario_id) REFERENCES usuarios(id)
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO boletos_novo
+        SELECT
+            id, usuario_id, vencimento, status,
+            (SELECT c.id FROM categorias AS c WHERE c.usuario_id = boletos.usuario_id AND c.nome = boletos.categoria),
+            (SELECT e.id FROM empresas AS e WHERE e.usuario_id = boletos.usuario_id AND e.nome = boletos.empresa),
+            placa, descricao,
+            valor_original, juros, tipo_juros, multa, valor_total,
+            data_pagamento, banco_pagamento,
+            numero_parcela, total_parcelas,
+            vencimento_util
+        FROM boletos
+    ''')
+    conn.execute("DROP TABLE boletos")
+    conn.execute("ALTER TABLE boletos_novo RENAME TO boletos")
+    if sequencia:
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = 'boletos'")
+        conn.execute(
+            "INSERT INTO sqlite_sequence (name, seq) VALUES ('boletos', MAX(?, (SELECT COALESCE(MAX(id), 0) FROM boletos)))",
+            (sequencia[0],)
+        )
+    for sql in indices:
+        conn.execute(sql)
+    # Índice dos ids, triggers de contagem e a visão
+    nomes.criar(conn)
+
+    if not tem_fts:
+        return
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE boletos_fts USING fts5(
+            empresa, placa, descricao,
+            content='{nomes.VISAO}', content_rowid='id',
+            tokenize='trigram'
+        )
+    ''')
+    # O mesmo texto que a visão mostra ('' sem empresa): o 'delete' do FTS5
+    # precisa dos valores indexados. Antes de apagar ou mudar a linha, para
+    # o nome ainda estar na tabela (o trigger de contagem pode tirá-lo).
+    empresa = "COALESCE((SELECT nome FROM empresas WHERE id = {}.empresa_id), '')"
+    conn.execute(f'''
+        CREATE TRIGGER boletos_fts_insert AFTER INSERT ON boletos
+        WHEN NOT EXISTS (SELECT 1 FROM boletos_fts_pausa) BEGIN
+            INSERT INTO boletos_fts (rowid, empresa, placa, descricao)
+            VALUES (new.id, {empresa.format('new')}, new.placa, new.descricao);
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER boletos_fts_delete BEFORE DELETE ON boletos BEGIN
+            INSERT INTO boletos_fts (boletos_fts, rowid, empresa, placa, descricao)
+            VALUES ('delete', old.id, {empresa.format('old')}, old.placa, old.descricao);
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER boletos_fts_update_antes BEFORE UPDATE OF empresa_id, placa, descricao ON boletos BEGIN
+            INSERT INTO boletos_fts (boletos_fts, rowid, empresa, placa, descricao)
+            VALUES ('delete', old.id, {empresa.format('old')}, old.placa, old.descricao);
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER boletos_fts_update AFTER UPDATE OF empresa_id, placa, descricao ON boletos BEGIN
+            INSERT INTO boletos_fts (rowid, empresa, placa, descricao)
+            VALUES (new.id, {empresa.format('new')}, new.placa, new.descricao);
+        END
+    ''')
+    conn.execute("INSERT INTO boletos_fts (boletos_fts) VALUES ('rebuild')")
+
+MIGRACOES = [
+    _migracao_1_indices,
+    _migracao_2_vencimento_util,
+    _migracao_3_indices_listagem,
+    _migracao_4_busca_textual,
+    _migracao_5_imagens,
+    _migracao_6_centavos,
+    _migracao_7_configuracao,
+    _migracao_8_nomes,
+]
+
+VERSAO_ATUAL = len(MIGRACOES)
+
+def versao_banco(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrar(conn):
+    """
+    Aplica, em ordem, as migrações que ainda não rodaram neste arquivo.
+    Cada migração roda na sua própria transação junto com a troca de versão,
+    então um erro no meio não deixa o banco pela metade.
+    Retorna a lista de versões aplicadas.
+    """
+    versao = versao_banco(conn)
+    aplicadas = []
+
+    for numero, migracao in enumerate(MIGRACOES, start=1):
+        if numero <= versao:
+            continue
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            migracao(conn)
+            conn.execute(f"PRAGMA user_version = {numero}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        aplicadas.append(numero)
+
+    # Atualiza as estatísticas para o otimizador passar a usar os índices novos
+    if aplicadas:
+        conn.execute("ANALYZE")
+        conn.commit()
+
+    return aplicadas
@@ -0,0 +1,228 @@
+"""
+Tabelas de nomes (categorias e empresas) de cada arquivo de boletos, com quantos
+boletos usam cada nome. Os boletos guardam só categoria_id/empresa_id; o texto
+vem da visão boletos_com_nomes (VISAO).
+"""
+
+# Coluna de boletos -> tabela de nomes
+TABELAS = {'categoria': 'categorias', 'empresa': 'empresas'}
+
+# Coluna de id -> coluna de nome da visão
+IDS = {f'{coluna}_id': coluna for coluna in TABELAS}
+
+VISAO = 'boletos_com_nomes'
+
+def _existe(conn, esquema, nome, tipo='table'):
+    return conn.execute(
+        f"SELECT 1 FROM {esquema}.sqlite_master WHERE type = ? AND name = ?", (tipo, nome)
+    ).fetchone() is not None
+
+def _colunas(conn, esquema, tabela='boletos'):
+    return [linha[1] for linha in conn.execute(f"PRAGMA {esquema}.table_info({tabela})")]
+
+def tem_ids(conn, esquema='main'):
+    """ Se os boletos de 'esquema' já têm categoria_id/empresa_id (arquivo de antes deles não tem) """
+    return _existe(conn, esquema, 'nomes_insert', 'trigger')
+
+def fonte(conn, esquema='main'):
+    """
+    De onde ler os boletos de 'esquema' com os nomes: a visão ou, num
+    arquivo de antes dela, a própria tabela (que ainda tem o texto).
+    """
+    return VISAO if _existe(conn, esquema, VISAO, 'view') else 'boletos'
+
+def criar_tabelas(conn, esquema='main'):
+    """ Cria as tabelas de nomes que faltam; com o texto ainda em boletos, já saem contadas """
+    com_texto = 'categoria' in _colunas(conn, esquema)
+    for coluna, tabela in TABELAS.items():
+        if _existe(conn, esquema, tabela):
+            continue
+        conn.execute(f'''
+            CREATE TABLE {esquema}.{tabela} (
+                id INTEGER PRIMARY KEY,
+                usuario_id INTEGER NOT NULL,
+                nome TEXT NOT NULL,
+                qtd INTEGER NOT NULL,
+                UNIQUE (usuario_id, nome)
+            )
+        ''')
+        if com_texto:
+            conn.execute(f'''
+                INSERT INTO {esquema}.{tabela} (usuario_id, nome, qtd)
+                SELECT usuario_id, {coluna}, COUNT(*) FROM {esquema}.boletos
+                WHERE usuario_id IS NOT NULL AND {coluna} <> ''
+                GROUP BY usuario_id, {coluna}
+            ''')
+
+def criar(conn, esquema='main'):
+    """
+    Cria em 'esquema' o que ainda falta (tabelas de nomes, colunas de id e
+    índices) e refaz os triggers e a visão. Boletos que ainda têm o texto
+    (arquivo de antes da migração 8) saem contados e com os ids preenchidos
+    a partir dele; a visão só é criada depois que o texto sai da tabela.
+    Chamar dentro de uma transação.
+    """
+    existentes = set(_colunas(conn, esquema))
+    com_texto = 'categoria' in existentes
+    ids_do_arquivo = tem_ids(conn, esquema)
+    criar_tabelas(conn, esquema)
+    for coluna, tabela in TABELAS.items():
+        if f'{coluna}_id' not in existentes:
+            conn.execute(f"ALTER TABLE {esquema}.boletos ADD COLUMN {coluna}_id INTEGER REFERENCES {tabela}(id)")
+        # O arquivo pode já ter a coluna (copiada do principal), mas sem os ids dele
+        if com_texto and not ids_do_arquivo:
+            conn.execute(f'''
+                UPDATE {esquema}.boletos SET {coluna}_id = (
+                    SELECT id FROM {esquema}.{tabela} AS n
+                    WHERE n.usuario_id = boletos.usuario_id AND n.nome = boletos.{coluna}
+                )
+            ''')
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {esquema}.idx_boletos_{coluna}_id ON boletos (usuario_id, {coluna}_id)")
+    _criar_triggers(conn, esquema)
+
+    if not com_texto:
+        conn.execute(f"DROP VIEW IF EXISTS {esquema}.{VISAO}")
+        conn.execute(f'''
+            CREATE VIEW {esquema}.{VISAO} AS
+            SELECT boletos.*,
+                   COALESCE(categorias.nome, '') AS categoria,
+                   COALESCE(empresas.nome, '') AS empresa
+            FROM boletos
+            LEFT JOIN categorias ON categorias.id = boletos.categoria_id
+            LEFT JOIN empresas ON empresas.id = boletos.empresa_id
+        ''')
+
+def _criar_triggers(conn, esquema):
+    """ Triggers de contagem: só mexem em qtd, nunca na linha do boleto """
+    for tabela in TABELAS.values():
+        conn.execute(f"DROP TRIGGER IF EXISTS {esquema}.{tabela}_update")
+    conn.execute(f"DROP TRIGGER IF EXISTS {esquema}.nomes_insert")
+    conn.execute(f"DROP TRIGGER IF EXISTS {esquema}.nomes_delete")
+
+    somar, tirar = {}, {}
+    for coluna, tabela in TABELAS.items():
+        somar[coluna] = f"UPDATE {tabela} SET qtd = qtd + 1 WHERE id = new.{coluna}_id;"
+        tirar[coluna] = f'''
+            UPDATE {tabela} SET qtd = qtd - 1 WHERE id = old.{coluna}_id;
+            DELETE FROM {tabela} WHERE id = old.{coluna}_id AND qtd <= 0;
+        '''
+
+    # Como boletos_fts_pausa: com linha em nomes_pausa (só dentro da transação
+    # de uma importação), a contagem fica para contar_novos, uma vez por lote
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {esquema}.nomes_pausa (pausado INTEGER)")
+    conn.execute(f'''
+        CREATE TRIGGER {esquema}.nomes_insert AFTER INSERT ON boletos
+        WHEN NOT EXISTS (SELECT 1 FROM nomes_pausa) BEGIN
+            {somar['categoria']} {somar['empresa']}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER {esquema}.nomes_delete AFTER DELETE ON boletos BEGIN
+            {tirar['categoria']} {tirar['empresa']}
+        END
+    ''')
+    # Só quando o id muda de verdade: salvar um boleto sem mexer na categoria não conta nada
+    for coluna, tabela in TABELAS.items():
+        conn.execute(f'''
+            CREATE TRIGGER {esquema}.{tabela}_update AFTER UPDATE OF {coluna}_id ON boletos
+            WHEN old.{coluna}_id IS NOT new.{coluna}_id
+            BEGIN
+                {somar[coluna]} {tirar[coluna]}
+            END
+        ''')
+
+def cadastrar(conn, coluna, pares, esquema='main'):
+    """
+    Garante na tabela de nomes de 'coluna' os nomes de 'pares' ((usuario_id,
+    nome); vazio fica de fora), com qtd 0 os novos: o INSERT ou UPDATE do
+    boleto que vem em seguida já acha o id. Um nome que acabou sem boleto
+    (a gravação falhou) fica com qtd 0 e não aparece em usados.
+    """
+    novos = {(usuario_id, nome) for usuario_id, nome in pares if usuario_id is not None and nome}
+    conn.executemany(f'''
+        INSERT INTO {esquema}.{TABELAS[coluna]} (usuario_id, nome, qtd) VALUES (?, ?, 0)
+        ON CONFLICT (usuario_id, nome) DO NOTHING
+    ''', novos)
+
+def contar_novos(conn, depois_de):
+    """
+    Soma em qtd os boletos de id acima de 'depois_de', gravados com a
+    contagem pausada (linha em nomes_pausa), e tira a pausa.
+    """
+    for coluna, tabela in TABELAS.items():
+        contagem = conn.execute(f'''
+            SELECT COUNT(*), {coluna}_id FROM boletos
+            WHERE id > ? AND {coluna}_id IS NOT NULL GROUP BY {coluna}_id
+        ''', (depois_de,)).fetchall()
+        conn.executemany(f"UPDATE {tabela} SET qtd = qtd + ? WHERE id = ?", contagem)
+    conn.execute("DELETE FROM nomes_pausa")
+
+def copiar(conn, origem, destino, colunas, condicao, params=(), ignorar=False):
+    """
+    Copia de origem.boletos para destino.boletos as linhas que atendem
+    'condicao' ('colunas' do destino), com os ids de nome do destino: os
+    nomes que faltam entram antes e o id sai de uma subconsulta pelo nome,
+    lido da visão da origem (ou do texto, num arquivo de antes dela).
+    Coluna que a origem não tem sai NULL; com 'ignorar', linha com id já
+    existente no destino fica de fora. Retorna quantas linhas entraram.
+    """
+    de = f"{origem}.{fonte(conn, origem)}"
+    da_origem = set(_colunas(conn, origem, fonte(conn, origem)))
+    for coluna, tabela in TABELAS.items():
+        conn.execute(f'''
+            INSERT INTO {destino}.{tabela} (usuario_id, nome, qtd)
+            SELECT DISTINCT usuario_id, {coluna}, 0 FROM {de} AS boletos
+            WHERE ({condicao}) AND usuario_id IS NOT NULL AND {coluna} <> ''
+            ON CONFLICT (usuario_id, nome) DO NOTHING
+        ''', params)
+
+    campos = []
+    for campo in colunas:
+        if campo in IDS:
+            campos.append(f'''(
+                SELECT n.id FROM {destino}.{TABELAS[IDS[campo]]} AS n
+                WHERE n.usuario_id = boletos.usuario_id AND n.nome = boletos.{IDS[campo]}
+            )''')
+        else:
+            campos.append(campo if campo in da_origem else 'NULL')
+    acao = 'INSERT OR IGNORE' if ignorar else 'INSERT'
+    return conn.execute(f'''
+        {acao} INTO {destino}.boletos ({', '.join(colunas)})
+        SELECT {', '.join(campos)} FROM {de} AS boletos WHERE {condicao}
+    ''', params).rowcount
+
+def ids(conn, usuario_id, coluna, criterio, params=(), esquema='main'):
+    """
+    Ids dos nomes de 'coluna' do perfil que atendem 'criterio' (ex: "nome
+    IN (?, ?)", com 'params'), na tabela de nomes de 'esquema'. Os filtros
+    comparam categoria_id/empresa_id com essa lista: com os ids já na
+    consulta, o SQLite estima quantas linhas cada índice traz.
+    """
+    sql = f"SELECT id FROM {esquema}.{TABELAS[coluna]} WHERE usuario_id = ? AND {criterio}"
+    return [linha[0] for linha in conn.execute(sql, (usuario_id, *params))]
+
+def usados(conn, usuario_id, coluna, esquemas=('main',), entre=None):
+    """
+    Nomes de 'coluna' (categoria ou empresa) usados pelo perfil nos
+    'esquemas', sem repetição e em ordem alfabética; com 'entre', só os
+    desses nomes que ainda estão em uso. Um esquema sem a tabela de nomes
+    (arquivo de antes dela) cai no SELECT DISTINCT.
+    """
+    tabela = TABELAS[coluna]
+    partes, params = [], []
+    entre = list(entre) if entre is not None else None
+    for esquema in esquemas:
+        if _existe(conn, esquema, tabela):
+            sql = f"SELECT nome FROM {esquema}.{tabela} WHERE usuario_id = ? AND qtd > 0"
+            campo = 'nome'
+        else:
+            sql = f"SELECT {coluna} FROM {esquema}.boletos WHERE usuario_id = ? AND {coluna} <> ''"
+            campo = coluna
+        params.append(usuario_id)
+        if entre is not None:
+            sql += f" AND {campo} IN ({','.join('?' * len(entre))})"
+            params.extend(entre)
+        partes.append(sql)
+    # UNION já tira as repetidas entre os bancos
+    sql = ' UNION '.join(partes) + ' ORDER BY 1'
+    return [linha[0] for linha in conn.execute(sql, params)]
@@ -0,0 +1,249 @@
+"""
+Relatórios por período (dia, mês, trimestre, ano).
+
+Tudo sai de UMA consulta agrupada: o filtro é uma faixa de datas sobre a
+coluna vencimento (vencimento >= inicio AND vencimento < fim), que o SQLite
+resolve pelo índice (usuario_id, vencimento, ...). Nada de strftime no WHERE,
+que obrigava a ler a tabela inteira a cada mês pedido.
+
+A consulta agrupa pela granularidade mais fina pedida + categoria + empresa;
+as granularidades maiores (ex: trimestre e ano junto com mês) e os totais
+são somados aqui no Python em cima desse resultado, que é pequeno.
+
+O valor atualizado dos pendentes (juros/multa) é calculado dentro do SQL com
+a mesma conta de juros.calcular_lote, usando a coluna vencimento_util.
+Tudo é somado em centavos inteiros (SUM exato) e só vira reais no final.
+"""
+from datetime import date, timedelta
+
+from backend import nomes
+from backend.dinheiro import para_reais
+
+# Da menor para a maior: cada uma cabe inteira dentro da seguinte
+GRANULARIDADES = ('dia', 'mes', 'trimestre', 'ano')
+
+# Início do período de cada boleto, calculado no SQL a partir de 'YYYY-MM-DD'
+_INICIO_PERIODO_SQL = {
+    'dia': "substr(vencimento, 1, 10)",
+    'mes': "substr(vencimento, 1, 8) || '01'",
+    'trimestre': (
+        "substr(vencimento, 1, 5) || CASE"
+        " WHEN substr(vencimento, 6, 2) < '04' THEN '01'"
+        " WHEN substr(vencimento, 6, 2) < '07' THEN '04'"
+        " WHEN substr(vencimento, 6, 2) < '10' THEN '07'"
+        " ELSE '10' END || '-01'"
+    ),
+    'ano': "substr(vencimento, 1, 5) || '01-01'",
+}
+
+# Mesma regra de juros.calcular_lote: atrasado = pendente com dia útil já passado.
+# A ordem das contas é a mesma do Python para o resultado bater centavo a centavo
+# (o percentual arredonda como dinheiro.arredondar_centavos: + 0.5 e trunca).
+_VALOR_ATUALIZADO_SQL = '''
+    CASE WHEN COALESCE(vencimento_util, vencimento) < :hoje THEN
+        valor_original
+        + CASE tipo_juros
+            WHEN 'R$' THEN CAST(julianday(:hoje) - julianday(COALESCE(vencimento_util, vencimento)) AS INTEGER) * COALESCE(juros, 0)
+            WHEN '%' THEN CAST(
+                valor_original * (COALESCE(juros, 0) / 100.0) * (julianday(:hoje) - julianday(COALESCE(vencimento_util, vencimento))) + 0.5
+                AS INTEGER)
+            ELSE 0
+          END
+        + COALESCE(multa, 0)
+    ELSE valor_original END
+'''
+
+def inicio_periodo(dia, granularidade):
+    """ Primeiro dia do período (da granularidade) que contém 'dia' """
+    if granularidade == 'dia':
+        return dia
+    if granularidade == 'mes':
+        return dia.replace(day=1)
+    if granularidade == 'trimestre':
+        return date(dia.year, (dia.month - 1) // 3 * 3 + 1, 1)
+    return date(dia.year, 1, 1)
+
+def proximo_periodo(inicio, granularidade):
+    """ Primeiro dia do período seguinte """
+    if granularidade == 'dia':
+        return inicio + timedelta(days=1)
+    meses = {'mes': 1, 'trimestre': 3, 'ano': 12}[granularidade]
+    total = inicio.year * 12 + inicio.month - 1 + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+def rotulo_periodo(inicio, granularidade):
+    """ '2026-01-05', '2026-01', '2026-T1' ou '2026' """
+    if granularidade == 'dia':
+        return inicio.isoformat()
+    if granularidade == 'mes':
+        return inicio.strftime('%Y-%m')
+    if granularidade == 'trimestre':
+        return f"{inicio.year}-T{(inicio.month - 1) // 3 + 1}"
+    return str(inicio.year)
+
+def _totais_vazios():
+    return {
+        'total_esperado': 0,
+        'total_pago': 0,
+        'total_pendente': 0,
+        'qtd_pagos': 0,
+        'qtd_pendentes': 0,
+        'por_categoria': {},
+        'por_empresa': {},
+    }
+
+def _somar(destino, grupo):
+    destino['total_esperado'] += grupo['esperado']
+    destino['total_pago'] += grupo['pago']
+    destino['total_pendente'] += grupo['pendente']
+    destino['qtd_pagos'] += grupo['qtd_pagos']
+    destino['qtd_pendentes'] += grupo['qtd_pendentes']
+
+    for chave, nome in (('por_categoria', grupo['categoria']), ('por_empresa', grupo['empresa'])):
+        item = destino[chave].setdefault(nome, {'esperado': 0, 'pago': 0, 'pendente': 0})
+        item['esperado'] += grupo['esperado']
+        item['pago'] += grupo['pago']
+        item['pendente'] += grupo['pendente']
+
+def _em_reais(totais):
+    """ Centavos somados -> reais, no fim de tudo """
+    for chave in ('total_esperado', 'total_pago', 'total_pendente'):
+        totais[chave] = para_reais(totais[chave])
+    for chave in ('por_categoria', 'por_empresa'):
+        for item in totais[chave].values():
+            for campo in item:
+                item[campo] = para_reais(item[campo])
+    return totais
+
+def gerar(conn, usuario_id, inicio, fim, granularidades=('mes',), hoje=None, origem=nomes.VISAO):
+    """
+    Relatório de [inicio, fim] (datas inclusivas) em uma ou mais granularidades.
+
+    Retorna:
+        {
+          'inicio', 'fim',
+          'totais': {total_esperado, total_pago, total_pendente, qtd_pagos,
+                     qtd_pendentes, por_categoria, por_empresa},
+          'series': {granularidade: [ {periodo, inicio, fim, ...mesmos campos de totais} ]}
+        }
+
+    por_categoria / por_empresa: {nome: {'esperado', 'pago', 'pendente'}}.
+    Pago soma o valor realmente pago (valor_total); pendente soma o valor
+    atualizado com juros/multa na data 'hoje'. Toda série traz todos os
+    períodos da faixa, inclusive os sem boletos (zerados). 'origem' é a
+    tabela (ou subconsulta) com os boletos, como em por_perfil, com os
+    nomes de categoria e empresa (padrão: a visão de backend/nomes.py).
+    """
+    if hoje is None:
+        hoje = date.today()
+    if fim < inicio:
+        raise ValueError('A data final é anterior à inicial')
+
+    desconhecidas = [g for g in granularidades if g not in GRANULARIDADES]
+    if desconhecidas or not granularidades:
+        raise ValueError(f"Granularidade inválida: {', '.join(desconhecidas) or 'nenhuma'}")
+    granularidades = [g for g in GRANULARIDADES if g in granularidades]
+    mais_fina = granularidades[0]
+
+    sql = f'''
+        SELECT
+            {_INICIO_PERIODO_SQL[mais_fina]} AS periodo,
+            categoria,
+            empresa,
+            COALESCE(SUM(valor_original), 0) AS esperado,
+            COALESCE(SUM(CASE WHEN status = 'Pago' THEN valor_total END), 0) AS pago,
+            COALESCE(SUM(CASE WHEN status IS NOT 'Pago' THEN {_VALOR_ATUALIZADO_SQL} END), 0) AS pendente,
+            COUNT(CASE WHEN status = 'Pago' THEN 1 END) AS qtd_pagos,
+            COUNT(CASE WHEN status IS NOT 'Pago' THEN 1 END) AS qtd_pendentes
+        FROM {origem}
+        WHERE usuario_id = :usuario AND vencimento >= :inicio AND vencimento < :fim
+        GROUP BY 1, 2, 3
+    '''
+    grupos = conn.execute(sql, {
+        'usuario': usuario_id,
+        'inicio': inicio.isoformat(),
+        'fim': (fim + timedelta(days=1)).isoformat(),
+        'hoje': hoje.isoformat(),
+    }).fetchall()
+
+    # Todos os períodos da faixa, na ordem, já zerados
+    series = {}
+    for granularidade in granularidades:
+        periodos = {}
+        atual = inicio_periodo(inicio, granularidade)
+        while atual <= fim:
+            seguinte = proximo_periodo(atual, granularidade)
+            periodo = {
+                'periodo': rotulo_periodo(atual, granularidade),
+                'inicio': max(atual, inicio).isoformat(),
+                'fim': min(seguinte - timedelta(days=1), fim).isoformat(),
+            }
+            periodo.update(_totais_vazios())
+            periodos[atual] = periodo
+            atual = seguinte
+        series[granularidade] = periodos
+
+    totais = _totais_vazios()
+    for grupo in grupos:
+        grupo = dict(grupo)
+        dia = date.fromisoformat(grupo['periodo'])
+        _somar(totais, grupo)
+        for granularidade in granularidades:
+            _somar(series[granularidade][inicio_periodo(dia, granularidade)], grupo)
+
+    return {
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'totais': _em_reais(totais),
+        'series': {
+            granularidade: [_em_reais(p) for p in periodos.values()]
+            for granularidade, periodos in series.items()
+        },
+    }
+
+# Colunas que por_perfil lê (o UNION ALL dos bancos por perfil só traz estas)
+COLUNAS_POR_PERFIL = (
+    'usuario_id', 'vencimento', 'vencimento_util', 'status',
+    'valor_original', 'valor_total', 'juros', 'tipo_juros', 'multa',
+)
+
+def totais_perfil_vazios():
+    return {'total_esperado': 0, 'total_pago': 0, 'total_pendente': 0, 'qtd_pagos': 0, 'qtd_pendentes': 0}
+
+def por_perfil(conn, inicio, fim, origem='boletos', hoje=None):
+    """
+    Totais de [inicio, fim] agrupados por perfil: {usuario_id: {total_esperado,
+    total_pago, total_pendente, qtd_pagos, qtd_pendentes}}, em reais.
+    'origem' é a tabela (ou subconsulta) com os boletos.
+    """
+    if hoje is None:
+        hoje = date.today()
+    if fim < inicio:
+        raise ValueError('A data final é anterior à inicial')
+    sql = f'''
+        SELECT
+            usuario_id,
+            COALESCE(SUM(valor_original), 0) AS total_esperado,
+            COALESCE(SUM(CASE WHEN status = 'Pago' THEN valor_total END), 0) AS total_pago,
+            COALESCE(SUM(CASE WHEN status IS NOT 'Pago' THEN {_VALOR_ATUALIZADO_SQL} END), 0) AS total_pendente,
+            COUNT(CASE WHEN status = 'Pago' THEN 1 END) AS qtd_pagos,
+            COUNT(CASE WHEN status IS NOT 'Pago' THEN 1 END) AS qtd_pendentes
+        FROM {origem}
+        WHERE vencimento >= :inicio AND vencimento < :fim
+        GROUP BY usuario_id
+    '''
+    linhas = conn.execute(sql, {
+        'inicio': inicio.isoformat(),
+        'fim': (fim + timedelta(days=1)).isoformat(),
+        'hoje': hoje.isoformat(),
+    }).fetchall()
+
+    resultado = {}
+    for linha in linhas:
+        totais = totais_perfil_vazios()
+        for chave in totais:
+            totais[chave] = linha[chave]
+        for chave in ('total_esperado', 'total_pago', 'total_pendente'):
+            totais[chave] = para_reais(totais[chave])
+        resultado[linha['usuario_id']] = totais
+    return resultado
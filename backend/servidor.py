@@ -0,0 +1,261 @@
+"""
+Modo servidor: a mesma BoletoAPI por HTTP/JSON, para vários computadores da
+rede usarem o mesmo banco. Métodos de NAO_EXPOSTOS não são publicados (404).
+
+    python servidor.py [--host 0.0.0.0] [--porta 8765] [--banco sistema_boletos.db]
+"""
+import asyncio
+import json
+import os
+import threading
+from datetime import date, datetime
+from http import HTTPStatus
+
+from backend.sessoes import sessao_atual, sessoes
+
+HOST = '127.0.0.1'
+PORTA = 8765
+
+# Conexão sem nenhuma requisição por esse tempo é fechada
+TEMPO_OCIOSO = 75
+
+# Maior corpo aceito (fotos de perfil vêm em base64)
+MAXIMO_CORPO = 20 * 1024 * 1024
+
+PASTA_FRONTEND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'frontend')
+
+# Diálogos e arquivos do computador do servidor, a administração do banco
+# (backup, arquivamento, diagnóstico) e o relatório de todos os perfis, que
+# ficam só com quem roda o servidor
+NAO_EXPOSTOS = {
+    'conectar_janela', 'importar_arquivo', 'exportar_boletos',
+    'fazer_backup', 'arquivar_pagos', 'obter_metricas', 'configurar_instrumentacao', 'limpar_metricas',
+    'gerar_relatorio_perfis',
+}
+
+class ErroHTTP(Exception):
+    def __init__(self, status, msg):
+        super().__init__(msg)
+        self.status = status
+        self.msg = msg
+
+def _json_padrao(valor):
+    """ Tipos que o Pywebview converte sozinho e o json não """
+    if isinstance(valor, (set, frozenset)):
+        return sorted(valor)
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return str(valor)
+
+def _resposta(status, corpo, tipo='application/json; charset=utf-8', manter=True):
+    if not isinstance(corpo, bytes):
+        corpo = json.dumps(corpo, ensure_ascii=False, default=_json_padrao).encode('utf-8')
+    status = HTTPStatus(status)
+    cabecalho = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: {tipo}\r\n"
+        f"Content-Length: {len(corpo)}\r\n"
+        "Cache-Control: no-store\r\n"
+        f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n"
+    )
+    return cabecalho.encode('latin-1') + corpo
+
+class ServidorAPI:
+    def __init__(self, api, host=HOST, porta=PORTA, pasta_frontend=PASTA_FRONTEND):
+        self.api = api
+        self.host = host
+        self.porta = porta
+        self.pasta_frontend = pasta_frontend
+        self._servidor = None
+        self._loop = None
+        self._thread = None
+        self._conexoes = set()  # Tarefas _atender abertas (fechadas no parar)
+        self._metodos = {
+            nome: getattr(api, nome)
+            for nome in dir(type(api))
+            if not nome.startswith('_') and nome not in NAO_EXPOSTOS and callable(getattr(api, nome))
+        }
+
+    # --- Páginas ---
+
+    def _pagina_inicial(self):
+        with open(os.path.join(self.pasta_frontend, 'index.html'), encoding='utf-8') as arquivo:
+            html = arquivo.read()
+        # A ponte precisa existir antes do Alpine iniciar a tela
+        return html.replace('<head>', '<head>\n    <script src="/ponte_http.js"></script>', 1).encode('utf-8')
+
+    def _arquivo(self, nome):
+        with open(os.path.join(self.pasta_frontend, nome), 'rb') as arquivo:
+            return arquivo.read()
+
+    # --- Chamadas ---
+
+    def _chamar(self, sessao, metodo, args, kwargs):
+        # Roda numa thread: a sessão vale só durante esta chamada
+        marca = sessao_atual.set(sessao)
+        try:
+            return metodo(*args, **kwargs)
+        finally:
+            sessao_atual.reset(marca)
+
+    async def _api(self, nome, cabecalhos, corpo):
+        metodo = self._metodos.get(nome)
+        if metodo is None:
+            raise ErroHTTP(404, f'Método desconhecido: {nome}')
+
+        token = cabecalhos.get('authorization', '').removeprefix('Bearer ').strip()
+        sessao = sessoes.obter(token) if token else None
+        if sessao is None:
+            raise ErroHTTP(401, 'Sessão inválida ou expirada')
+
+        try:
+            dados = json.loads(corpo or b'[]')
+        except ValueError:
+            raise ErroHTTP(400, 'JSON inválido')
+        if isinstance(dados, list):
+            args, kwargs = dados, {}
+        elif isinstance(dados, dict):
+            args, kwargs = dados.get('args', []), dados.get('kwargs', {})
+        else:
+            raise ErroHTTP(400, 'Envie uma lista de argumentos')
+
+        try:
+            return await asyncio.to_thread(self._chamar, sessao, metodo, args, kwargs)
+        except Exception as e:
+            raise ErroHTTP(500, str(e))
+
+    async def _rotear(self, metodo_http, caminho, cabecalhos, corpo):
+        """ (status, corpo, tipo) da resposta """
+        caminho = caminho.split('?', 1)[0]
+        if metodo_http == 'GET' and caminho in ('/', '/index.html'):
+            return 200, self._pagina_inicial(), 'text/html; charset=utf-8'
+        if metodo_http == 'GET' and caminho == '/ponte_http.js':
+            return 200, self._arquivo('ponte_http.js'), 'text/javascript; charset=utf-8'
+        if metodo_http == 'POST' and caminho == '/sessao':
+            return 200, {'status': 'sucesso', 'token': sessoes.criar().token}, None
+        if metodo_http == 'DELETE' and caminho == '/sessao':
+            sessoes.encerrar(cabecalhos.get('authorization', '').removeprefix('Bearer ').strip())
+            return 200, {'status': 'sucesso'}, None
+        if metodo_http == 'POST' and caminho.startswith('/api/'):
+            return 200, await self._api(caminho[5:], cabecalhos, corpo), None
+        raise ErroHTTP(404, 'Não encontrado')
+
+    # --- HTTP ---
+
+    async def _ler_requisicao(self, leitor):
+        """ (método, caminho, versão, cabeçalhos, corpo) ou None se o cliente fechou """
+        linha = await asyncio.wait_for(leitor.readline(), TEMPO_OCIOSO)
+        if not linha:
+            return None
+        try:
+            metodo, caminho, versao = linha.decode('latin-1').split()
+        except ValueError:
+            raise ErroHTTP(400, 'Requisição inválida')
+
+        cabecalhos = {}
+        while True:
+            linha = await leitor.readline()
+            if linha in (b'\r\n', b'\n', b''):
+                break
+            nome, _, valor = linha.decode('latin-1').partition(':')
+            cabecalhos[nome.strip().lower()] = valor.strip()
+
+        if 'chunked' in cabecalhos.get('transfer-encoding', '').lower():
+            raise ErroHTTP(411, 'Envie o corpo com Content-Length')
+        try:
+            tamanho = int(cabecalhos.get('content-length') or 0)
+        except ValueError:
+            raise ErroHTTP(400, 'Content-Length inválido')
+        if tamanho < 0:
+            raise ErroHTTP(400, 'Content-Length inválido')
+        if tamanho > MAXIMO_CORPO:
+            raise ErroHTTP(413, 'Corpo grande demais')
+        corpo = await leitor.readexactly(tamanho) if tamanho else b''
+        return metodo, caminho, versao, cabecalhos, corpo
+
+    async def _atender(self, leitor, escritor):
+        """ Uma conexão: várias requisições em sequência (keep-alive) até alguém fechar """
+        tarefa = asyncio.current_task()
+        self._conexoes.add(tarefa)
+        try:
+            while True:
+                try:
+                    requisicao = await self._ler_requisicao(leitor)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except ErroHTTP as e:
+                    escritor.write(_resposta(e.status, {'status': 'erro', 'msg': e.msg}, manter=False))
+                    await escritor.drain()
+                    break
+                if requisicao is None:
+                    break
+
+                metodo, caminho, versao, cabecalhos, corpo = requisicao
+                conexao = cabecalhos.get('connection', '').lower()
+                manter = conexao != 'close' if versao == 'HTTP/1.1' else conexao == 'keep-alive'
+
+                try:
+                    status, dados, tipo = await self._rotear(metodo, caminho, cabecalhos, corpo)
+                except ErroHTTP as e:
+                    status, dados, tipo = e.status, {'status': 'erro', 'msg': e.msg}, None
+                except Exception as e:
+                    status, dados, tipo = 500, {'status': 'erro', 'msg': str(e)}, None
+                escritor.write(_resposta(status, dados, tipo or 'application/json; charset=utf-8', manter))
+                await escritor.drain()
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._conexoes.discard(tarefa)
+            escritor.close()
+
+    # --- Liga / desliga ---
+
+    async def _iniciar(self):
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.porta)
+        # Porta 0 = escolhida pelo sistema (testes)
+        self.porta = self._servidor.sockets[0].getsockname()[1]
+
+    def servir(self):
+        """ Roda até Ctrl+C (bloqueia) """
+        async def principal():
+            await self._iniciar()
+            print(f"Servidor em http://{self.host}:{self.porta}/")
+            async with self._servidor:
+                await self._servidor.serve_forever()
+        asyncio.run(principal())
+
+    def iniciar_em_segundo_plano(self):
+        """ Sobe o servidor numa thread própria e volta quando ele já aceita conexões """
+        pronto = threading.Event()
+
+        def rodar():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self._iniciar())
+            pronto.set()
+            self._loop.run_forever()
+            self._loop.close()
+
+        self._thread = threading.Thread(target=rodar, name='servidor-http', daemon=True)
+        self._thread.start()
+        pronto.wait()
+        return self
+
+    def parar(self):
+        if self._loop is None:
+            return
+
+        async def fechar():
+            self._servidor.close()
+            # Conexões keep-alive paradas esperando a próxima requisição
+            conexoes = list(self._conexoes)
+            for tarefa in conexoes:
+                tarefa.cancel()
+            await asyncio.gather(*conexoes, return_exceptions=True)
+            await self._servidor.wait_closed()
+            self._loop.stop()
+
+        asyncio.run_coroutine_threadsafe(fechar(), self._loop)
+        self._thread.join()
+        self._loop = None
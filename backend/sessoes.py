@@ -0,0 +1,69 @@
+"""
+Sessões do modo servidor (backend/servidor.py).
+
+Na janela do Pywebview existe uma pessoa só, e o perfil logado fica em
+BoletoAPI.usuario_atual. No servidor, cada navegador recebe um token de
+sessão e o perfil logado fica na Sessao dele. Durante cada chamada, a
+sessão fica em 'sessao_atual' (ContextVar), e BoletoAPI.usuario_atual lê
+e grava ali; sem sessão (a janela), continua tudo como antes.
+"""
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+
+# Sessão parada por mais que isso é descartada (o navegador pede outra)
+EXPIRA_SEGUNDOS = 8 * 60 * 60
+
+# Sessão da chamada em andamento (None fora do servidor)
+sessao_atual = ContextVar('sessao_atual', default=None)
+
+class Sessao:
+    def __init__(self, token):
+        self.token = token
+        self.usuario = None
+        self.ultimo_uso = time.monotonic()
+
+class Sessoes:
+    def __init__(self, expira_segundos=EXPIRA_SEGUNDOS):
+        self.expira_segundos = expira_segundos
+        self._lock = threading.Lock()
+        self._sessoes = {}
+
+    def criar(self):
+        sessao = Sessao(secrets.token_urlsafe(24))
+        with self._lock:
+            self._remover_expiradas()
+            self._sessoes[sessao.token] = sessao
+        return sessao
+
+    def obter(self, token):
+        """ A sessão do token (renovando o prazo) ou None se não existir / expirou """
+        with self._lock:
+            sessao = self._sessoes.get(token)
+            if sessao is None:
+                return None
+            agora = time.monotonic()
+            if agora - sessao.ultimo_uso > self.expira_segundos:
+                del self._sessoes[token]
+                return None
+            sessao.ultimo_uso = agora
+            return sessao
+
+    def encerrar(self, token):
+        with self._lock:
+            self._sessoes.pop(token, None)
+
+    def perfil_em_uso(self, id_usuario):
+        """ Alguma sessão ativa está logada neste perfil? """
+        with self._lock:
+            self._remover_expiradas()
+            return any(s.usuario and s.usuario['id'] == id_usuario for s in self._sessoes.values())
+
+    def _remover_expiradas(self):
+        limite = time.monotonic() - self.expira_segundos
+        for token in [t for t, s in self._sessoes.items() if s.ultimo_uso < limite]:
+            del self._sessoes[token]
+
+# Instância única usada pelo servidor e pela BoletoAPI
+sessoes = Sessoes()
@@ -0,0 +1,13 @@
+"""
+Benchmark do sistema de boletos.
+
+Gera bancos sintéticos do tamanho que se quiser (perfis, parcelamentos,
+pagos/pendentes, vencimentos colados em feriados) e mede cada método da
+BoletoAPI: latência (p50/p90/p99), pico de memória e o EXPLAIN QUERY PLAN
+de cada consulta executada. O resultado vai para um JSON, que pode ser
+comparado com o de outra versão.
+
+    python -m benchmark gerar --banco bench/sistema_boletos.db --boletos 1000000
+    python -m benchmark executar --banco bench/sistema_boletos.db --saida antes.json
+    python -m benchmark comparar antes.json depois.json
+"""
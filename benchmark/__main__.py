@@ -0,0 +1,96 @@
+"""
+Linha de comando do benchmark:
+
+    python -m benchmark gerar     --banco X.db --boletos 1000000 [--perfis 3] [--semente 42]
+    python -m benchmark executar  --banco X.db [--repeticoes 20] [--saida resultado.json] [--so buscar] [--com-cache]
+    python -m benchmark comparar  antes.json depois.json [--limite 20]
+
+'comparar' sai com código 1 se algum cenário piorou (bom para rodar no CI).
+"""
+import argparse
+import json
+import sys
+import time
+
+from benchmark import gerador, medicao
+
+def _gerar(args):
+    inicio = time.perf_counter()
+
+    def ao_progredir(total):
+        print(f"\r  {total:,} / {args.boletos:,} boletos".replace(',', '.'), end='', flush=True)
+
+    resumo = gerador.gerar_banco(args.banco, args.boletos, args.perfis, args.semente, ao_progredir=ao_progredir)
+    print()
+    print(f"Banco {resumo['banco']} gerado em {time.perf_counter() - inicio:.1f}s ({resumo['tamanho_mb']} MB)")
+    return 0
+
+def _executar(args):
+    def ao_medir(nome, resultado):
+        ms = resultado['ms']
+        alerta = '  [varre a tabela inteira]' if any(p.get('varredura_completa') for p in resultado['planos']) else ''
+        print(
+            f"{nome:<40} p50 {ms['p50']:>9.2f} ms  p90 {ms['p90']:>9.2f} ms  "
+            f"p99 {ms['p99']:>9.2f} ms  mem {resultado['pico_memoria_kb']:>9.1f} KB{alerta}"
+        )
+
+    resultado = medicao.executar(args.banco, args.repeticoes, args.usuario, args.so, ao_medir, args.com_cache)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+        print(f"Resultado salvo em {args.saida}")
+    return 0
+
+def _comparar(args):
+    with open(args.antes, encoding='utf-8') as arquivo:
+        antes = json.load(arquivo)
+    with open(args.depois, encoding='utf-8') as arquivo:
+        depois = json.load(arquivo)
+
+    linhas, regressoes = medicao.comparar(antes, depois, args.limite)
+    print(f"{'cenário':<40} {'p50 antes':>11} {'p50 depois':>11} {'variação':>9}")
+    for linha in linhas:
+        print(
+            f"{linha['cenario']:<40} {linha['p50_antes']:>9.2f}ms {linha['p50_depois']:>9.2f}ms "
+            f"{linha['variacao_p50']:>+8.1f}%"
+        )
+
+    if regressoes:
+        print("\nRegressões:")
+        for nome, motivos in regressoes:
+            print(f"  {nome}: {', '.join(motivos)}")
+        return 1
+    print("\nNenhuma regressão.")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmark', description='Benchmark do sistema de boletos')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    gerar = comandos.add_parser('gerar', help='cria um banco sintético')
+    gerar.add_argument('--banco', required=True, help='arquivo .db a criar (não pode existir)')
+    gerar.add_argument('--boletos', type=int, default=100000, help='quantidade de boletos (ex: 10000 a 5000000)')
+    gerar.add_argument('--perfis', type=int, default=3)
+    gerar.add_argument('--semente', type=int, default=42)
+    gerar.set_defaults(funcao=_gerar)
+
+    executar = comandos.add_parser('executar', help='mede os métodos da BoletoAPI')
+    executar.add_argument('--banco', required=True)
+    executar.add_argument('--repeticoes', type=int, default=20)
+    executar.add_argument('--usuario', type=int, help='perfil medido (padrão: o que tem mais boletos)')
+    executar.add_argument('--so', help='só os cenários cujo nome contém este texto')
+    executar.add_argument('--saida', help='arquivo JSON com o resultado')
+    executar.add_argument('--com-cache', action='store_true', help='mede com o cache de resultados ligado')
+    executar.set_defaults(funcao=_executar)
+
+    comparar = comandos.add_parser('comparar', help='compara dois resultados JSON')
+    comparar.add_argument('antes')
+    comparar.add_argument('depois')
+    comparar.add_argument('--limite', type=float, default=20.0, help='piora aceitável no p50, em %%')
+    comparar.set_defaults(funcao=_comparar)
+
+    args = parser.parse_args(argv)
+    return args.funcao(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
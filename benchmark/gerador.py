@@ -0,0 +1,186 @@
+"""
+Geração de bancos sintéticos (sistema_boletos.db) para o benchmark.
+
+Os dados imitam o uso real: poucos perfis concentram a maior parte dos
+boletos, boa parte vem em parcelamentos, os vencidos estão quase todos
+pagos e uma fatia dos vencimentos cai em feriados, fins de semana ou
+no dia antes/depois de um feriado (onde a regra do dia útil trabalha).
+
+Tudo sai de um random.Random(semente): a mesma semente gera o mesmo banco.
+"""
+import os
+import random
+from datetime import date, timedelta
+
+from backend import database, importacao
+from backend.calendario import calendario, feriados_do_ano
+from backend.dinheiro import juros_para_banco, para_centavos
+from backend.lancamentos import gerar_vencimentos
+
+CATEGORIAS = [
+    'Combustível', 'Manutenção', 'Peças', 'Pneus', 'Seguro', 'IPVA',
+    'Energia', 'Água', 'Telefone', 'Aluguel', 'Impostos', 'Fornecedores',
+]
+
+_RAMOS = [
+    'Posto', 'Auto Peças', 'Oficina', 'Borracharia', 'Transportadora',
+    'Seguradora', 'Distribuidora', 'Comercial', 'Mecânica', 'Lava Jato',
+]
+_NOMES = [
+    'São Marcos', 'Capixaba', 'Nova Venécia', 'Santa Rita', 'Do Norte',
+    'Boa Vista', 'Central', 'Rodovia', 'Três Irmãos', 'Vale do Rio Doce',
+    'Pioneira', 'Esperança', 'Aliança', 'Primavera', 'Progresso',
+]
+_DESCRICOES = [
+    'Abastecimento frota', 'Troca de óleo', 'Revisão {km} km', 'Pastilhas de freio',
+    'Nota fiscal {nf}', 'Conta de {mes}', 'Alinhamento e balanceamento',
+    'Parcela do financiamento', 'Serviço de guincho', 'Compra de material',
+]
+_BANCOS = ['Banco do Brasil', 'Caixa', 'Sicoob', 'Banestes', 'Itaú', 'Bradesco']
+
+def _empresas(aleatorio, quantidade):
+    nomes = set()
+    while len(nomes) < quantidade:
+        nomes.add(f"{aleatorio.choice(_RAMOS)} {aleatorio.choice(_NOMES)}")
+        if len(nomes) >= len(_RAMOS) * len(_NOMES):
+            break
+    return sorted(nomes)
+
+def _placa(aleatorio):
+    # Padrão Mercosul: ABC1D23
+    letras = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    return (
+        ''.join(aleatorio.choice(letras) for _ in range(3))
+        + str(aleatorio.randint(0, 9))
+        + aleatorio.choice(letras)
+        + f"{aleatorio.randint(0, 99):02d}"
+    )
+
+def _descricao(aleatorio):
+    return aleatorio.choice(_DESCRICOES).format(
+        km=aleatorio.choice([10, 20, 40, 60]) * 1000,
+        nf=aleatorio.randint(1000, 999999),
+        mes=aleatorio.choice(['janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho']),
+    )
+
+def _perto_de_feriado(aleatorio, inicio, fim):
+    """ Um feriado da faixa, ou o dia antes/depois dele """
+    ano = aleatorio.randint(inicio.year, fim.year)
+    dia = aleatorio.choice(sorted(feriados_do_ano(ano))) + timedelta(days=aleatorio.choice((-1, 0, 0, 1)))
+    return min(max(dia, inicio), fim)
+
+def _qtd_parcelas(aleatorio):
+    sorteio = aleatorio.random()
+    if sorteio < 0.6:
+        return 1
+    if sorteio < 0.85:
+        return aleatorio.randint(2, 6)
+    return aleatorio.randint(10, 12)
+
+def linhas_sinteticas(aleatorio, usuarios, total, hoje, anos_passados=3, anos_futuros=1,
+                      qtd_empresas=200, fracao_feriados=0.1):
+    """
+    Gera exatamente 'total' tuplas na ordem de SQL_INSERIR_BOLETO.
+    'usuarios' é uma lista de (id, peso) para sortear o dono de cada lançamento.
+    """
+    inicio = date(hoje.year - anos_passados, 1, 1)
+    fim = date(hoje.year + anos_futuros, 12, 31)
+    dias_faixa = (fim - inicio).days
+
+    empresas = _empresas(aleatorio, qtd_empresas)
+    placas = [_placa(aleatorio) for _ in range(50)]
+    ids = [u for u, _ in usuarios]
+    pesos = [p for _, p in usuarios]
+
+    gerados = 0
+    while gerados < total:
+        usuario_id = aleatorio.choices(ids, pesos)[0]
+        if aleatorio.random() < fracao_feriados:
+            primeiro = _perto_de_feriado(aleatorio, inicio, fim)
+        else:
+            primeiro = inicio + timedelta(days=aleatorio.randint(0, dias_faixa))
+
+        if aleatorio.random() < 0.05:
+            # Regra personalizada (ex: 30/60/90 dias), como no formulário
+            regra = '/'.join(str(30 * i) for i in range(1, aleatorio.randint(3, 5)))
+            datas = gerar_vencimentos(primeiro, 0, 'custom', regra)
+        else:
+            datas = gerar_vencimentos(primeiro, _qtd_parcelas(aleatorio))
+        datas = datas[:total - gerados]
+
+        empresa = aleatorio.choice(empresas)
+        categoria = aleatorio.choice(CATEGORIAS)
+        placa = aleatorio.choice(placas) if aleatorio.random() < 0.4 else ''
+        descricao = _descricao(aleatorio)
+        valor = round(aleatorio.lognormvariate(5.5, 1.0), 2) or 1.0
+        if aleatorio.random() < 0.5:
+            tipo_juros, juros = '%', aleatorio.choice([0.033, 0.05, 1.0])
+        else:
+            tipo_juros, juros = 'R$', round(aleatorio.uniform(0.1, 5.0), 2)
+        multa = aleatorio.choice([0.0, 2.0, round(valor * 0.02, 2)])
+        banco = aleatorio.choice(_BANCOS)
+
+        for indice, vencimento in enumerate(datas):
+            vencimento_util = calendario.proximo_dia_util(vencimento)
+            # Passado: quase tudo pago. Futuro: uns poucos adiantados.
+            pago = aleatorio.random() < (0.85 if vencimento_util < hoje else 0.03)
+            if pago:
+                data_pagamento = min(vencimento_util + timedelta(days=aleatorio.randint(-5, 10)), hoje)
+                atraso = (data_pagamento - vencimento_util).days
+                valor_pago = valor + (multa + (juros * atraso if tipo_juros == 'R$' else valor * juros / 100 * atraso) if atraso > 0 else 0)
+                extra = ('Pago', data_pagamento.isoformat(), banco)
+                valor_total = round(valor_pago, 2)
+            else:
+                extra = ('Pendente', None, None)
+                valor_total = valor
+
+            yield (
+                usuario_id, empresa, categoria, placa, descricao,
+                para_centavos(valor), juros_para_banco(tipo_juros, juros), tipo_juros,
+                para_centavos(multa), para_centavos(valor_total),
+                vencimento.isoformat(), vencimento_util.isoformat(),
+                indice + 1, len(datas),
+            ) + extra
+        gerados += len(datas)
+
+def gerar_banco(caminho, boletos=100000, perfis=3, semente=42, hoje=None, ao_progredir=None):
+    """
+    Cria (do zero) um banco em 'caminho' com 'perfis' perfis e 'boletos' boletos.
+    O primeiro perfil fica com a maior fatia (peso 1, 1/2, 1/3, ...).
+    Retorna um resumo com a quantidade gerada e o tamanho do arquivo.
+    """
+    if hoje is None:
+        hoje = date.today()
+    if os.path.exists(caminho):
+        raise FileExistsError(f"O banco {caminho} já existe (apague antes de gerar de novo)")
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+
+    aleatorio = random.Random(semente)
+    database.configurar_banco(caminho)
+    database.init_db()
+
+    with database.conexao() as conn:
+        conn.executemany(
+            "INSERT INTO usuarios (nome, foto) VALUES (?, '')",
+            [(f"Perfil {i}",) for i in range(1, perfis + 1)]
+        )
+        usuarios = [
+            (linha['id'], 1 / posicao)
+            for posicao, linha in enumerate(conn.execute("SELECT id FROM usuarios ORDER BY id"), start=1)
+        ]
+        conn.commit()
+
+        linhas = linhas_sinteticas(aleatorio, usuarios, boletos, hoje)
+        gravados = importacao.gravar_em_lotes(conn, linhas, ao_progredir)
+        conn.execute("ANALYZE")
+
+    database.fechar_conexoes()
+    return {
+        'banco': caminho,
+        'boletos': gravados,
+        'perfis': perfis,
+        'semente': semente,
+        'tamanho_mb': round(os.path.getsize(caminho) / 1024 / 1024, 1),
+    }
@@ -0,0 +1,385 @@
+"""
+Medição dos métodos da BoletoAPI sobre um banco (normalmente o do gerador).
+
+Cada cenário roda 'repeticoes' vezes sem nenhuma instrumentação (só o
+relógio) e depois mais UMA vez com tracemalloc e o rastreio de SQL ligados,
+para o pico de memória e os planos. Misturar as duas coisas distorce o tempo.
+
+Os cenários que escrevem desfazem o que fizeram no fim, para o mesmo banco
+poder ser medido de novo (e por outra versão) nas mesmas condições.
+
+O cache de resultados (backend/cache.py) fica desligado por padrão: com ele,
+toda repetição depois da primeira seria só uma consulta ao dicionário.
+"""
+import csv
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from backend import cache, database, nomes, relatorios
+from backend.instrumentacao import normalizar_sql, percentis
+
+try:
+    import resource
+except ImportError: # Não existe no Windows
+    resource = None
+
+# Quantas consultas diferentes de cada cenário entram no relatório de planos
+MAXIMO_PLANOS = 20
+
+# Campos que a tela pede no formato compacto da listagem (colunasLista no index.html)
+COLUNAS_TELA = [
+    'id', 'vencimento', 'status', 'empresa', 'categoria', 'placa', 'descricao',
+    'valor_original', 'juros', 'tipo_juros', 'multa', 'valor_total', 'data_pagamento',
+    'banco_pagamento', 'numero_parcela', 'total_parcelas',
+    'valor_atualizado', 'dias_atraso', 'esta_vencido',
+]
+
+_COMANDOS_COM_PLANO = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+class Cenario:
+    """ Um método da API com os argumentos de uma chamada e os ganchos de preparo/limpeza """
+
+    def __init__(self, nome, chamada, repeticoes=None, preparar=None, desfazer=None):
+        self.nome = nome
+        self.chamada = chamada        # chamada(api, indice_da_repeticao)
+        self.repeticoes = repeticoes  # None = o padrão da execução
+        self.preparar = preparar      # preparar(api) antes de cada repetição (fora do relógio)
+        self.desfazer = desfazer      # desfazer(api) no fim do cenário
+
+class _RastreadorSQL:
+    """ Liga o set_trace_callback em todas as conexões do pool e guarda as consultas vistas """
+
+    def __init__(self):
+        self.consultas = {}
+
+    def _anotar(self, sql):
+        texto = sql.lstrip()
+        if not texto.upper().startswith(_COMANDOS_COM_PLANO):
+            return # BEGIN, COMMIT, PRAGMA e os comentários dos triggers
+        chave = normalizar_sql(texto)
+        if chave not in self.consultas and len(self.consultas) < MAXIMO_PLANOS:
+            self.consultas[chave] = texto
+
+    def _conexoes(self):
+        # Pega todas as conexões do pool de uma vez (cria as que faltarem)
+        pool = database.obter_pool()
+        conexoes = [pool.adquirir() for _ in range(pool.tamanho)]
+        return pool, conexoes
+
+    def __enter__(self):
+        pool, conexoes = self._conexoes()
+        for conn in conexoes:
+            conn.set_trace_callback(self._anotar)
+            pool.devolver(conn)
+        return self
+
+    def __exit__(self, *erro):
+        pool, conexoes = self._conexoes()
+        for conn in conexoes:
+            conn.set_trace_callback(None)
+            pool.devolver(conn)
+
+def planos(consultas):
+    """ EXPLAIN QUERY PLAN de cada consulta (com os valores já embutidos pelo rastreio) """
+    resultado = []
+    with database.conexao() as conn:
+        for chave, sql in consultas.items():
+            item = {'sql': chave}
+            try:
+                linhas = conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()
+                item['plano'] = [linha[3] for linha in linhas]
+                # "SCAN boletos" sem índice = leitura da tabela inteira
+                item['varredura_completa'] = any(
+                    p.startswith('SCAN boletos') and 'INDEX' not in p and 'VIRTUAL' not in p
+                    for p in item['plano']
+                )
+            except sqlite3.Error as e:
+                item['erro'] = str(e)
+            resultado.append(item)
+    return resultado
+
+def medir(api, cenario, repeticoes):
+    """ Roda o cenário e devolve tempos, pico de memória e planos """
+    total = cenario.repeticoes or repeticoes
+    tempos = []
+    erros = []
+
+    def rodar(indice):
+        if cenario.preparar:
+            cenario.preparar(api)
+        inicio = time.perf_counter()
+        resposta = cenario.chamada(api, indice)
+        decorrido = (time.perf_counter() - inicio) * 1000
+        if isinstance(resposta, dict) and resposta.get('status') == 'erro' and len(erros) < 5:
+            erros.append(resposta.get('msg'))
+        return decorrido
+
+    for indice in range(total):
+        tempos.append(rodar(indice))
+
+    with _RastreadorSQL() as rastreador:
+        tracemalloc.start()
+        try:
+            rodar(total)
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    if cenario.desfazer:
+        cenario.desfazer(api)
+
+    medicao = {
+        'repeticoes': total,
+        'ms': percentis(tempos),
+        'pico_memoria_kb': round(pico / 1024, 1),
+        'planos': planos(rastreador.consultas),
+    }
+    if erros:
+        medicao['erros'] = erros
+    return medicao
+
+# --- CENÁRIOS ---
+
+def _consulta(sql, params=()):
+    with database.conexao() as conn:
+        return conn.execute(sql, params).fetchall()
+
+def montar_cenarios(api, pasta_temporaria):
+    """ Lista de cenários para o perfil logado em 'api', montada a partir dos dados do banco """
+    usuario_id = api.usuario_atual['id']
+    hoje = date.today()
+    inicio_mes = hoje.replace(day=1)
+    fim_mes = relatorios.proximo_periodo(inicio_mes, 'mes') - timedelta(days=1)
+
+    def mais_frequente(coluna):
+        linha = _consulta(
+            f"SELECT {coluna} FROM {nomes.VISAO} WHERE usuario_id = ? AND {coluna} <> '' "
+            f"GROUP BY {coluna} ORDER BY COUNT(*) DESC LIMIT 1",
+            (usuario_id,)
+        )
+        return linha[0][0] if linha else ''
+
+    empresa = mais_frequente('empresa')
+    categoria = mais_frequente('categoria')
+    placa = mais_frequente('placa')
+    termo_busca = empresa.split()[-1] if empresa else 'Posto'
+
+    # Cursor de uma página "funda" (para medir a paginação por cursor longe do início)
+    cursor_fundo = ''
+    for _ in range(20):
+        cursor_fundo = api.buscar_boletos({}, 1, 30, cursor=cursor_fundo)['paginacao']['proximo_cursor']
+        if not cursor_fundo:
+            break
+
+    filtros = {
+        'sem_filtro': {},
+        'empresa': {'empresa': empresa},
+        'placa': {'placa': placa},
+        'busca_textual': {'busca': termo_busca},
+        'categoria': {'categoria': [categoria]},
+        'mes_com_vencidos': {'data_inicio': inicio_mes.isoformat(), 'data_fim': fim_mes.isoformat(), 'incluir_vencidos': True},
+        'pagos': {'status': 'Pago'},
+    }
+
+    cenarios = [
+        Cenario('listar_perfis', lambda a, i: a.listar_perfis()),
+        Cenario('entrar_por_id', lambda a, i: a.entrar_por_id(usuario_id)),
+        Cenario('obter_resumo_dashboard', lambda a, i: a.obter_resumo_dashboard()),
+        Cenario('obter_categorias_usadas', lambda a, i: a.obter_categorias_usadas()),
+    ]
+    for nome, filtro in filtros.items():
+        cenarios.append(Cenario(f'buscar_boletos[{nome}]', lambda a, i, f=filtro: a.buscar_boletos(f, 1, 30)))
+    cenarios += [
+        Cenario('buscar_boletos[pagina_50]', lambda a, i: a.buscar_boletos({}, 50, 30)),
+        Cenario('buscar_boletos[pagina_500_itens]', lambda a, i: a.buscar_boletos({}, 1, 500)),
+        Cenario('buscar_boletos[compacto_500_itens]', lambda a, i: a.buscar_boletos({}, 1, 500, colunas=COLUNAS_TELA)),
+        Cenario('buscar_boletos[cursor_pagina_21]', lambda a, i: a.buscar_boletos({}, 21, 30, cursor=cursor_fundo, contar_total=False)),
+        Cenario('buscar_boletos[busca_relevancia]', lambda a, i: a.buscar_boletos({'busca': termo_busca, 'ordenar_relevancia': True}, 1, 30)),
+        Cenario('gerar_relatorio_mensal', lambda a, i: a.gerar_relatorio_mensal(hoje.strftime('%Y-%m'))),
+        Cenario('gerar_relatorio[12_meses]', lambda a, i: a.gerar_relatorio(
+            date(hoje.year - 1, hoje.month, 1).isoformat(), fim_mes.isoformat(), ['mes', 'trimestre', 'ano']
+        )),
+        Cenario('exportar_boletos[csv_mes]', lambda a, i: a.exportar_boletos(
+            filtros['mes_com_vencidos'], 'csv', os.path.join(pasta_temporaria, 'exportacao.csv')
+        ), repeticoes=5),
+    ]
+
+    # --- Escritas (cada uma desfaz o que fez) ---
+    ultimo_id = _consulta("SELECT COALESCE(MAX(id), 0) FROM boletos")[0][0]
+
+    def apagar_novos(a):
+        with database.conexao() as conn:
+            conn.execute("DELETE FROM boletos WHERE id > ?", (ultimo_id,))
+
+    lancamento = {
+        'boleto': {
+            'vencimento': hoje.isoformat(), 'valor': 350.0, 'juros': 0.033, 'tipoJuros': '%', 'multa': 2,
+            'empresa': empresa, 'categoria': categoria, 'placa': placa,
+            'descricao': 'Benchmark', 'parcelas': 12,
+        },
+        'modo': 'auto', 'regra': '',
+    }
+    cenarios.append(Cenario(
+        'salvar_lancamento[12_parcelas]', lambda a, i: a.salvar_lancamento(lancamento), desfazer=apagar_novos
+    ))
+
+    pendentes = [l[0] for l in _consulta(
+        "SELECT id FROM boletos WHERE usuario_id = ? AND status = 'Pendente' AND id % 13 = 0 LIMIT 200",
+        (usuario_id,)
+    )]
+    if pendentes:
+        cenarios += [
+            Cenario('pagar_boleto', lambda a, i: a.pagar_boleto({
+                'id': pendentes[i % len(pendentes)], 'banco': 'Benchmark', 'data': hoje.isoformat(), 'valor': 10
+            })),
+            # Estorna os mesmos boletos (devolve o banco ao estado original)
+            Cenario('cancelar_pagamento', lambda a, i: a.cancelar_pagamento(pendentes[i % len(pendentes)]),
+                    desfazer=lambda a: [a.cancelar_pagamento(id_boleto) for id_boleto in pendentes]),
+        ]
+
+    planilha = os.path.join(pasta_temporaria, 'importacao.csv')
+    with open(planilha, 'w', encoding='utf-8', newline='') as arquivo:
+        escritor = csv.writer(arquivo, delimiter=';')
+        escritor.writerow(['vencimento', 'valor', 'empresa', 'categoria', 'descricao', 'parcelas'])
+        for i in range(1000):
+            escritor.writerow([(hoje + timedelta(days=i % 365)).strftime('%d/%m/%Y'), '123,45', empresa, categoria, f'Importado {i}', 1])
+    cenarios.append(Cenario(
+        'importar_arquivo[csv_1000]', lambda a, i: a.importar_arquivo(planilha), repeticoes=5, desfazer=apagar_novos
+    ))
+
+    pasta_backup = os.path.join(pasta_temporaria, 'backups')
+    cenarios.append(Cenario(
+        'fazer_backup', lambda a, i: a.fazer_backup(), repeticoes=3,
+        # Sem o backup de hoje na pasta, senão o método só confere e volta
+        preparar=lambda a: shutil.rmtree(pasta_backup, ignore_errors=True),
+    ))
+    return cenarios
+
+# --- EXECUÇÃO ---
+
+def _versao():
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'],
+            capture_output=True, text=True, timeout=10,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def executar(caminho_banco, repeticoes=20, usuario_id=None, filtro_nome=None, ao_medir=None, com_cache=False):
+    """
+    Mede todos os cenários sobre o banco em 'caminho_banco' (o perfil com mais
+    boletos, se 'usuario_id' não for informado) e devolve o resultado em dict.
+    'filtro_nome' limita aos cenários cujo nome contém o texto.
+    'com_cache' mede com o cache de resultados ligado (navegação repetida).
+    """
+    from backend.api import BoletoAPI
+
+    if not os.path.exists(caminho_banco):
+        raise FileNotFoundError(f"Banco {caminho_banco} não encontrado (gere com: python -m benchmark gerar)")
+
+    pasta_temporaria = tempfile.mkdtemp(prefix='benchmark_')
+    database.configurar_banco(caminho_banco)
+    cache_ligado = cache.resultados.ativo
+    cache.resultados.ativo = com_cache
+    try:
+        # Sem arquivar ao abrir nem manutenção: o banco medido não muda de uma execução para outra
+        api = BoletoAPI(pasta_backup=os.path.join(pasta_temporaria, 'backups'), arquivar_apos_dias=None,
+                        manutencao_ociosa=None)
+        api._backup_automatico.join() # Não medir nada com a cópia inicial rodando
+
+        if usuario_id is None:
+            usuario_id = _consulta(
+                "SELECT usuario_id FROM boletos GROUP BY usuario_id ORDER BY COUNT(*) DESC LIMIT 1"
+            )[0][0]
+        api.entrar_por_id(usuario_id)
+
+        cenarios = montar_cenarios(api, pasta_temporaria)
+
+        resultado = {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'versao': _versao(),
+            'ambiente': {
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'sistema': platform.platform(),
+                'numpy': _tem_numpy(),
+                'cache': com_cache,
+            },
+            'banco': {
+                'caminho': os.path.abspath(caminho_banco),
+                'tamanho_mb': round(os.path.getsize(caminho_banco) / 1024 / 1024, 1),
+                'boletos': _consulta("SELECT COUNT(*) FROM boletos")[0][0],
+                'boletos_do_perfil': _consulta("SELECT COUNT(*) FROM boletos WHERE usuario_id = ?", (usuario_id,))[0][0],
+                'perfis': _consulta("SELECT COUNT(*) FROM usuarios")[0][0],
+            },
+            'repeticoes': repeticoes,
+            'cenarios': {},
+        }
+
+        for cenario in cenarios:
+            if filtro_nome and filtro_nome not in cenario.nome:
+                continue
+            medicao = medir(api, cenario, repeticoes)
+            resultado['cenarios'][cenario.nome] = medicao
+            if ao_medir:
+                ao_medir(cenario.nome, medicao)
+
+        if resource is not None:
+            # ru_maxrss: KB no Linux, bytes no macOS
+            maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            resultado['ambiente']['maxrss_kb'] = maximo // 1024 if platform.system() == 'Darwin' else maximo
+        return resultado
+    finally:
+        cache.resultados.ativo = cache_ligado
+        database.fechar_conexoes()
+        shutil.rmtree(pasta_temporaria, ignore_errors=True)
+
+def _tem_numpy():
+    from backend import juros
+    return juros.np is not None
+
+# --- COMPARAÇÃO ---
+
+def comparar(antes, depois, limite=20.0):
+    """
+    Compara duas execuções (dicts do JSON). Retorna (linhas, regressoes):
+    uma linha por cenário presente nas duas e a lista dos que ficaram mais
+    de 'limite'% mais lentos no p50 ou passaram a ler a tabela inteira.
+    """
+    linhas = []
+    regressoes = []
+    for nome, novo in depois['cenarios'].items():
+        velho = antes['cenarios'].get(nome)
+        if not velho:
+            continue
+        p50_antes, p50_depois = velho['ms']['p50'], novo['ms']['p50']
+        variacao = (p50_depois - p50_antes) * 100 / p50_antes if p50_antes else 0.0
+
+        varreu_antes = any(p.get('varredura_completa') for p in velho['planos'])
+        varre_agora = any(p.get('varredura_completa') for p in novo['planos'])
+
+        motivos = []
+        if variacao > limite:
+            motivos.append(f"p50 +{variacao:.0f}%")
+        if varre_agora and not varreu_antes:
+            motivos.append('passou a varrer a tabela inteira')
+        if motivos:
+            regressoes.append((nome, motivos))
+
+        linhas.append({
+            'cenario': nome,
+            'p50_antes': p50_antes, 'p50_depois': p50_depois,
+            'p90_antes': velho['ms']['p90'], 'p90_depois': novo['ms']['p90'],
+            'variacao_p50': round(variacao, 1),
+            'memoria_kb_antes': velho['pico_memoria_kb'], 'memoria_kb_depois': novo['pico_memoria_kb'],
+        })
+    return linhas, regressoes
@@ -0,0 +1,87 @@
+// Ponte usada no modo servidor (python servidor.py): cria o mesmo
+// window.pywebview.api da janela, mas cada chamada vira um POST /api/<método>
+// com os argumentos em JSON. O token da sessão fica no sessionStorage
+// (cada aba é uma sessão, com o próprio perfil logado).
+(function () {
+  let sessao = null;
+
+  function obterSessao(renovar) {
+    if (renovar) {
+      sessionStorage.removeItem("boletos_sessao");
+      sessao = null;
+    }
+    if (!sessao) {
+      const salvo = sessionStorage.getItem("boletos_sessao");
+      sessao = salvo
+        ? Promise.resolve(salvo)
+        : fetch("/sessao", { method: "POST" })
+            .then((r) => r.json())
+            .then((d) => {
+              sessionStorage.setItem("boletos_sessao", d.token);
+              return d.token;
+            });
+    }
+    return sessao;
+  }
+
+  async function chamar(metodo, args, tentativa = 0) {
+    const token = await obterSessao(tentativa > 0);
+    const resp = await fetch("/api/" + metodo, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        Authorization: "Bearer " + token,
+      },
+      body: JSON.stringify(args),
+    });
+    // Sessão expirada (ou servidor reiniciado): pede outra uma vez
+    if (resp.status === 401 && tentativa === 0) return chamar(metodo, args, 1);
+    return resp.json();
+  }
+
+  // Aqui o Python não consegue disparar o evento "boletos-alterados" (na
+  // janela ele vem pelo evaluate_js): a ponte pergunta de tempos em tempos
+  // pelo que mudou no perfil logado (ex: gravado por outro computador).
+  const INTERVALO_ALTERACOES = 5000;
+  let perfilAlteracoes = null;
+  let seqAlteracoes = null;
+
+  function avisar(delta) {
+    window.dispatchEvent(new CustomEvent("boletos-alterados", { detail: delta }));
+  }
+
+  async function buscarAlteracoes() {
+    try {
+      const resp = await chamar("obter_alteracoes", [seqAlteracoes]);
+      if (resp.status !== "sucesso") {
+        perfilAlteracoes = seqAlteracoes = null; // Ninguém logado nesta aba
+      } else if (resp.usuario_id !== perfilAlteracoes) {
+        // Entrou (ou trocou de perfil): começa do seq atual dele
+        perfilAlteracoes = resp.usuario_id;
+        seqAlteracoes = resp.seq;
+      } else {
+        if (resp.dados === null) {
+          avisar({ usuario_id: resp.usuario_id, seq: resp.seq, recarregar: true });
+        } else {
+          resp.dados.forEach(avisar);
+        }
+        seqAlteracoes = resp.seq;
+      }
+    } catch (e) {
+      // Servidor fora do ar: tenta de novo na próxima
+    } finally {
+      setTimeout(buscarAlteracoes, INTERVALO_ALTERACOES);
+    }
+  }
+  setTimeout(buscarAlteracoes, INTERVALO_ALTERACOES);
+
+  window.pywebview = {
+    api: new Proxy(
+      {},
+      {
+        get: (_, metodo) =>
+          metodo === "then" ? undefined : (...args) => chamar(metodo, args),
+      },
+    ),
+  };
+})();
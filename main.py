@@ -2,6 +2,9 @@ import webview
 import os
 import sys
 from backend.api import BoletoAPI
+from backend.database import fechar_conexoes
+from backend.execucao import encerrar_execucao
+from backend.manutencao import parar_manutencao
 
 def resource_path(relative_path):
     """ Retorna o caminho absoluto para o recurso, funcionando tanto em dev quanto no PyInstaller """
@@ -24,4 +27,12 @@ if __name__ == '__main__':
             js_api=api,
             width=1200, height=800
             )
+    api.conectar_janela(window)
     webview.start()
+
+    # Descarta o que ainda estava na fila e fecha as conexões do pool
+    # (faz o checkpoint final do WAL)
+    parar_manutencao()
+    encerrar_execucao()
+    fechar_conexoes()
+
@@ -0,0 +1,27 @@
+import argparse
+from backend import database
+from backend.api import BoletoAPI
+from backend.database import fechar_conexoes
+from backend.execucao import encerrar_execucao
+from backend.manutencao import parar_manutencao
+from backend.servidor import HOST, PORTA, ServidorAPI
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sistema de boletos em modo servidor (HTTP/JSON)')
+    parser.add_argument('--host', default=HOST, help='use 0.0.0.0 para aceitar os outros computadores da rede')
+    parser.add_argument('--porta', type=int, default=PORTA)
+    parser.add_argument('--banco', default=database.CAMINHO_BANCO)
+    args = parser.parse_args()
+
+    database.configurar_banco(args.banco)
+    api = BoletoAPI()
+
+    try:
+        ServidorAPI(api, args.host, args.porta).servir()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Descarta o que ainda estava na fila e fecha as conexões do pool
+        parar_manutencao()
+        encerrar_execucao()
+        fechar_conexoes()
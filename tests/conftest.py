@@ -0,0 +1,40 @@
+import pytest
+
+from backend import cache, database
+from backend.api import BoletoAPI
+
+BOLETO = {
+    'empresa': 'Posto Central', 'categoria': 'Combustível', 'placa': 'ABC1D23', 'descricao': '',
+    'vencimento': '2025-03-10', 'valor': '150.00', 'juros': '0', 'multa': '0', 'tipoJuros': 'R$',
+    'parcelas': 1,
+}
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """ BoletoAPI num banco novo em tmp_path, sem arquivamento nem manutenção em segundo plano """
+    monkeypatch.chdir(tmp_path) # logs/ e afins ficam na pasta do teste
+    database.configurar_banco(str(tmp_path / 'sistema_boletos.db'))
+    cache.resultados.invalidar()
+    api = BoletoAPI(pasta_backup=str(tmp_path / 'backups'), arquivar_apos_dias=None, manutencao_ociosa=None)
+    api._backup_automatico.join()
+    yield api
+    database.fechar_conexoes()
+    cache.resultados.invalidar()
+
+def criar_perfil(api, nome):
+    """ Cria o perfil e retorna o id dele """
+    assert api.criar_perfil({'nome': nome})['status'] == 'sucesso'
+    return next(perfil['id'] for perfil in api.listar_perfis() if perfil['nome'] == nome)
+
+def lancar(api, **campos):
+    """ Lança um boleto (BOLETO com 'campos' trocados) no perfil logado """
+    resposta = api.salvar_lancamento({'boleto': dict(BOLETO, **campos), 'modo': 'auto', 'regra': ''})
+    assert resposta['status'] == 'sucesso', resposta
+    return resposta
+
+@pytest.fixture
+def logado(api):
+    """ api com um perfil novo logado """
+    usuario_id = criar_perfil(api, 'Transportadora')
+    assert api.entrar_por_id(usuario_id)['status'] == 'sucesso'
+    return api
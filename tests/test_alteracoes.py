@@ -0,0 +1,30 @@
+from tests.conftest import BOLETO, lancar
+
+def _ids(api):
+    return [boleto['id'] for boleto in api.buscar_boletos({})['dados']]
+
+def _aplicar(lista, delta, chave):
+    """ O que a tela faz com a lista de nomes (trocarNomes no index.html) """
+    return sorted((set(lista) - set(delta[f'{chave}_removidas'])) | set(delta[chave]))
+
+def test_delta_tira_o_nome_quando_o_ultimo_boleto_deixa_de_usar(logado):
+    primeiro = lancar(logado, categoria='Pneus', empresa='Borracharia')['alteracao']
+    assert primeiro['categorias'] == ['Pneus'] and primeiro['categorias_removidas'] == []
+    lancar(logado, categoria='Pneus', empresa='Posto Central')
+    categorias = logado.obter_categorias_usadas()
+    empresas = logado.obter_empresas_usadas()
+
+    borracharia, posto = sorted(_ids(logado))
+    # Ainda há outro boleto com 'Pneus': a categoria fica
+    delta = logado.excluir_boleto(borracharia)['alteracao']
+    assert delta['categorias'] == ['Pneus'] and delta['categorias_removidas'] == []
+    assert delta['empresas_removidas'] == ['Borracharia']
+    categorias, empresas = _aplicar(categorias, delta, 'categorias'), _aplicar(empresas, delta, 'empresas')
+    assert categorias == logado.obter_categorias_usadas()
+    assert empresas == logado.obter_empresas_usadas()
+
+    # Trocar a categoria do último: a antiga sai, a nova entra
+    boleto = dict(BOLETO, categoria='Revisão')
+    delta = logado.atualizar_boleto({'id': posto, 'boleto': boleto})['alteracao']
+    assert delta['categorias'] == ['Revisão'] and delta['categorias_removidas'] == ['Pneus']
+    assert _aplicar(categorias, delta, 'categorias') == logado.obter_categorias_usadas() == ['Revisão']
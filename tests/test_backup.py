@@ -0,0 +1,94 @@
+import gzip
+import os
+import shutil
+import sqlite3
+from datetime import date
+
+from backend import arquivamento, backup, database
+from tests.conftest import lancar
+
+def _abrir_copia(caminho_gz, pasta):
+    """ Descompacta o backup (como quem vai restaurar) e abre a cópia """
+    destino = os.path.join(pasta, os.path.basename(caminho_gz)[:-len('.gz')])
+    with gzip.open(caminho_gz, 'rb') as entrada, open(destino, 'wb') as saida:
+        shutil.copyfileobj(entrada, saida)
+    return sqlite3.connect(destino)
+
+def _contar(conn, tabela):
+    return conn.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+
+def test_backup_compactado_abre_com_os_mesmos_dados(logado, tmp_path):
+    for i in range(20):
+        lancar(logado, empresa=f'Fornecedor {i}', parcelas=3)
+    pasta = str(tmp_path / 'manual')
+
+    [caminho] = backup.fazer_backup(database.CAMINHO_BANCO, pasta)
+    assert caminho.endswith('.db.gz') and caminho == backup.backup_de_hoje(pasta)
+    assert backup.fazer_backup(database.CAMINHO_BANCO, pasta) == [] # Um por dia
+    assert not [nome for nome in os.listdir(pasta) if nome.endswith(('.tmp.db', '.part'))]
+
+    copia = _abrir_copia(caminho, str(tmp_path))
+    try:
+        assert copia.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+        with database.conexao() as conn:
+            for tabela in ('usuarios', 'boletos', 'categorias', 'empresas'):
+                assert _contar(copia, tabela) == _contar(conn, tabela), tabela
+            assert copia.execute("SELECT SUM(valor_original) FROM boletos").fetchone()[0] == \
+                conn.execute("SELECT SUM(valor_original) FROM boletos").fetchone()[0]
+            assert copia.execute("PRAGMA user_version").fetchone()[0] == \
+                conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        copia.close()
+
+def test_rotacao_mantem_os_mais_recentes(api, tmp_path):
+    pasta = tmp_path / 'rotacao'
+    pasta.mkdir()
+    antigos = [f'backup_2025-01-0{dia}.db.gz' for dia in range(1, 8)]
+    for posicao, nome in enumerate(antigos):
+        (pasta / nome).write_bytes(b'')
+        os.utime(pasta / nome, (1_700_000_000 + posicao, 1_700_000_000 + posicao))
+    (pasta / 'anotacoes.txt').write_text('não é backup')
+
+    [hoje] = backup.fazer_backup(database.CAMINHO_BANCO, str(pasta), manter=3)
+    assert sorted(os.listdir(pasta)) == sorted(antigos[-2:] + [os.path.basename(hoje), 'anotacoes.txt'])
+
+def test_arquivo_so_e_copiado_quando_muda(logado, tmp_path):
+    lancar(logado, vencimento='2019-05-10', parcelas=2)
+    lancar(logado, vencimento='2026-05-10')
+    with database.conexao() as conn:
+        conn.execute("UPDATE boletos SET status = 'Pago' WHERE vencimento < '2020-01-01'")
+    arquivamento.arquivar(database.CAMINHO_BANCO, date(2019, 6, 1))
+    pasta = str(tmp_path / 'com_arquivo')
+    pasta_arquivo = os.path.join(pasta, 'arquivo')
+    alvo = (arquivamento.caminho_arquivo(database.CAMINHO_BANCO), pasta_arquivo)
+
+    def backup_do_dia():
+        # Apaga o de hoje do banco principal para poder repetir o backup no mesmo dia
+        if backup.backup_de_hoje(pasta):
+            os.remove(backup.backup_de_hoje(pasta))
+        return backup.fazer_backup(database.CAMINHO_BANCO, pasta, arquivo=alvo)
+
+    criados = backup_do_dia()
+    assert len(criados) == 2
+    copia = _abrir_copia(criados[1], str(tmp_path))
+    try:
+        assert _contar(copia, 'boletos') == 1
+    finally:
+        copia.close()
+    with open(os.path.join(pasta_arquivo, backup.VERSAO_ARQUIVO)) as arquivo:
+        versao = int(arquivo.read())
+
+    # Nada mudou no arquivo: só o banco principal é copiado
+    assert backup_do_dia() == [os.path.join(pasta, os.path.basename(criados[0]))]
+
+    # Mais um boleto arquivado: a versão muda e o arquivo é copiado de novo
+    arquivamento.arquivar(database.CAMINHO_BANCO, date(2020, 1, 1))
+    assert len(backup_do_dia()) == 2
+    with open(os.path.join(pasta_arquivo, backup.VERSAO_ARQUIVO)) as arquivo:
+        assert int(arquivo.read()) > versao
+
+    # versao.txt estragado: o arquivo é copiado de novo, sem erro
+    for conteudo in ('lixo', ''):
+        with open(os.path.join(pasta_arquivo, backup.VERSAO_ARQUIVO), 'w') as arquivo:
+            arquivo.write(conteudo)
+        assert len(backup_do_dia()) == 2
@@ -0,0 +1,102 @@
+import os
+from datetime import date
+
+from backend import arquivamento, bancos_perfil, database
+from tests.conftest import criar_perfil, lancar
+
+def _linhas(sql, params=(), usuario_id=None):
+    with database.conexao(usuario_id) as conn:
+        return [tuple(linha) for linha in conn.execute(sql, params)]
+
+def _boletos(usuario_id=None):
+    """ (id, usuario_id, empresa, vencimento) dos boletos do banco, com os do arquivo """
+    with database.conexao(usuario_id) as conn:
+        campos = ('id', 'usuario_id', 'empresa', 'vencimento')
+        origem = arquivamento.origem(conn, campos)
+        return [tuple(linha) for linha in conn.execute(f"SELECT {', '.join(campos)} FROM {origem} ORDER BY id")]
+
+def _relatorio(api):
+    resposta = api.gerar_relatorio_perfis('2019-01-01', '2027-12-31')
+    assert resposta['status'] == 'sucesso', resposta
+    return {perfil['nome']: (perfil['qtd_pagos'], perfil['qtd_pendentes'], perfil['total_esperado'])
+            for perfil in resposta['dados']}
+
+def _dois_perfis(api):
+    """ Dois perfis com boletos, um pago de 2019 já no arquivo do banco único """
+    oficina = criar_perfil(api, 'Oficina')
+    frota = criar_perfil(api, 'Frota')
+    api.entrar_por_id(oficina)
+    lancar(api, empresa='Retífica', vencimento='2019-05-10')
+    lancar(api, empresa='Posto Central', vencimento='2026-02-10', parcelas=2)
+    api.entrar_por_id(frota)
+    lancar(api, empresa='Borracharia', vencimento='2026-03-10', valor='80.00')
+    with database.conexao() as conn:
+        conn.execute("UPDATE boletos SET status = 'Pago' WHERE vencimento < '2020-01-01'")
+    assert arquivamento.arquivar(database.CAMINHO_BANCO, date(2020, 1, 1)) == 1
+    database.reaplicar_ganchos_conexao()
+    return oficina, frota
+
+def test_dividir_e_juntar_mantem_os_boletos(api):
+    oficina, frota = _dois_perfis(api)
+    antes = _boletos()
+    relatorio = _relatorio(api)
+    assert relatorio == {'Frota': (0, 1, 80.0), 'Oficina': (1, 2, 450.0)}
+
+    resumo = bancos_perfil.dividir()
+    database.init_db()
+    assert database.BANCOS_POR_PERFIL
+    assert (resumo['perfis'], resumo['boletos']) == (2, 4)
+    assert os.path.exists(resumo['copia'])
+    assert bancos_perfil.perfis_com_banco() == sorted([oficina, frota])
+    assert _linhas("SELECT COUNT(*) FROM boletos") == [(0,)] # O principal vira só o catálogo
+
+    # Cada perfil com os seus, com os mesmos ids (o arquivado voltou para a tabela)
+    assert _boletos(oficina) == [linha for linha in antes if linha[1] == oficina]
+    assert _boletos(frota) == [linha for linha in antes if linha[1] == frota]
+    assert _relatorio(api) == relatorio
+
+    # Gravação num perfil e arquivamento no banco dele: o relatório anexa os dois arquivos
+    api.entrar_por_id(frota)
+    lancar(api, empresa='Auto Elétrica', vencimento='2026-04-10', valor='20.00')
+    assert api.buscar_boletos({})['paginacao']['total_itens'] == 2
+    api.entrar_por_id(oficina)
+    assert api.buscar_boletos({})['paginacao']['total_itens'] == 3
+    assert arquivamento.arquivar(database.caminho_perfil(oficina), date(2020, 1, 1)) == 1
+    assert _relatorio(api) == {'Frota': (0, 2, 100.0), 'Oficina': (1, 2, 450.0)}
+
+    resumo = bancos_perfil.juntar()
+    database.init_db()
+    assert not database.BANCOS_POR_PERFIL
+    assert (resumo['perfis'], resumo['boletos']) == (2, 5)
+    assert os.path.isdir(database.pasta_perfis() + '_juntada')
+
+    depois = _boletos()
+    ids = [linha[0] for linha in depois]
+    assert len(ids) == len(set(ids)) == 5 # Renumerados, sem repetir
+    assert sorted(linha[1:] for linha in depois) == sorted(
+        [linha[1:] for linha in antes] + [(frota, 'Auto Elétrica', '2026-04-10')]
+    )
+    # Os arquivados dos perfis voltaram para a tabela: o arquivo do banco único está vazio
+    assert _linhas("SELECT COUNT(*) FROM boletos") == [(5,)]
+    with database.conexao() as conn:
+        assert arquivamento.limite(conn) is None
+    assert _relatorio(api) == {'Frota': (0, 2, 100.0), 'Oficina': (1, 2, 450.0)}
+
+def test_excluir_perfil_apaga_o_banco_dele(api):
+    oficina, frota = _dois_perfis(api)
+    bancos_perfil.dividir()
+    database.init_db()
+    assert arquivamento.arquivar(database.caminho_perfil(oficina), date(2020, 1, 1)) == 1
+    caminho = database.caminho_perfil(oficina)
+    assert os.path.exists(arquivamento.caminho_arquivo(caminho))
+
+    api.entrar_por_id(frota)
+    assert api.excluir_perfil(oficina)['status'] == 'sucesso'
+    assert not os.path.exists(caminho) and not os.path.exists(arquivamento.caminho_arquivo(caminho))
+    assert bancos_perfil.perfis_com_banco() == [frota]
+    assert list(_relatorio(api)) == ['Frota']
+
+def test_relatorio_de_todos_os_perfis_exige_login(api):
+    criar_perfil(api, 'Oficina')
+    resposta = api.gerar_relatorio_perfis('2019-01-01', '2027-12-31')
+    assert (resposta['status'], resposta['msg']) == ('erro', 'Login necessário')
@@ -0,0 +1,72 @@
+from datetime import date
+
+import pytest
+
+from backend import arquivamento, cache, database
+from tests.conftest import lancar
+
+BUSCAS = [
+    ({'busca': 'ofic'}, {'Oficina do Zé'}),
+    ({'busca': 'OFICINA zé'}, {'Oficina do Zé'}),
+    ({'busca': 'ze'}, {'Borracharia Zezinho'}), # Curto: LIKE (acento conta, como no índice)
+    ({'busca': 'ABC1'}, {'Oficina do Zé', 'Posto Central'}), # Placa
+    ({'busca': 'alinhamento'}, {'Borracharia Zezinho'}), # Descrição
+    ({'busca': 'troca "óleo'}, {'Posto Central'}), # Aspas não quebram a consulta
+    ({'busca': 'ofic inexistente'}, set()),
+    ({'empresa': 'borrach'}, {'Borracharia Zezinho'}),
+    ({'placa': 'xyz'}, {'Borracharia Zezinho'}),
+]
+
+@pytest.fixture
+def com_textos(logado):
+    lancar(logado, empresa='Oficina do Zé', placa='ABC1D23', descricao='Revisão geral')
+    lancar(logado, empresa='Posto Central', placa='ABC1E45', descricao='Troca "óleo" e filtro')
+    lancar(logado, empresa='Borracharia Zezinho', placa='XYZ9K87', descricao='Alinhamento')
+    return logado
+
+def _empresas(api, filtros):
+    return {boleto['empresa'] for boleto in api.buscar_boletos(filtros)['dados']}
+
+def test_indice_e_like_acham_os_mesmos_boletos(com_textos, monkeypatch):
+    if not database.FTS_DISPONIVEL:
+        pytest.skip('SQLite sem FTS5')
+    for filtros, esperado in BUSCAS:
+        assert _empresas(com_textos, filtros) == esperado, filtros
+
+    # Sem FTS5 a busca cai no LIKE, com o mesmo resultado
+    monkeypatch.setattr(database, 'FTS_DISPONIVEL', False)
+    cache.resultados.invalidar()
+    for filtros, esperado in BUSCAS:
+        assert _empresas(com_textos, filtros) == esperado, filtros
+
+def test_indice_acompanha_as_escritas(com_textos):
+    [boleto] = com_textos.buscar_boletos({'busca': 'alinhamento'})['dados']
+    novo = dict(boleto, empresa='Auto Elétrica', descricao='Bateria', valor='80.00',
+                tipoJuros='R$', juros='0', multa='0')
+    assert com_textos.atualizar_boleto({'id': boleto['id'], 'boleto': novo})['status'] == 'sucesso'
+    assert _empresas(com_textos, {'busca': 'alinhamento'}) == set()
+    assert _empresas(com_textos, {'busca': 'bateria elétr'}) == {'Auto Elétrica'}
+
+    assert com_textos.excluir_boleto(boleto['id'])['status'] == 'sucesso'
+    assert _empresas(com_textos, {'busca': 'bateria'}) == set()
+    if database.FTS_DISPONIVEL:
+        with database.conexao() as conn:
+            conn.execute("INSERT INTO boletos_fts (boletos_fts, rank) VALUES ('integrity-check', 1)")
+
+def test_relevancia_poe_o_melhor_resultado_primeiro(com_textos):
+    if not database.FTS_DISPONIVEL:
+        pytest.skip('SQLite sem FTS5')
+    lancar(com_textos, empresa='Filtros Filtro', descricao='filtro de filtro', vencimento='2027-01-01')
+    filtros = {'busca': 'filtro', 'ordenar_relevancia': True}
+    assert [b['empresa'] for b in com_textos.buscar_boletos(filtros)['dados']] == ['Filtros Filtro', 'Posto Central']
+
+def test_busca_no_arquivo_usa_like(com_textos):
+    lancar(com_textos, empresa='Retífica Antiga', descricao='Motor', vencimento='2019-05-10')
+    with database.conexao() as conn:
+        conn.execute("UPDATE boletos SET status = 'Pago' WHERE vencimento < '2020-01-01'")
+    assert arquivamento.arquivar(database.CAMINHO_BANCO, date(2020, 1, 1)) == 1
+    database.reaplicar_ganchos_conexao()
+
+    filtros = {'busca': 'retíf motor', 'data_inicio': '2019-01-01'}
+    assert _empresas(com_textos, filtros) == {'Retífica Antiga'}
+    assert _empresas(com_textos, {'busca': 'ofic', 'data_inicio': '2019-01-01'}) == {'Oficina do Zé'}
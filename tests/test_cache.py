@@ -0,0 +1,51 @@
+import inspect
+
+from backend import cache
+from tests.conftest import lancar
+
+def _chave(funcao, *args, **kwargs):
+    return cache.chave_argumentos(inspect.signature(funcao), args, kwargs)
+
+def buscar(filtros, pagina=1, itens_por_pagina=30, cursor=None, contar_total=None, colunas=None):
+    pass
+
+def test_argumentos_padrao_e_nomeados_caem_na_mesma_chave():
+    assert _chave(buscar, {}, 1) == _chave(buscar, {}) == _chave(buscar, filtros={}, pagina=1)
+
+def test_vazios_fora_dos_filtros_continuam_diferentes():
+    assert _chave(buscar, {}, cursor='') != _chave(buscar, {}, cursor=None)
+    assert _chave(buscar, {}, contar_total=False) != _chave(buscar, {})
+    assert _chave(buscar, {}, colunas=[]) != _chave(buscar, {})
+
+def test_ordem_das_colunas_conta():
+    assert _chave(buscar, {}, colunas=['valor_original', 'empresa']) != _chave(buscar, {}, colunas=['empresa', 'valor_original'])
+
+def test_colunas_vem_na_ordem_pedida(logado):
+    lancar(logado, empresa='Posto Central', valor='150.00')
+    primeira = logado.buscar_boletos({}, colunas=['valor_atualizado', 'empresa', 'id'])['dados']
+    segunda = logado.buscar_boletos({}, colunas=['empresa', 'valor_atualizado', 'empresa'])['dados']
+    assert primeira['colunas'] == ['valor_atualizado', 'empresa', 'id']
+    assert list(primeira['linhas'][0])[:2] == [150.0, 'Posto Central']
+    # Outra ordem não reaproveita a resposta da primeira; a coluna repetida vem uma vez
+    assert segunda['colunas'] == ['empresa', 'valor_atualizado']
+    assert list(segunda['linhas'][0]) == ['Posto Central', 150.0]
+
+def test_filtros_vazios_e_listas_em_outra_ordem_sao_iguais():
+    assert _chave(buscar, {'empresa': '', 'status': None, 'categoria': []}) == _chave(buscar, {})
+    assert _chave(buscar, {'categoria': ['Peças', 'Combustível']}) == _chave(buscar, {'categoria': ['Combustível', 'Peças']})
+
+def test_contar_total_falso_nao_reaproveita_a_resposta_com_total(logado):
+    lancar(logado)
+    com_total = logado.buscar_boletos({}, 1, 30)
+    sem_total = logado.buscar_boletos({}, 1, 30, contar_total=False)
+    assert com_total['paginacao']['total_itens'] == 1
+    assert sem_total['paginacao']['total_itens'] is None
+
+def test_cursor_vazio_nao_reaproveita_a_resposta_sem_cursor(logado):
+    lancar(logado)
+    acertos = cache.resultados.estatisticas()['acertos']
+    logado.buscar_boletos({}, cursor=None)
+    logado.buscar_boletos({}, cursor='')
+    assert cache.resultados.estatisticas()['acertos'] == acertos
+    logado.buscar_boletos({}, 1, cursor=None)
+    assert cache.resultados.estatisticas()['acertos'] == acertos + 1
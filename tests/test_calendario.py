@@ -0,0 +1,16 @@
+from datetime import date
+
+from backend.calendario import CalendarioUteis
+
+def test_faixa_ate_o_ultimo_ano():
+    calendario = CalendarioUteis(2024, 2025)
+    # Data digitada ou importada em 9999: amplia a faixa até date.max sem erro
+    ultimo = CalendarioUteis(9998, 9998)
+    assert ultimo.eh_dia_util(date(9999, 12, 31)) # Sexta-feira
+    assert ultimo.proximo_dia_util(date(9999, 12, 25)) == date(9999, 12, 27) # Natal num sábado
+    assert ultimo.proximo_dia_util(date.max) == date.max
+    assert ultimo.dias_uteis_entre(date(9999, 12, 27), date.max) == 4
+    assert ultimo.ano_fim == 9999
+
+    assert calendario.proximo_dia_util(date(2025, 12, 31)) == date(2025, 12, 31)
+    assert calendario.proximo_dia_util(date(2026, 1, 1)) == date(2026, 1, 2)
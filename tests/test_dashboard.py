@@ -0,0 +1,68 @@
+from datetime import date, timedelta
+
+from backend import database
+from backend.api import _esqueleto_resumo
+from backend.calendario import calendario
+from tests.conftest import BOLETO, lancar
+
+def _vencimento_util(vencimento):
+    with database.conexao() as conn:
+        return conn.execute(
+            "SELECT vencimento_util FROM boletos WHERE vencimento = ?", (vencimento,)
+        ).fetchone()[0]
+
+def _esperado(pendentes, hoje):
+    """ O resumo calculado em Python, boleto a boleto: (qtd, centavos) de cada grupo """
+    faixas = _esqueleto_resumo(hoje)
+    grupos = {grupo: [0, 0] for grupo in ('hoje', 'vencidos', 'semana', 'mes')}
+    for vencimento, centavos in pendentes:
+        util = calendario.proximo_dia_util(vencimento).isoformat()
+        dentro = {
+            'hoje': util == faixas['hoje']['inicio'],
+            'vencidos': util < faixas['hoje']['inicio'],
+            'semana': faixas['semana']['inicio'] <= util <= faixas['semana']['fim'],
+            'mes': faixas['mes']['inicio'] <= util <= faixas['mes']['fim'],
+        }
+        for grupo, conta in dentro.items():
+            if conta:
+                grupos[grupo][0] += 1
+                grupos[grupo][1] += centavos
+    return {grupo: (qtd, centavos / 100) for grupo, (qtd, centavos) in grupos.items()}
+
+def test_vencimento_util_pula_fim_de_semana_e_feriado(logado):
+    lancar(logado, vencimento='2025-03-08') # Sábado
+    lancar(logado, vencimento='2025-12-25') # Natal, quinta-feira
+    lancar(logado, vencimento='2025-03-11') # Terça comum
+    assert _vencimento_util('2025-03-08') == '2025-03-10'
+    assert _vencimento_util('2025-12-25') == '2025-12-26'
+    assert _vencimento_util('2025-03-11') == '2025-03-11'
+
+    # Mudar o vencimento recalcula o dia útil
+    [boleto] = logado.buscar_boletos({'data_inicio': '2025-03-11', 'data_fim': '2025-03-11'})['dados']
+    resposta = logado.atualizar_boleto({'id': boleto['id'], 'boleto': dict(BOLETO, vencimento='2025-03-09')})
+    assert resposta['status'] == 'sucesso'
+    assert _vencimento_util('2025-03-09') == '2025-03-10'
+
+def test_resumo_soma_os_pendentes_por_vencimento_util(logado):
+    hoje = date.today()
+    pendentes = []
+    for dias, reais in ((-40, 10), (-3, 20), (-1, 30), (0, 40), (1, 50), (2, 60), (6, 70), (20, 80), (45, 90)):
+        vencimento = hoje + timedelta(days=dias)
+        lancar(logado, vencimento=vencimento.isoformat(), valor=f'{reais}.00')
+        pendentes.append((vencimento, reais * 100))
+
+    # Pago e cancelado ficam fora do resumo
+    lancar(logado, vencimento=hoje.isoformat(), valor='999.00')
+    lancar(logado, vencimento=hoje.isoformat(), valor='888.00')
+    with database.conexao() as conn:
+        conn.execute("UPDATE boletos SET status = 'Pago' WHERE valor_original = 99900")
+        conn.execute("UPDATE boletos SET status = 'Cancelado' WHERE valor_original = 88800")
+
+    resposta = logado.obter_resumo_dashboard()
+    assert resposta['status'] == 'sucesso'
+    resumo = resposta['dados']
+    obtido = {grupo: (resumo[grupo]['qtd'], resumo[grupo]['valor']) for grupo in ('hoje', 'vencidos', 'semana', 'mes')}
+    assert obtido == _esperado(pendentes, hoje)
+
+def test_resumo_sem_login(api):
+    assert api.obter_resumo_dashboard()['status'] == 'erro'
@@ -0,0 +1,14 @@
+import logging
+
+from backend import database
+from backend.migracoes import VERSAO_ATUAL
+
+def test_init_db_registra_a_migracao_no_log_sem_print(tmp_path, capsys, caplog):
+    database.configurar_banco(str(tmp_path / 'novo.db'))
+    try:
+        with caplog.at_level(logging.INFO, logger='boletos.migracoes'):
+            database.init_db()
+    finally:
+        database.fechar_conexoes()
+    assert capsys.readouterr().out == ''
+    assert f"versão {VERSAO_ATUAL}" in caplog.text
@@ -0,0 +1,62 @@
+import threading
+import time
+
+from backend import arquivamento, database
+from tests.conftest import lancar
+
+def test_janela_de_importacao_nao_segura_a_fila_de_escrita(logado, monkeypatch):
+    escolhendo, liberar = threading.Event(), threading.Event()
+
+    def escolher(*args, **kwargs):
+        escolhendo.set()
+        liberar.wait(5) # O usuário ainda está escolhendo o arquivo
+        return None
+
+    monkeypatch.setattr(logado, '_escolher_arquivo', escolher)
+    importacao = threading.Thread(target=logado.importar_arquivo)
+    importacao.start()
+    try:
+        assert escolhendo.wait(2)
+        inicio = time.perf_counter()
+        lancar(logado)
+        assert time.perf_counter() - inicio < 2
+    finally:
+        liberar.set()
+        importacao.join()
+
+def test_arquivamento_manda_um_lote_por_vez_ao_escritor(logado, monkeypatch):
+    lancar(logado, vencimento='2019-05-10', parcelas=6)
+    with database.conexao() as conn:
+        conn.execute("UPDATE boletos SET status = 'Pago'")
+    monkeypatch.setattr(arquivamento, 'LINHAS_POR_LOTE', 2)
+
+    threads, gravacoes = [], []
+    original = database.get_db_connection
+    def conexao_do_arquivo(caminho):
+        conn = original(caminho)
+        conn.set_trace_callback(
+            lambda sql: sql.startswith('BEGIN') and threads.append(threading.current_thread().name)
+        )
+        return conn
+    monkeypatch.setattr(database, 'get_db_connection', conexao_do_arquivo)
+
+    def pausa(segundos):
+        # Entre dois lotes, a fila do escritor está livre: a gravação da tela passa na hora
+        gravacao = threading.Thread(target=lancar, args=(logado,))
+        gravacao.start()
+        gravacao.join(2)
+        gravacoes.append(not gravacao.is_alive())
+    monkeypatch.setattr(arquivamento.time, 'sleep', pausa)
+
+    resposta = logado.arquivar_pagos(730)
+    assert resposta['status'] == 'sucesso' and resposta['dados']['boletos'] == 6
+    assert gravacoes == [True, True, True]
+    assert logado.buscar_boletos({'status': 'Pendente'})['paginacao']['total_itens'] == 3
+    # Preparação + 3 lotes + a busca que não achou mais nada, cada um uma tarefa do escritor
+    assert len(threads) == 5 and all(nome.startswith('escrita') for nome in threads)
+
+    # O automático, depois do backup do dia, também
+    logado._arquivar_apos_dias = 730
+    threads.clear()
+    logado._ao_terminar_backup([], None)
+    assert threads and all(nome.startswith('escrita') for nome in threads)
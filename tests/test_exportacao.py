@@ -0,0 +1,74 @@
+import csv
+import zipfile
+from datetime import date
+from xml.etree import ElementTree
+
+from backend import arquivamento, database, exportacao
+from tests.conftest import lancar
+
+_PLANILHA = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+def _ler_csv(caminho):
+    with open(caminho, encoding='utf-8-sig', newline='') as arquivo:
+        return list(csv.reader(arquivo, delimiter=';'))
+
+def _ler_xlsx(caminho):
+    """ Linhas da aba como listas de texto ('' para célula vazia) """
+    with zipfile.ZipFile(caminho) as pacote:
+        assert pacote.testzip() is None
+        raiz = ElementTree.fromstring(pacote.read('xl/worksheets/sheet1.xml'))
+    return [
+        [''.join(celula.itertext()) for celula in linha]
+        for linha in raiz.iter(f'{_PLANILHA}row')
+    ]
+
+def _ids_da_listagem(api, filtros):
+    return [boleto['id'] for boleto in api.buscar_boletos(filtros, itens_por_pagina=10_000)['dados']]
+
+def test_csv_na_ordem_da_listagem_com_virgula_decimal(logado, tmp_path, monkeypatch):
+    monkeypatch.setattr(exportacao, 'TAMANHO_BLOCO', 2) # Vários blocos: o arquivo é escrito aos pedaços
+    lancar(logado, empresa='Oficina; "Zé"', vencimento='2025-03-10', valor='1234.56', parcelas=3)
+    lancar(logado, empresa='Posto', vencimento='2026-01-05', valor='10.00', multa='2.00', juros='0.50')
+    lancar(logado, empresa='Fora do período', vencimento='2020-01-01', valor='5.00')
+    caminho = str(tmp_path / 'boletos.csv')
+
+    filtros = {'data_inicio': '2025-01-01'}
+    resposta = logado.exportar_boletos(filtros, 'csv', caminho)
+    assert resposta['status'] == 'sucesso', resposta
+    assert resposta['dados']['linhas'] == 4
+
+    cabecalho, *linhas = _ler_csv(caminho)
+    assert cabecalho == [titulo for _, titulo in exportacao.COLUNAS]
+    coluna = {nome: i for i, (nome, _) in enumerate(exportacao.COLUNAS)}
+    assert [int(linha[coluna['id']]) for linha in linhas] == _ids_da_listagem(logado, filtros)
+
+    oficina = [linha for linha in linhas if linha[coluna['empresa']] == 'Oficina; "Zé"']
+    assert len(oficina) == 3
+    assert oficina[0][coluna['valor_original']] == '1234,56'
+    posto = next(linha for linha in linhas if linha[coluna['empresa']] == 'Posto')
+    assert (posto[coluna['multa']], posto[coluna['juros']], posto[coluna['tipo_juros']]) == ('2,00', '0,50', 'R$')
+
+def test_xlsx_inclui_o_arquivo(logado, tmp_path):
+    lancar(logado, empresa='Antigo & Cia', vencimento='2019-05-10', valor='80.00')
+    lancar(logado, empresa='Novo', vencimento='2026-02-10', valor='99.90', parcelas=2)
+    with database.conexao() as conn:
+        conn.execute("UPDATE boletos SET status = 'Pago', valor_total = valor_original WHERE vencimento < '2020-01-01'")
+    assert arquivamento.arquivar(database.CAMINHO_BANCO, date(2020, 1, 1)) == 1
+    database.reaplicar_ganchos_conexao()
+    caminho = str(tmp_path / 'boletos.xlsx')
+
+    filtros = {'data_inicio': '2019-01-01'}
+    resposta = logado.exportar_boletos(filtros, 'xlsx', caminho)
+    assert resposta['status'] == 'sucesso', resposta
+
+    cabecalho, *linhas = _ler_xlsx(caminho)
+    assert cabecalho == [titulo for _, titulo in exportacao.COLUNAS]
+    coluna = {nome: i for i, (nome, _) in enumerate(exportacao.COLUNAS)}
+    assert [int(linha[coluna['id']]) for linha in linhas] == _ids_da_listagem(logado, filtros)
+    antigo = next(linha for linha in linhas if linha[coluna['empresa']] == 'Antigo & Cia')
+    assert (antigo[coluna['status']], float(antigo[coluna['valor_total']])) == ('Pago', 80.0)
+    assert float(linhas[0][coluna['valor_original']]) == 99.9
+
+def test_formato_invalido(logado, tmp_path):
+    resposta = logado.exportar_boletos({}, 'pdf', str(tmp_path / 'boletos.pdf'))
+    assert resposta['status'] == 'erro'
@@ -0,0 +1,100 @@
+import io
+
+import pytest
+
+from backend import database, imagens
+from tests.test_migracoes import ESQUEMA_ANTIGO
+
+# Não são imagens de verdade: sem o Pillow só o data URL importa
+PEQUENA = imagens.data_url('image/png', b'\x89PNG foto pequena')
+GRANDE = imagens.data_url('image/png', b'\x89PNG' + b'x' * (imagens.MAXIMO_SEM_MINIATURA + 1))
+MINIATURA = imagens.data_url('image/jpeg', b'\xff\xd8 miniatura')
+
+def _imagens(conn):
+    return {linha['hash']: linha for linha in conn.execute("SELECT * FROM imagens")}
+
+def _perfil(api, nome):
+    return next(perfil for perfil in api.listar_perfis() if perfil['nome'] == nome)
+
+def test_mesma_foto_em_dois_perfis_e_gravada_uma_vez(api):
+    assert api.criar_perfil({'nome': 'Ana', 'foto': GRANDE, 'miniatura': MINIATURA})['status'] == 'sucesso'
+    assert api.criar_perfil({'nome': 'Bia', 'foto': GRANDE})['status'] == 'sucesso'
+    ana, bia = _perfil(api, 'Ana'), _perfil(api, 'Bia')
+
+    assert ana['foto_hash'] == bia['foto_hash']
+    with database.conexao() as conn:
+        assert list(_imagens(conn)) == [ana['foto_hash']]
+    # A listagem leva só a miniatura; a foto inteira vem por obter_foto
+    assert ana['foto'] == bia['foto'] == MINIATURA
+    assert api.obter_foto(ana['foto_hash'])['dados'] == GRANDE
+    assert api.obter_foto('inexistente')['status'] == 'erro'
+
+def test_miniatura_sem_vir_do_js(api):
+    with database.conexao() as conn:
+        pequena, grande = imagens.guardar(conn, PEQUENA), imagens.guardar(conn, GRANDE)
+        guardadas = _imagens(conn)
+    # Pequena sem miniatura serve de miniatura dela mesma
+    assert imagens.data_url(guardadas[pequena]['mime_miniatura'], guardadas[pequena]['miniatura']) == PEQUENA
+    if imagens.Image is None:
+        assert guardadas[grande]['miniatura'] is None
+    else: # Com o Pillow, o conteúdo inválido não abre e também fica sem
+        assert imagens.gerar_miniatura(guardadas[grande]['dados']) is None
+
+def test_miniatura_gerada_pelo_pillow(api):
+    pil = pytest.importorskip('PIL.Image')
+    saida = io.BytesIO()
+    pil.new('RGB', (640, 320), 'red').save(saida, 'PNG')
+    mime, dados = imagens.gerar_miniatura(saida.getvalue())
+    assert mime == 'image/jpeg'
+    with pil.open(io.BytesIO(dados)) as miniatura:
+        assert miniatura.size == (imagens.LADO_MINIATURA, imagens.LADO_MINIATURA)
+
+def test_foto_que_nao_e_data_url_fica_como_texto(api):
+    link = 'https://exemplo.com/foto.png'
+    quebrada = 'data:image/png;base64,%%%'
+    assert imagens.ler_data_url(quebrada) is None
+    assert imagens.ler_data_url('data:text/plain;base64,b2k=') is None
+    for nome, foto in (('Link', link), ('Quebrada', quebrada)):
+        assert api.criar_perfil({'nome': nome, 'foto': foto})['status'] == 'sucesso'
+        perfil = _perfil(api, nome)
+        assert (perfil['foto'], perfil['foto_hash']) == (foto, None)
+
+def test_troca_e_exclusao_apagam_as_orfas(api):
+    assert api.criar_perfil({'nome': 'Ana', 'foto': PEQUENA})['status'] == 'sucesso'
+    assert api.criar_perfil({'nome': 'Bia', 'foto': PEQUENA})['status'] == 'sucesso'
+    ana, bia = _perfil(api, 'Ana'), _perfil(api, 'Bia')
+
+    # Ana troca de foto: a antiga continua, Bia ainda usa
+    assert api.atualizar_perfil({'id': ana['id'], 'nome': 'Ana', 'foto': GRANDE})['status'] == 'sucesso'
+    nova = _perfil(api, 'Ana')['foto_hash']
+    with database.conexao() as conn:
+        assert set(_imagens(conn)) == {bia['foto_hash'], nova}
+
+    # Sem a chave 'foto' nada muda
+    assert api.atualizar_perfil({'id': ana['id'], 'nome': 'Ana Maria'})['status'] == 'sucesso'
+    assert _perfil(api, 'Ana Maria')['foto_hash'] == nova
+
+    api.excluir_perfil(bia['id'])
+    with database.conexao() as conn:
+        assert set(_imagens(conn)) == {nova}
+
+def test_migracao_tira_as_fotos_de_usuarios(tmp_path):
+    conn = database.get_db_connection(str(tmp_path / 'antigo.db'))
+    try:
+        conn.executescript(ESQUEMA_ANTIGO)
+        conn.executemany("INSERT INTO usuarios (nome, foto) VALUES (?, ?)", [
+            ('Ana', PEQUENA), ('Bia', PEQUENA), ('Link', 'https://exemplo.com/foto.png'),
+            ('Quebrada', 'data:image/png;base64,%%%'),
+        ])
+        conn.commit()
+        database.preparar_banco(conn)
+
+        usuarios = {linha['nome']: linha for linha in conn.execute("SELECT * FROM usuarios")}
+        assert usuarios['Ana']['foto'] is None
+        assert usuarios['Ana']['foto_hash'] == usuarios['Bia']['foto_hash']
+        assert imagens.obter(conn, usuarios['Ana']['foto_hash']) == PEQUENA
+        assert (usuarios['Link']['foto'], usuarios['Link']['foto_hash']) == ('https://exemplo.com/foto.png', None)
+        assert (usuarios['Quebrada']['foto'], usuarios['Quebrada']['foto_hash']) == ('data:image/png;base64,%%%', None)
+        assert len(_imagens(conn)) == 1
+    finally:
+        conn.close()
@@ -0,0 +1,125 @@
+from backend import alteracoes, database, importacao
+
+CABECALHO = 'Vencimento;Valor;Empresa;Categoria;Descrição;Parcelas;Juros;Tipo_Juros;Status\n'
+
+def _escrever(caminho, texto, codificacao='utf-8'):
+    caminho.write_text(texto, encoding=codificacao)
+    return str(caminho)
+
+def _consultar(sql, params=()):
+    with database.conexao() as conn:
+        return conn.execute(sql, params).fetchall()
+
+def _fts_confere():
+    """ O índice de texto tem exatamente as linhas de boletos (integrity-check compara com a tabela) """
+    with database.conexao() as conn:
+        conn.execute("INSERT INTO boletos_fts (boletos_fts, rank) VALUES ('integrity-check', 1)")
+        return conn.execute("SELECT COUNT(*) FROM boletos_fts_pausa").fetchone()[0] == 0
+
+def test_planilha_com_linhas_validas_e_invalidas(logado, tmp_path):
+    caminho = _escrever(tmp_path / 'contas.csv', CABECALHO + (
+        '10/03/2026;"1.234,56";Oficina São José;Peças;troca de óleo;2;0,5;%;Pendente\n'
+        '2026-04-01;99.9;Posto Central;Combustível;diesel;1;0;R$;pago\n'
+        '\n'                                                    # Linha em branco: não conta
+        '31/02/2026;10;Empresa X;;;1;0;R$;Pendente\n'          # Data que não existe
+        'ontem;10;Empresa X;;;1;0;R$;Pendente\n'
+        '10/03/2026;0;Empresa X;;;1;0;R$;Pendente\n'           # Valor zero
+        '10/03/2026;10;Empresa X;;;1;0;USD;Pendente\n'
+        '10/03/2026;10;Empresa X;;;1;0;R$;Atrasado\n'
+        ';;;;;;;;\n'
+    ), codificacao='latin-1') # Planilha antiga do Excel
+
+    resposta = logado.importar_arquivo(caminho)
+    assert resposta['status'] == 'sucesso', resposta
+    resumo = resposta['dados']
+    assert (resumo['linhas_lidas'], resumo['boletos'], resumo['qtd_erros']) == (7, 3, 5)
+    assert [erro['linha'] for erro in resumo['erros']] == [5, 6, 7, 8, 9]
+    assert resumo['erros'][2]['msg'] == 'valor deve ser maior que zero'
+    assert 'inválido' in resumo['erros'][3]['msg'] and 'inválido' in resumo['erros'][4]['msg']
+
+    linhas = _consultar('''
+        SELECT vencimento, valor_original, juros, tipo_juros, empresa, status, numero_parcela, total_parcelas
+        FROM boletos_com_nomes ORDER BY id
+    ''')
+    assert [tuple(linha) for linha in linhas] == [
+        ('2026-03-10', 123456, 0.5, '%', 'Oficina São José', 'Pendente', 1, 2),
+        ('2026-04-09', 123456, 0.5, '%', 'Oficina São José', 'Pendente', 2, 2),
+        ('2026-04-01', 9990, 0, 'R$', 'Posto Central', 'Pago', 1, 1),
+    ]
+    # O lote entrou no índice de texto (a busca acha pedaço do nome)
+    assert logado.buscar_boletos({'busca': 'josé'})['paginacao']['total_itens'] == 2
+    assert _fts_confere()
+
+def test_valores_e_parcelas_fora_do_limite_pulam_so_a_linha(logado, tmp_path):
+    caminho = _escrever(tmp_path / 'limites.csv', CABECALHO + (
+        '10/03/2026;10;Boa;;;1;0;R$;Pendente\n'
+        '10/03/2026;nan;Ruim;;;1;0;R$;Pendente\n'
+        '10/03/2026;10;Ruim;;;99999999999;0;R$;Pendente\n'    # Passa de 31/12/9999
+        '10/03/2026;1e999999999;Ruim;;;1;0;R$;Pendente\n'     # inf
+        '10/03/2026;1e300;Ruim;;;1;0;R$;Pendente\n'           # Não cabe no Decimal
+        '10/03/2026;1e20;Ruim;;;1;0;R$;Pendente\n'            # Não cabe no INTEGER do SQLite
+        '10/03/2026;10;Ruim;;;1;inf;%;Pendente\n'
+    ))
+    resposta = logado.importar_arquivo(caminho)
+    assert resposta['status'] == 'sucesso', resposta
+    resumo = resposta['dados']
+    assert (resumo['linhas_lidas'], resumo['boletos'], resumo['qtd_erros']) == (7, 1, 6)
+    assert [erro['linha'] for erro in resumo['erros']] == [3, 4, 5, 6, 7, 8]
+    assert [linha[0] for linha in _consultar("SELECT empresa FROM boletos_com_nomes")] == ['Boa']
+
+def test_extrato_ofx_importa_so_os_debitos(logado, tmp_path):
+    caminho = _escrever(tmp_path / 'extrato.ofx', (
+        'OFXHEADER:100\n<OFX><SIGNONMSGSRSV1><SONRS><FI><ORG>Banco X</FI></SONRS></SIGNONMSGSRSV1>'
+        '<BANKTRANLIST><STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20260105120000[-3:BRT]<TRNAMT>-150,00'
+        '<NAME>POSTO ABC<MEMO>Diesel</STMTTRN>\n'
+        '<STMTTRN>\n<TRNTYPE>CREDIT\n<DTPOSTED>20260106\n<TRNAMT>300.00\n<MEMO>Salario\n</STMTTRN>'
+        '</BANKTRANLIST></OFX>'
+    ))
+    resumo = logado.importar_arquivo(caminho)['dados']
+    assert (resumo['linhas_lidas'], resumo['boletos'], resumo['qtd_erros']) == (1, 1, 0)
+    [linha] = _consultar("SELECT vencimento, valor_original, empresa, status, data_pagamento, banco_pagamento FROM boletos_com_nomes")
+    assert tuple(linha) == ('2026-01-05', 15000, 'POSTO ABC', 'Pago', '2026-01-05', 'Banco X')
+
+def test_falha_no_meio_mantem_os_lotes_gravados_e_o_indice(logado, tmp_path, monkeypatch):
+    total = importacao.TAMANHO_LOTE + 100
+    caminho = _escrever(tmp_path / 'grande.csv', CABECALHO + ''.join(
+        f'{(i % 28) + 1:02d}/03/2026;10;Fornecedor {i % 7};Peças;nota {i};1;0;R$;Pendente\n' for i in range(total)
+    ))
+
+    original = importacao.expandir
+    def expandir_com_defeito(lancamentos, usuario_id):
+        for numero, linha in enumerate(original(lancamentos, usuario_id)):
+            if numero == importacao.TAMANHO_LOTE + 50:
+                linha = linha[:-1] # INSERT com parâmetros a menos: falha no meio do segundo lote
+            yield linha
+    monkeypatch.setattr(importacao, 'expandir', expandir_com_defeito)
+
+    seq = alteracoes.registro.seq(logado.usuario_atual['id'])
+    resposta = logado.importar_arquivo(caminho)
+    assert resposta['status'] == 'erro' and 'Falha na importação' in resposta['msg']
+    # O primeiro lote ficou: a tela é avisada para recarregar
+    assert alteracoes.registro.seq(logado.usuario_atual['id']) == seq + 1
+
+    # O primeiro lote (já confirmado) fica; o segundo volta inteiro, junto com a pausa do índice
+    assert _consultar("SELECT COUNT(*) FROM boletos")[0][0] == importacao.TAMANHO_LOTE
+    assert _fts_confere()
+
+    # O trigger de indexação voltou a valer: um boleto lançado depois entra no índice na hora
+    logado.salvar_lancamento({'boleto': {
+        'empresa': 'Retífica Zeppelin', 'categoria': '', 'placa': '', 'descricao': '', 'vencimento': '2026-05-01',
+        'valor': '10', 'juros': '0', 'multa': '0', 'tipoJuros': 'R$', 'parcelas': 1,
+    }, 'modo': 'auto', 'regra': ''})
+    assert logado.buscar_boletos({'busca': 'zeppelin'})['paginacao']['total_itens'] == 1
+    assert _fts_confere()
+
+def test_sem_nada_gravado_nao_pede_recarga(logado, tmp_path):
+    usuario_id = logado.usuario_atual['id']
+    seq = alteracoes.registro.seq(usuario_id)
+
+    # Só linhas inválidas: importa zero boletos
+    resposta = logado.importar_arquivo(_escrever(tmp_path / 'invalida.csv', CABECALHO + 'ontem;10;X;;;1;0;R$;Pendente\n'))
+    assert (resposta['status'], resposta['dados']['boletos'], resposta['alteracao']) == ('sucesso', 0, None)
+
+    # Arquivo que nem abre
+    assert logado.importar_arquivo(str(tmp_path / 'nao_existe.csv'))['status'] == 'erro'
+    assert alteracoes.registro.seq(usuario_id) == seq
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from backend import instrumentacao
+from backend.instrumentacao import coletor, histograma, normalizar_sql, percentis
+from tests.conftest import criar_perfil, lancar
+
+@pytest.fixture
+def medindo(logado):
+    """ logado com a instrumentação ligada; desliga e zera tudo no fim """
+    coletor.limpar()
+    coletor.ligar()
+    yield logado
+    coletor.desligar()
+    coletor.limpar()
+    coletor.limite_lenta_ms = instrumentacao.LIMITE_LENTA_MS
+    if coletor._log is not None:
+        for manipulador in list(coletor._log.handlers):
+            coletor._log.removeHandler(manipulador)
+            manipulador.close()
+        coletor._log = None
+
+def test_normalizar_percentis_e_histograma():
+    assert normalizar_sql("SELECT *  FROM boletos\n WHERE id = 42 AND nome = 'Zé''s' AND v > 1.5") == \
+        "SELECT * FROM boletos WHERE id = ? AND nome = ? AND v > ?"
+    assert percentis(list(range(1, 101))) == {'p50': 50, 'p90': 90, 'p99': 99, 'min': 1, 'max': 100, 'media': 50.5}
+    assert percentis([])['p99'] == 0
+    faixas = histograma([0.5, 1, 3, 7000])
+    assert [f['qtd'] for f in faixas if f['qtd']] == [2, 1, 1]
+    assert faixas[-1] == {'ate_ms': None, 'qtd': 1}
+
+def test_mede_metodos_e_comandos(medindo):
+    lancar(medindo, parcelas=3)
+    for _ in range(3):
+        assert medindo.buscar_boletos({'status': 'Pendente'})['status'] == 'sucesso'
+    medindo.buscar_boletos({}, cursor='invalido')
+
+    metricas = medindo.obter_metricas()['dados']
+    assert metricas['ativo'] is True
+    busca = metricas['metodos']['buscar_boletos']
+    assert (busca['chamadas'], busca['erros']) == (4, 1)
+    assert busca['linhas_media'] > 0 and busca['bytes_medio'] > 0
+    assert sum(faixa['qtd'] for faixa in busca['histograma']) == 4
+    assert metricas['metodos']['salvar_lancamento']['comandos_medio'] >= 1
+    # Os comandos com valores diferentes são agrupados pelo formato
+    assert all("'" not in consulta['sql'] for consulta in metricas['consultas'])
+    assert any('FROM boletos_com_nomes' in consulta['sql'] for consulta in metricas['consultas'])
+    # O próprio diagnóstico não se mede
+    assert 'obter_metricas' not in metricas['metodos']
+
+def test_consultas_lentas_vao_para_o_log(medindo):
+    coletor.ligar(limite_lenta_ms=0) # Tudo é "lento"
+    medindo.buscar_boletos({})
+    lentas = medindo.obter_metricas()['dados']['lentas']
+    assert lentas and all(lenta['metodo'] == 'buscar_boletos' for lenta in lentas)
+
+    caminho = os.path.join(instrumentacao.PASTA_LOGS, instrumentacao.ARQUIVO_LENTAS)
+    with open(caminho, encoding='utf-8') as arquivo:
+        assert '[buscar_boletos]' in arquivo.read()
+
+def test_desligada_nao_mede(logado):
+    coletor.limpar()
+    logado.buscar_boletos({})
+    assert logado.obter_metricas()['dados']['metodos'] == {}
+
+def test_metricas_e_painel_so_com_login_e_diagnostico(api):
+    assert api.obter_metricas()['status'] == 'erro'
+    usuario_id = criar_perfil(api, 'Oficina')
+    assert api.entrar_por_id(usuario_id)['diagnostico'] is False
+    api._diagnostico = True # Como BoletoAPI(instrumentar=True)
+    assert api.entrar_por_id(usuario_id)['diagnostico'] is True
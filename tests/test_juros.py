@@ -0,0 +1,51 @@
+from datetime import date, timedelta
+
+import pytest
+
+from backend import juros
+from backend.juros import calcular_lote
+
+HOJE = date(2025, 3, 11) # Terça-feira
+
+def _boletos(quantidade):
+    """ Colunas de 'quantidade' boletos variados: R$ e %, em dia e atrasados, fim de semana, feriado, juros vazios """
+    vencimentos, valores, tipos, taxas, multas, pendentes = [], [], [], [], [], []
+    for i in range(quantidade):
+        vencimentos.append((date(2025, 2, 20) + timedelta(days=i % 40)).isoformat())
+        valores.append(100 + 37 * i)
+        tipos.append('%' if i % 3 else 'R$')
+        taxas.append([0.5, 0.033, 1.25, None, ''][i % 5] if i % 3 else [33, 0, None][i % 3])
+        multas.append([0, 210, None][i % 3])
+        pendentes.append(i % 7 != 0)
+    return vencimentos, valores, tipos, taxas, multas, pendentes
+
+def test_meio_centavo_arredonda_para_cima():
+    # 1 dia de atraso: 300 centavos a 0,5% = 1,5 centavo -> 2; 100 a 0,5% = 0,5 -> 1
+    valores, dias = calcular_lote(
+        ['2025-03-10', '2025-03-10', '2025-03-10', '2025-03-11'],
+        [300, 100, 1000, 1000],
+        ['%', '%', 'R$', 'R$'],
+        [0.5, 0.5, 33, 33],
+        [0, 10, 0, 0],
+        hoje=HOJE,
+    )
+    assert valores == [302, 111, 1033, 1000]
+    assert dias == [1, 1, 1, 0]
+
+def test_numpy_e_python_dao_os_mesmos_centavos():
+    pytest.importorskip('numpy')
+    colunas = _boletos(500)
+    assert len(colunas[0]) >= juros.MINIMO_PARA_NUMPY
+
+    com_numpy = juros._calcular_numpy(*colunas, HOJE)
+    sem_numpy = juros._calcular_python(*colunas, HOJE)
+    assert com_numpy == sem_numpy
+    assert all(isinstance(valor, int) for valor in com_numpy[0])
+    # calcular_lote escolhe o NumPy a partir de MINIMO_PARA_NUMPY, com o mesmo resultado
+    assert calcular_lote(*colunas, hoje=HOJE) == sem_numpy
+
+    # Meio centavo exato nos dois caminhos
+    meio = (['2025-03-10'] * juros.MINIMO_PARA_NUMPY, [100] * juros.MINIMO_PARA_NUMPY,
+            ['%'] * juros.MINIMO_PARA_NUMPY, [0.5] * juros.MINIMO_PARA_NUMPY,
+            [0] * juros.MINIMO_PARA_NUMPY, [True] * juros.MINIMO_PARA_NUMPY)
+    assert juros._calcular_numpy(*meio, HOJE)[0] == juros._calcular_python(*meio, HOJE)[0] == [101] * juros.MINIMO_PARA_NUMPY
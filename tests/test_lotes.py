@@ -0,0 +1,126 @@
+from datetime import date
+
+from backend import arquivamento, database, lotes
+from tests.conftest import criar_perfil, lancar
+
+def _ids(api, filtros=None):
+    return sorted(boleto['id'] for boleto in api.buscar_boletos(filtros or {}, 1, 1000)['dados'])
+
+def _linhas(ids, colunas):
+    with database.conexao() as conn:
+        marcadores = ','.join('?' * len(ids))
+        return [tuple(linha) for linha in conn.execute(
+            f"SELECT {colunas} FROM boletos WHERE id IN ({marcadores}) ORDER BY id", ids
+        )]
+
+def _por_id(resposta):
+    return {item['id']: item.get('msg', item['status']) for item in resposta['dados']['itens']}
+
+def test_pagar_e_estornar_em_lote(logado):
+    lancar(logado, vencimento='2025-03-10', juros='0.5', tipoJuros='%', parcelas=2)
+    lancar(logado, vencimento='2025-03-14', valor='80.00')
+    primeiro, segundo, terceiro = _ids(logado)
+
+    resposta = logado.pagar_boletos({'ids': [primeiro, terceiro, primeiro, 999], 'banco': 'Itaú', 'data': '2025-03-12'})
+    assert resposta['status'] == 'sucesso', resposta
+    assert resposta['msg'] == '2 de 3 boletos pagos.' # O id repetido conta uma vez
+    assert _por_id(resposta) == {primeiro: 'sucesso', terceiro: 'sucesso', 999: lotes.NAO_ENCONTRADO}
+    # Pago pelo valor atualizado na data: 2 dias a 0,5% de R$ 150,00; o em dia pelo original
+    assert _linhas([primeiro, segundo, terceiro], 'status, valor_total, banco_pagamento, data_pagamento') == [
+        ('Pago', 15150, 'Itaú', '2025-03-12'),
+        ('Pendente', 15000, None, None),
+        ('Pago', 8000, 'Itaú', '2025-03-12'),
+    ]
+
+    resposta = logado.pagar_boletos({'ids': [primeiro], 'data': '2025-03-20'})
+    assert _por_id(resposta) == {primeiro: 'Boleto já está pago.'} and resposta['alteracao'] is None
+
+    resposta = logado.cancelar_pagamentos({'ids': [primeiro, segundo]})
+    assert _por_id(resposta) == {primeiro: 'sucesso', segundo: 'Boleto não está pago.'}
+    assert _linhas([primeiro], 'status, valor_total, banco_pagamento, data_pagamento') == [
+        ('Pendente', 15000, None, None)
+    ]
+
+def test_excluir_e_reagendar_em_lote(logado):
+    lancar(logado, vencimento='2026-03-10', parcelas=3)
+    primeiro, segundo, terceiro = _ids(logado)
+    logado.pagar_boletos({'ids': [terceiro], 'data': '2026-03-01'})
+
+    # 2026-04-18 é sábado: o dia útil vai para a segunda
+    resposta = logado.reagendar_boletos({'ids': [primeiro, terceiro], 'vencimento': '2026-04-18'})
+    assert _por_id(resposta) == {primeiro: 'sucesso', terceiro: 'Boleto já está pago.'}
+    resposta = logado.reagendar_boletos({'ids': [segundo], 'dias': -3})
+    assert resposta['dados']['sucessos'] == 1
+    assert _linhas([primeiro, segundo], 'vencimento, vencimento_util') == [
+        ('2026-04-18', '2026-04-20'), ('2026-04-06', '2026-04-06'),
+    ]
+    resposta = logado.reagendar_boletos({'ids': [primeiro], 'vencimento': '2026-04-18', 'dias': 2})
+    assert resposta['status'] == 'erro' and 'Informe a nova data' in resposta['msg']
+
+    resposta = logado.excluir_boletos({'ids': [primeiro, terceiro]})
+    assert resposta['msg'] == '2 de 2 boletos excluídos.'
+    assert _ids(logado) == [segundo]
+
+def test_reagendar_para_fora_do_calendario(logado):
+    lancar(logado, vencimento='2026-03-10', parcelas=2)
+    lancar(logado, vencimento='9999-12-20')
+    primeiro, segundo, ultimo = _ids(logado)
+
+    # 9999-12-20 + 10 dias ainda cabe; os outros dois também
+    resposta = logado.reagendar_boletos({'ids': [primeiro, ultimo], 'dias': 10})
+    assert _por_id(resposta) == {primeiro: 'sucesso', ultimo: 'sucesso'}
+    for dias in (10 ** 7, -10 ** 7, 10 ** 30):
+        resposta = logado.reagendar_boletos({'ids': [segundo, ultimo], 'dias': dias})
+        assert resposta['status'] == 'sucesso' and resposta['dados']['sucessos'] == 0
+        assert set(_por_id(resposta).values()) == {'Novo vencimento fora do calendário.'}
+    assert _linhas([segundo, ultimo], 'vencimento') == [('2026-04-09',), ('9999-12-30',)]
+
+    resposta = logado.reagendar_boletos({'ids': [segundo], 'dias': float('inf')})
+    assert resposta['status'] == 'erro' and 'Dados inválidos' in resposta['msg']
+
+def test_selecao_por_filtro_so_pega_o_perfil_logado(logado):
+    lancar(logado, empresa='Posto Central', parcelas=2)
+    lancar(logado, empresa='Borracharia')
+    meus = _ids(logado, {'empresa': 'Posto'})
+    outro = criar_perfil(logado, 'Outro')
+    logado.entrar_por_id(outro)
+    lancar(logado, empresa='Posto Central')
+    do_outro = _ids(logado)
+    logado.entrar_por_id(next(p['id'] for p in logado.listar_perfis() if p['nome'] == 'Transportadora'))
+
+    # Os ids de outro perfil não são encontrados, nem aparecem na seleção por filtro
+    resposta = logado.excluir_boletos({'ids': do_outro})
+    assert _por_id(resposta) == {do_outro[0]: lotes.NAO_ENCONTRADO}
+
+    resposta = logado.pagar_boletos({'filtros': {'empresa': 'Posto'}, 'data': '2025-03-10'})
+    assert [item['id'] for item in resposta['dados']['itens']] == meus
+    assert _linhas(meus + do_outro, 'status') == [('Pago',), ('Pago',), ('Pendente',)]
+
+    resposta = logado.cancelar_pagamentos({'filtros': {'empresa': 'Nenhuma'}})
+    assert (resposta['status'], resposta['msg']) == ('erro', 'Nenhum boleto selecionado.')
+
+def test_lote_com_arquivados(logado):
+    lancar(logado, vencimento='2019-05-10', parcelas=2)
+    with database.conexao() as conn:
+        conn.execute("UPDATE boletos SET status = 'Pago'")
+    ids = _ids(logado, {'data_inicio': '2019-01-01'})
+    assert arquivamento.arquivar(database.CAMINHO_BANCO, date(2020, 1, 1)) == 2
+    database.reaplicar_ganchos_conexao()
+
+    # O estorno traz os arquivados de volta para o banco principal antes de mudar
+    resposta = logado.cancelar_pagamentos({'ids': ids})
+    assert resposta['dados']['sucessos'] == 2
+    assert _linhas(ids, 'status') == [('Pendente',), ('Pendente',)]
+
+def test_lote_acima_do_maximo(logado, monkeypatch):
+    lancar(logado, parcelas=4)
+    monkeypatch.setattr(lotes, 'MAXIMO_LOTE', 3)
+    erro = ('erro', 'Selecione no máximo 3 boletos por vez.')
+
+    for resposta in (logado.excluir_boletos({'filtros': {}}),
+                     logado.pagar_boletos({'ids': _ids(logado), 'data': '2025-03-10'})):
+        assert (resposta['status'], resposta['msg']) == erro
+    assert len(_ids(logado)) == 4 and _linhas(_ids(logado), 'DISTINCT status') == [('Pendente',)]
+
+    # No limite, passa
+    assert logado.excluir_boletos({'ids': _ids(logado)[:3]})['dados']['sucessos'] == 3
@@ -0,0 +1,22 @@
+from backend import database
+from backend.manutencao import Manutencao
+from tests.conftest import lancar
+
+def _tarefas(manutencao, tarefa):
+    return [item for item in manutencao.historico() if item['tarefa'] == tarefa]
+
+def test_analyze_uma_vez_por_intervalo_sem_gravar_no_banco(logado):
+    lancar(logado)
+    manutencao = Manutencao()
+    assert manutencao.rodar(so_ociosa=False)
+    assert manutencao.rodar(so_ociosa=False)
+
+    # Na segunda rodada o analyze do dia já foi feito (a data fica só na memória)
+    assert [item['resultado'] for item in _tarefas(manutencao, 'analyze')] == ['ok']
+    with database.conexao() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM configuracao WHERE chave LIKE 'manutencao%'").fetchone()[0] == 0
+
+    # Outra instância (o programa aberto de novo) faz o analyze outra vez
+    nova = Manutencao()
+    assert nova.rodar(so_ociosa=False)
+    assert len(_tarefas(nova, 'analyze')) == 1
@@ -0,0 +1,142 @@
+from backend import database, dinheiro, nomes
+from backend.migracoes import VERSAO_ATUAL, versao_banco
+
+# Esquema da primeira versão do programa: dinheiro em REAL (reais)
+ESQUEMA_ANTIGO = '''
+    CREATE TABLE usuarios (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT UNIQUE NOT NULL,
+        foto TEXT
+    );
+    CREATE TABLE boletos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        usuario_id INTEGER,
+        vencimento TEXT,
+        status TEXT DEFAULT 'Pendente',
+        empresa TEXT,
+        categoria TEXT,
+        placa TEXT,
+        descricao TEXT,
+        valor_original REAL,
+        juros REAL,
+        tipo_juros TEXT DEFAULT 'R$',
+        multa REAL,
+        valor_total REAL,
+        data_pagamento TEXT,
+        banco_pagamento TEXT,
+        numero_parcela INTEGER,
+        total_parcelas INTEGER,
+        FOREIGN KEY(usuario_id) REFERENCES usuarios(id)
+    );
+'''
+
+BOLETOS_ANTIGOS = [
+    # (valor_original, juros, tipo_juros, multa, valor_total)
+    (0.285, 0.33, 'R$', 2.1, None),
+    (1234.56, 0.033, '%', None, 1240.99),
+    (19.99, 0, 'R$', 0, 19.99),
+]
+
+def _banco_antigo(caminho):
+    conn = database.get_db_connection(caminho)
+    conn.executescript(ESQUEMA_ANTIGO)
+    conn.execute("INSERT INTO usuarios (nome) VALUES ('Antigo')")
+    conn.executemany(
+        """INSERT INTO boletos (usuario_id, vencimento, status, empresa, categoria, placa, descricao,
+                               valor_original, juros, tipo_juros, multa, valor_total, numero_parcela, total_parcelas)
+           VALUES (1, '2024-05-10', 'Pendente', 'Oficina', 'Peças', '', '', ?, ?, ?, ?, ?, 1, 1)""",
+        BOLETOS_ANTIGOS
+    )
+    # Boleto apagado: o id dele não pode voltar depois da migração
+    conn.execute("INSERT INTO boletos (usuario_id, valor_original) VALUES (1, 5)")
+    conn.execute("DELETE FROM boletos WHERE id = 4")
+    conn.commit()
+    return conn
+
+def test_migracao_passa_o_dinheiro_para_centavos(tmp_path):
+    conn = _banco_antigo(str(tmp_path / 'antigo.db'))
+    try:
+        database.preparar_banco(conn)
+        assert versao_banco(conn) == VERSAO_ATUAL
+
+        linhas = conn.execute(
+            "SELECT id, valor_original, juros, tipo_juros, multa, valor_total FROM boletos ORDER BY id"
+        ).fetchall()
+        assert [tuple(linha) for linha in linhas] == [
+            (1, 29, 33, 'R$', 210, None),
+            (2, 123456, 0.033, '%', None, 124099),
+            (3, 1999, 0, 'R$', 0, 1999),
+        ]
+        for linha in linhas:
+            assert isinstance(linha['valor_original'], int)
+        assert dinheiro.para_reais(linhas[1]['valor_original']) == 1234.56
+
+        # Mesmos ids e o AUTOINCREMENT continua de onde parou
+        conn.execute("INSERT INTO boletos (usuario_id, valor_original) VALUES (1, 100)")
+        assert conn.execute("SELECT MAX(id) FROM boletos").fetchone()[0] == 5
+        conn.rollback()
+    finally:
+        conn.close()
+
+def test_migracao_refaz_indices_e_triggers_anteriores(tmp_path):
+    conn = _banco_antigo(str(tmp_path / 'antigo.db'))
+    try:
+        database.preparar_banco(conn)
+        # Índices (migrações 1 e 3) e o índice de texto (4) voltam em cima da tabela nova
+        indices = {linha[0] for linha in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'boletos'")}
+        assert indices
+        nomes.cadastrar(conn, 'empresa', [(1, 'Auto Elétrica Zeca')])
+        conn.execute(
+            "INSERT INTO boletos (usuario_id, vencimento, empresa_id, placa, descricao, valor_original) "
+            "VALUES (1, '2025-01-01', (SELECT id FROM empresas WHERE nome = 'Auto Elétrica Zeca'), 'XYZ9K87', '', 100)"
+        )
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'boletos_fts'").fetchone():
+            encontrados = conn.execute("SELECT rowid FROM boletos_fts WHERE boletos_fts MATCH '\"Zeca\"'").fetchall()
+            assert [linha[0] for linha in encontrados] == [5]
+        conn.rollback()
+    finally:
+        conn.close()
+
+def test_migracao_troca_o_texto_dos_nomes_pelos_ids(tmp_path):
+    conn = _banco_antigo(str(tmp_path / 'antigo.db'))
+    try:
+        database.preparar_banco(conn)
+        colunas = {linha[1] for linha in conn.execute("PRAGMA table_info(boletos)")}
+        assert {'categoria_id', 'empresa_id'} <= colunas and not {'categoria', 'empresa'} & colunas
+
+        linhas = conn.execute(f'''
+            SELECT b.categoria_id, c.id, b.categoria, b.empresa_id, e.id, b.empresa FROM {nomes.VISAO} AS b
+            JOIN categorias AS c ON c.usuario_id = b.usuario_id AND c.nome = 'Peças'
+            JOIN empresas AS e ON e.usuario_id = b.usuario_id AND e.nome = 'Oficina'
+        ''').fetchall()
+        assert len(linhas) == 3
+        assert all(tuple(linha) == (linha[1], linha[1], 'Peças', linha[4], linha[4], 'Oficina') for linha in linhas)
+        assert [tuple(linha) for linha in conn.execute("SELECT nome, qtd FROM categorias")] == [('Peças', 3)]
+        indices = {linha[0] for linha in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert 'idx_boletos_categoria_id' in indices and 'idx_boletos_usuario_categoria' not in indices
+
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'boletos_fts'").fetchone():
+            # O índice de texto lê a visão: busca pela empresa, e apagar tira o boleto do índice
+            conn.execute("INSERT INTO boletos_fts (boletos_fts, rank) VALUES ('integrity-check', 1)")
+            busca = "SELECT rowid FROM boletos_fts WHERE boletos_fts MATCH '\"Oficina\"' ORDER BY rowid"
+            assert [linha[0] for linha in conn.execute(busca)] == [1, 2, 3]
+            conn.execute("DELETE FROM boletos WHERE id = 1")
+            assert [linha[0] for linha in conn.execute(busca)] == [2, 3]
+            conn.execute("INSERT INTO boletos_fts (boletos_fts, rank) VALUES ('integrity-check', 1)")
+            conn.rollback()
+    finally:
+        conn.close()
+
+def test_migracoes_deixam_os_nomes_como_nomes_criar(tmp_path):
+    # A migração 8 e o arquivo (nomes.criar) chegam ao mesmo esquema de nomes
+    conn = _banco_antigo(str(tmp_path / 'antigo.db'))
+    try:
+        database.preparar_banco(conn)
+        esquema = "SELECT name, sql FROM sqlite_master WHERE sql IS NOT NULL ORDER BY name"
+        normalizar = lambda sql: ' '.join(sql.replace('main.', '').split())
+        migrado = [(nome, normalizar(sql)) for nome, sql in conn.execute(esquema)]
+        nomes.criar(conn)
+        assert [(nome, normalizar(sql)) for nome, sql in conn.execute(esquema)] == migrado
+        conn.rollback()
+    finally:
+        conn.close()
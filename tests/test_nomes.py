@@ -0,0 +1,139 @@
+import sqlite3
+from datetime import date
+
+from backend import arquivamento, database, importacao, lancamentos, nomes
+from tests.conftest import BOLETO, lancar
+
+def _nomes(esquema='main'):
+    """ (categoria_id, categoria, empresa_id, empresa) de cada boleto de 'esquema', pela visão """
+    with database.conexao() as conn:
+        return [tuple(linha) for linha in conn.execute(
+            f"SELECT categoria_id, categoria, empresa_id, empresa FROM {esquema}.{nomes.VISAO} ORDER BY id"
+        )]
+
+def _tabela(coluna, esquema='main'):
+    """ {nome: (id, qtd)} da tabela de nomes de 'coluna' """
+    with database.conexao() as conn:
+        return {linha[1]: (linha[0], linha[2]) for linha in conn.execute(
+            f"SELECT id, nome, qtd FROM {esquema}.{nomes.TABELAS[coluna]}"
+        )}
+
+def _total(api, filtros):
+    return api.buscar_boletos(filtros)['paginacao']['total_itens']
+
+def test_ids_acompanham_os_nomes(logado):
+    lancar(logado, categoria='Pneus', empresa='Borracharia')
+    lancar(logado, categoria='Pneus', empresa='Posto Central')
+    lancar(logado, categoria='', empresa='Posto Central')
+    primeiro = min(b['id'] for b in logado.buscar_boletos({})['dados'])
+    logado.atualizar_boleto({'id': primeiro, 'boleto': dict(BOLETO, categoria='Revisão', empresa='Borracharia')})
+
+    categorias, empresas = _tabela('categoria'), _tabela('empresa')
+    assert _nomes() == [
+        (categorias['Revisão'][0], 'Revisão', empresas['Borracharia'][0], 'Borracharia'),
+        (categorias['Pneus'][0], 'Pneus', empresas['Posto Central'][0], 'Posto Central'),
+        (None, '', empresas['Posto Central'][0], 'Posto Central'), # Sem categoria: sem id
+    ]
+    assert {nome: qtd for nome, (_, qtd) in categorias.items()} == {'Revisão': 1, 'Pneus': 1}
+    assert {nome: qtd for nome, (_, qtd) in empresas.items()} == {'Borracharia': 1, 'Posto Central': 2}
+
+    # O texto não fica mais na linha do boleto
+    with database.conexao() as conn:
+        assert not {'categoria', 'empresa'} & set(arquivamento.colunas(conn))
+
+def test_gravacao_escreve_cada_boleto_uma_vez(logado):
+    usuario_id = logado.usuario_atual['id']
+    datas = [date(2025, 3, 10), date(2025, 4, 9), date(2025, 5, 9)]
+    linhas = list(lancamentos.linhas_parcelas(usuario_id, dict(BOLETO, empresa='Nova', categoria='Nova'), datas))
+    with database.conexao() as conn:
+        conn.execute("CREATE TEMP TABLE reescritas (id INTEGER)")
+        conn.execute('''
+            CREATE TEMP TRIGGER conta_reescritas AFTER UPDATE ON main.boletos BEGIN
+                INSERT INTO reescritas VALUES (new.id);
+            END
+        ''')
+        try:
+            assert importacao.gravar_em_lotes(conn, linhas) == 3
+            assert conn.execute("SELECT COUNT(*) FROM reescritas").fetchone()[0] == 0
+        finally:
+            conn.execute("DROP TABLE temp.reescritas")
+            conn.commit()
+
+    assert [linha[1:] for linha in _nomes()] == [('Nova', _tabela('empresa')['Nova'][0], 'Nova')] * 3
+    assert _tabela('categoria')['Nova'][1] == 3
+    assert logado.buscar_boletos({'busca': 'Nova'})['paginacao']['total_itens'] == 3
+
+def test_nome_sem_boleto_nao_aparece(logado):
+    # A gravação falhou depois de cadastrar o nome: ele fica com qtd 0, fora da lista
+    with database.conexao() as conn:
+        nomes.cadastrar(conn, 'categoria', [(logado.usuario_atual['id'], 'Fantasma')])
+    lancar(logado, categoria='Pneus')
+    assert logado.obter_categorias_usadas() == ['Pneus']
+
+def test_filtros_por_id(logado):
+    lancar(logado, categoria='Pneus', empresa='Borracharia do Zé')
+    lancar(logado, categoria='Combustível', empresa='Posto Central')
+    lancar(logado, categoria='Combustível', empresa='Posto Central', parcelas=2)
+
+    assert _total(logado, {'categoria': ['Combustível']}) == 3
+    assert _total(logado, {'categoria': ['Pneus', 'Combustível']}) == 4
+    assert _total(logado, {'categoria': ['Inexistente']}) == 0
+    assert _total(logado, {'categoria': 'pneu'}) == 1 # Texto solto: pedaço do nome
+    assert _total(logado, {'empresa': 'borracharia'}) == 1
+    assert _total(logado, {'empresa': 'Posto', 'categoria': ['Pneus']}) == 0
+
+    with database.conexao() as conn:
+        sql, params = logado._montar_filtros({'categoria': ['Combustível']}, conn)
+    assert 'categoria_id IN' in sql and 'Combustível' not in params
+
+def test_arquivo_usa_os_proprios_ids(logado):
+    # No arquivo, 'Pneus' ganha outro id: a cópia troca o id pelo do nome no arquivo
+    lancar(logado, categoria='Combustível', vencimento='2026-01-10')
+    lancar(logado, categoria='Pneus', vencimento='2020-01-10')
+    with database.conexao() as conn:
+        conn.execute("UPDATE boletos SET status = 'Pago' WHERE vencimento < '2021-01-01'")
+    assert arquivamento.arquivar(database.CAMINHO_BANCO, date(2021, 1, 1)) == 1
+    database.reaplicar_ganchos_conexao()
+
+    [(categoria_id, categoria, _, _)] = _nomes(arquivamento.ESQUEMA)
+    assert (categoria_id, categoria) == (_tabela('categoria', arquivamento.ESQUEMA)['Pneus'][0], 'Pneus')
+    assert 'Pneus' not in _tabela('categoria') # Saiu do principal com o último boleto
+    filtros = {'categoria': ['Pneus'], 'data_inicio': '2019-01-01'}
+    assert _total(logado, filtros) == 1
+    assert [b['categoria'] for b in logado.buscar_boletos(filtros)['dados']] == ['Pneus']
+
+def test_arquivo_antigo_com_texto(logado):
+    # Arquivo gravado antes dos ids: ainda é lido pelo texto e perde o texto no próximo arquivamento
+    usuario_id = logado.usuario_atual['id']
+    antigo = sqlite3.connect(arquivamento.caminho_arquivo(database.CAMINHO_BANCO))
+    antigo.execute('''
+        CREATE TABLE boletos (id INTEGER PRIMARY KEY, usuario_id INTEGER, vencimento TEXT, status TEXT,
+                              empresa TEXT, categoria TEXT, valor_original INTEGER, juros NUMERIC,
+                              tipo_juros TEXT, multa INTEGER, valor_total INTEGER, vencimento_util TEXT)
+    ''')
+    antigo.execute(
+        "INSERT INTO boletos VALUES (1000, ?, '2019-05-10', 'Pago', 'Retífica', 'Motor', 5000, 0, 'R$', 0, 5000, '2019-05-10')",
+        (usuario_id,)
+    )
+    antigo.commit()
+    antigo.close()
+    with database.conexao() as conn:
+        conn.execute("INSERT INTO configuracao (chave, valor) VALUES ('arquivo_ate', '2020-01-01')")
+    database.reaplicar_ganchos_conexao()
+
+    filtros = {'categoria': ['Motor'], 'data_inicio': '2019-01-01'}
+    assert [(b['id'], b['empresa']) for b in logado.buscar_boletos(filtros)['dados']] == [(1000, 'Retífica')]
+
+    assert arquivamento.arquivar(database.CAMINHO_BANCO, date(2020, 1, 1)) == 0
+    database.reaplicar_ganchos_conexao()
+    with database.conexao() as conn:
+        assert not {'categoria', 'empresa'} & set(arquivamento.colunas(conn, arquivamento.ESQUEMA))
+    [(categoria_id, categoria, _, empresa)] = _nomes(arquivamento.ESQUEMA)
+    assert (categoria, empresa) == ('Motor', 'Retífica')
+    assert categoria_id == _tabela('categoria', arquivamento.ESQUEMA)['Motor'][0]
+    assert [b['id'] for b in logado.buscar_boletos(filtros)['dados']] == [1000]
+
+    # E volta ao principal com os ids de lá
+    assert logado.cancelar_pagamentos({'ids': [1000]})['dados']['sucessos'] == 1
+    assert _tabela('categoria')['Motor'][1] == 1
+    assert logado.obter_categorias_usadas() == ['Motor']
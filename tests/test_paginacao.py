@@ -0,0 +1,89 @@
+import base64
+from datetime import date
+
+import pytest
+
+from backend import arquivamento, database
+from tests.conftest import lancar
+
+@pytest.fixture
+def com_boletos(logado):
+    """
+    Perfil com boletos de 2019 a 2027: vencidos, pendentes, pagos e
+    cancelados, com muitos empates de vencimento e de valor (só o id desempata).
+    """
+    for i in range(12):
+        lancar(logado, vencimento='2019-05-10', valor=('150.00', '80.00', '150.00')[i % 3], parcelas=3)
+        lancar(logado, vencimento=f'2025-{(i % 4) + 1:02d}-15', valor='99.90', parcelas=2)
+        lancar(logado, vencimento='2027-01-04', valor=('10.00', '20.00')[i % 2])
+    with database.conexao() as conn:
+        conn.execute("UPDATE boletos SET status = 'Pago' WHERE id % 3 = 0")
+        conn.execute("UPDATE boletos SET status = 'Cancelado' WHERE id % 7 = 0")
+    return logado
+
+def _por_numero(api, filtros):
+    """ Ids na ordem da listagem, numa página só (LIMIT/OFFSET) """
+    resposta = api.buscar_boletos(filtros, pagina=1, itens_por_pagina=10_000)
+    return [boleto['id'] for boleto in resposta['dados']]
+
+def _por_cursor(api, filtros, tamanho):
+    """ Ids de todas as páginas do modo cursor, do primeiro ao último """
+    ids, cursor, paginas = [], '', 0
+    while True:
+        resposta = api.buscar_boletos(filtros, itens_por_pagina=tamanho, cursor=cursor)
+        assert resposta['status'] == 'sucesso', resposta
+        ids += [boleto['id'] for boleto in resposta['dados']]
+        paginas += 1
+        assert paginas <= 10_000, 'o cursor não avança'
+        cursor = resposta['paginacao']['proximo_cursor']
+        if cursor is None:
+            return ids, paginas
+        assert len(resposta['dados']) == tamanho
+
+FILTROS = [
+    {},
+    {'status': 'Pago'},
+    {'status': 'Pendente'},
+    {'data_inicio': '2019-01-01', 'data_fim': '2025-12-31'},
+    {'data_inicio': '2025-01-01', 'incluir_vencidos': True},
+]
+
+def _conferir(api):
+    for filtros in FILTROS:
+        esperado = _por_numero(api, filtros)
+        assert esperado, filtros
+        for tamanho in (1, 7, len(esperado), len(esperado) + 5):
+            ids, paginas = _por_cursor(api, filtros, tamanho)
+            # Mesma ordem do modo por número: nenhum boleto faltando nem repetido
+            assert ids == esperado, (filtros, tamanho)
+            assert paginas == max(1, -(-len(esperado) // tamanho))
+
+def test_cursor_percorre_tudo_na_ordem_da_listagem(com_boletos):
+    _conferir(com_boletos)
+
+def test_cursor_com_o_arquivo(com_boletos):
+    total = len(_por_numero(com_boletos, {}))
+    movidos = arquivamento.arquivar(database.CAMINHO_BANCO, date(2020, 1, 1))
+    database.reaplicar_ganchos_conexao()
+    assert movidos > 0
+    with database.conexao() as conn:
+        assert arquivamento.limite(conn) is not None # As consultas sem data passam pelo UNION ALL
+
+    assert len(_por_numero(com_boletos, {})) == total
+    _conferir(com_boletos)
+
+@pytest.mark.parametrize('cursor', [
+    'xyz', # base64 sem o padding
+    '!!!',
+    base64.urlsafe_b64encode(b'{"a": 1}').decode(), # JSON de outro formato
+    base64.urlsafe_b64encode(b'[0, "2025-01-15", 9990]').decode(),
+    base64.urlsafe_b64encode(b'[5, "2025-01-15", 9990, 3]').decode(),
+    base64.urlsafe_b64encode(b'[0, "2025-01-15", 9990, "3; DROP TABLE boletos"]').decode(),
+    base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+    123,
+])
+def test_cursor_invalido_responde_erro(com_boletos, cursor):
+    resposta = com_boletos.buscar_boletos({}, cursor=cursor)
+    assert (resposta['status'], resposta['msg']) == ('erro', 'Cursor inválido')
+    # A primeira página continua funcionando
+    assert com_boletos.buscar_boletos({}, cursor='')['status'] == 'sucesso'
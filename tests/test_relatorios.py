@@ -0,0 +1,91 @@
+from datetime import date
+
+import pytest
+
+from backend import database, dinheiro, relatorios
+from backend.juros import calcular_lote
+from tests.conftest import lancar
+
+HOJE = date(2026, 3, 20)
+
+@pytest.fixture
+def com_boletos(logado):
+    """ Boletos de 2025 com juros em R$ e em %, multa, pagos e um fora da faixa """
+    lancar(logado, categoria='Peças', empresa='Oficina', vencimento='2025-01-10', valor='100.00', parcelas=4)
+    lancar(logado, categoria='Combustível', empresa='Posto', vencimento='2025-02-28', valor='33.33',
+           juros='0.033', tipoJuros='%', multa='2.00', parcelas=3)
+    lancar(logado, categoria='Combustível', empresa='Posto', vencimento='2025-11-15', valor='10.01', juros='0.07')
+    lancar(logado, categoria='Peças', empresa='Oficina', vencimento='2026-05-10', valor='999.00') # Fora de 2025
+    with database.conexao() as conn:
+        conn.execute("UPDATE boletos SET status = 'Pago', valor_total = valor_original + 50 WHERE vencimento < '2025-03-01'")
+    return logado
+
+def _gerar(api, inicio, fim, granularidades):
+    usuario_id = api.usuario_atual['id']
+    with database.conexao() as conn:
+        return relatorios.gerar(conn, usuario_id, inicio, fim, granularidades, hoje=HOJE)
+
+def _boletos(api, inicio, fim):
+    with database.conexao() as conn:
+        return conn.execute(
+            "SELECT * FROM boletos_com_nomes WHERE usuario_id = ? AND vencimento BETWEEN ? AND ?",
+            (api.usuario_atual['id'], inicio.isoformat(), fim.isoformat())
+        ).fetchall()
+
+def test_totais_batem_com_o_calculo_boleto_a_boleto(com_boletos):
+    inicio, fim = date(2025, 1, 1), date(2025, 12, 31)
+    totais = _gerar(com_boletos, inicio, fim, ['mes'])['totais']
+
+    boletos = _boletos(com_boletos, inicio, fim)
+    pagos = [b for b in boletos if b['status'] == 'Pago']
+    pendentes = [b for b in boletos if b['status'] != 'Pago']
+    atualizados, _ = calcular_lote(
+        [b['vencimento'] for b in pendentes], [b['valor_original'] for b in pendentes],
+        [b['tipo_juros'] for b in pendentes], [b['juros'] for b in pendentes],
+        [b['multa'] for b in pendentes], hoje=HOJE,
+    )
+    assert (totais['qtd_pagos'], totais['qtd_pendentes']) == (len(pagos), len(pendentes)) == (3, 5)
+    assert totais['total_esperado'] == dinheiro.para_reais(sum(b['valor_original'] for b in boletos))
+    assert totais['total_pago'] == dinheiro.para_reais(sum(b['valor_total'] for b in pagos))
+    assert totais['total_pendente'] == dinheiro.para_reais(sum(atualizados))
+    assert set(totais['por_categoria']) == {'Peças', 'Combustível'}
+    assert totais['por_empresa']['Oficina']['pago'] == dinheiro.para_reais(2 * 10050)
+
+def test_granularidades_maiores_somam_as_menores(com_boletos):
+    inicio, fim = date(2025, 1, 15), date(2025, 12, 31)
+    relatorio = _gerar(com_boletos, inicio, fim, ['ano', 'mes', 'trimestre'])
+    series = relatorio['series']
+
+    # Todos os períodos da faixa, inclusive os vazios; as pontas são cortadas na faixa
+    assert [p['periodo'] for p in series['mes']] == [f'2025-{mes:02d}' for mes in range(1, 13)]
+    assert [p['periodo'] for p in series['trimestre']] == ['2025-T1', '2025-T2', '2025-T3', '2025-T4']
+    assert [p['periodo'] for p in series['ano']] == ['2025']
+    assert (series['mes'][0]['inicio'], series['mes'][0]['fim']) == ('2025-01-15', '2025-01-31')
+    assert series['mes'][0]['qtd_pagos'] == 0 # O de 10/01 fica antes da faixa
+    assert series['mes'][6]['total_esperado'] == 0
+
+    for campo in ('total_esperado', 'total_pago', 'total_pendente', 'qtd_pagos', 'qtd_pendentes'):
+        meses = [p[campo] for p in series['mes']]
+        trimestres = [p[campo] for p in series['trimestre']]
+        for i, trimestre in enumerate(trimestres):
+            assert trimestre == pytest.approx(sum(meses[3 * i:3 * i + 3])), campo
+        assert series['ano'][0][campo] == pytest.approx(sum(trimestres)) == pytest.approx(relatorio['totais'][campo])
+
+    # Mesma conta com só uma granularidade pedida
+    assert _gerar(com_boletos, inicio, fim, ['trimestre'])['series']['trimestre'] == series['trimestre']
+
+def test_entradas_invalidas(com_boletos):
+    with pytest.raises(ValueError):
+        _gerar(com_boletos, date(2025, 2, 1), date(2025, 1, 1), ['mes'])
+    with pytest.raises(ValueError):
+        _gerar(com_boletos, date(2025, 1, 1), date(2025, 2, 1), ['semana'])
+    assert com_boletos.gerar_relatorio('2025-13-01', '2025-12-31')['status'] == 'erro'
+    assert com_boletos.gerar_relatorio_mensal('2025/01')['status'] == 'erro'
+
+def test_relatorio_mensal_da_api(com_boletos):
+    resposta = com_boletos.gerar_relatorio_mensal('2025-02')
+    assert resposta['status'] == 'sucesso'
+    dados = resposta['dados']
+    assert (dados['qtd_pagos'], dados['qtd_pendentes']) == (2, 0) # 10/02 da Oficina e 28/02 do Posto
+    assert dados['total_esperado'] == 133.33
+    assert dados['por_categoria'] == {'Peças': 100.5, 'Combustível': 33.83}
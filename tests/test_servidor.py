@@ -0,0 +1,79 @@
+import http.client
+import json
+import socket
+
+import pytest
+
+from backend.servidor import NAO_EXPOSTOS, ServidorAPI
+from tests.conftest import criar_perfil, lancar
+
+@pytest.fixture
+def servidor(api):
+    servidor = ServidorAPI(api, '127.0.0.1', 0).iniciar_em_segundo_plano()
+    yield servidor
+    servidor.parar()
+
+class Cliente:
+    """ Um navegador: a própria sessão e uma conexão keep-alive """
+
+    def __init__(self, servidor):
+        self.conexao = http.client.HTTPConnection('127.0.0.1', servidor.porta, timeout=10)
+        self.token = self.pedir('POST', '/sessao')[1]['token']
+
+    def pedir(self, metodo, caminho, corpo=None, token=None):
+        cabecalhos = {'Content-Type': 'application/json'}
+        if token:
+            cabecalhos['Authorization'] = f'Bearer {token}'
+        self.conexao.request(metodo, caminho, body=None if corpo is None else json.dumps(corpo), headers=cabecalhos)
+        resposta = self.conexao.getresponse()
+        return resposta.status, json.loads(resposta.read())
+
+    def chamar(self, metodo, *args, **kwargs):
+        return self.pedir('POST', f'/api/{metodo}', {'args': list(args), 'kwargs': kwargs}, self.token)
+
+def test_metodos_nao_expostos_respondem_404(servidor):
+    cliente = Cliente(servidor)
+    for metodo in sorted(NAO_EXPOSTOS):
+        status, resposta = cliente.chamar(metodo)
+        assert status == 404, metodo
+        assert resposta['status'] == 'erro'
+    assert cliente.chamar('nao_existe')[0] == 404
+
+def test_sem_sessao_responde_401(servidor):
+    cliente = Cliente(servidor)
+    assert cliente.pedir('POST', '/api/estaLogado', [])[0] == 401
+    assert cliente.pedir('POST', '/api/estaLogado', [], token='inventado')[0] == 401
+
+def test_cada_sessao_tem_o_proprio_perfil(servidor, api):
+    oficina = criar_perfil(api, 'Oficina')
+    frota = criar_perfil(api, 'Frota')
+    api.entrar_por_id(frota)
+    lancar(api, empresa='Só da frota')
+    api.logout()
+
+    a, b = Cliente(servidor), Cliente(servidor)
+    assert a.chamar('entrar_por_id', oficina)[1]['status'] == 'sucesso'
+    assert b.chamar('entrar_por_id', frota)[1]['status'] == 'sucesso'
+
+    assert a.chamar('buscar_boletos', {})[1]['dados'] == []
+    assert [boleto['empresa'] for boleto in b.chamar('buscar_boletos', {})[1]['dados']] == ['Só da frota']
+
+    # Sair numa aba não desloga a outra, nem a janela
+    a.chamar('logout')
+    assert a.chamar('estaLogado')[1] is False
+    assert b.chamar('estaLogado')[1] is True
+    assert api.estaLogado() is False
+
+def test_sessao_encerrada_deixa_de_valer(servidor):
+    cliente = Cliente(servidor)
+    assert cliente.chamar('estaLogado')[0] == 200
+    assert cliente.pedir('DELETE', '/sessao', token=cliente.token)[0] == 200
+    assert cliente.chamar('estaLogado')[0] == 401
+
+@pytest.mark.parametrize('tamanho', ['abc', '-1'])
+def test_content_length_invalido_responde_400(servidor, tamanho):
+    with socket.create_connection(('127.0.0.1', servidor.porta), timeout=10) as conexao:
+        conexao.sendall(f'POST /sessao HTTP/1.1\r\nHost: x\r\nContent-Length: {tamanho}\r\n\r\n'.encode())
+        resposta = conexao.makefile('rb').read()
+    assert resposta.startswith(b'HTTP/1.1 400')
+    assert b'Content-Length' in resposta